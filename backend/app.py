@@ -3,7 +3,7 @@ import os
 
 load_dotenv()
 
-from flask import Flask
+from flask import Flask, jsonify
 from config import Config
 from models import db, User
 from flask_cors import CORS
@@ -15,31 +15,67 @@ from routes.documents import document_bp
 from routes.study_plan import study_plan_bp
 from routes.flashcards import flashcard_bp
 from routes.summary import summarization_bp
-
-app = Flask(__name__)
-app.config.from_object(Config)
-
-db.init_app(app)
-CORS(app, supports_credentials=True)
+from routes.metrics import metrics_bp
+from routes.jobs import jobs_bp
+from services.registry import services
+from services.ingestion import ingestion_queue
+from services.conversation_memory import conversation_memory
+from services.llm_gateway import LLMGatewayError
 
 login_manager = LoginManager()
-login_manager.init_app(app)
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-app.register_blueprint(auth_bp)
-app.register_blueprint(workspace_bp)
-app.register_blueprint(chat_bp)
-app.register_blueprint(document_bp)
-app.register_blueprint(study_plan_bp)
-app.register_blueprint(flashcard_bp)
-app.register_blueprint(summarization_bp)
+def create_app():
+    """
+    Build the app and run its startup work. Nothing happens at import time: extraction
+    pool workers re-import the main module, and must not touch the database or load models.
+    Run with `python app.py` or `gunicorn "app:create_app()"`.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+
+    db.init_app(app)
+    CORS(app, supports_credentials=True)
+    login_manager.init_app(app)
+
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    ingestion_queue.init_app(app, max_workers=Config.INGEST_WORKERS)
+    conversation_memory.init_app(
+        app,
+        window_turns=Config.CHAT_MEMORY_TURNS,
+        answer_chars=Config.CHAT_MEMORY_ANSWER_CHARS,
+        summarize_after=Config.CHAT_MEMORY_SUMMARIZE_AFTER,
+        rewrite=Config.CHAT_QUERY_REWRITE
+    )
+
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(workspace_bp)
+    app.register_blueprint(chat_bp)
+    app.register_blueprint(document_bp)
+    app.register_blueprint(study_plan_bp)
+    app.register_blueprint(flashcard_bp)
+    app.register_blueprint(summarization_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(jobs_bp)
+
+    @app.errorhandler(LLMGatewayError)
+    def llm_busy(e):
+        # 429 when the LLM queue is full, 503 when a request waited too long or Ollama is unreachable
+        return jsonify({"error": str(e)}), e.status_code, {"Retry-After": "5"}
+
+    with app.app_context():
+        db.create_all()
+        ingestion_queue.fail_interrupted_jobs()
+
+    if Config.PRELOAD_SERVICES:
+        services.preload(['embedding'])
+
+    return app
 
-with app.app_context():
-    db.create_all()
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    create_app().run(debug=True, port=5000)
@@ -0,0 +1,55 @@
+"""
+Chunking throughput (MB/s): the character-based chunking() against the token-aware
+sentence-span chunker.
+
+    python -m benchmarks.bench_chunking --sizes 1 4 16
+    python -m benchmarks.bench_chunking --tokenizer BAAI/bge-m3
+
+Without --tokenizer the token chunker uses its 4-chars-per-token estimate, which
+isolates the cost of the chunking algorithm from the cost of tokenization.
+"""
+import argparse
+
+from benchmarks.common import best_of, sample_text
+from services.document_processor import DocumentProcessor
+
+PAGE_CHARS = 3000
+
+
+def pages_of(text):
+    return [text[i:i + PAGE_CHARS] for i in range(0, len(text), PAGE_CHARS)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=float, nargs='+', default=[1, 4, 16], help='input sizes in MB')
+    parser.add_argument('--tokenizer', default=None, help='HF tokenizer name, e.g. BAAI/bge-m3')
+    parser.add_argument('--chunk-size', type=int, default=500, help='chunking() size in characters')
+    parser.add_argument('--max-tokens', type=int, default=128)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    processor = DocumentProcessor(tokenizer_name=args.tokenizer, chunk_max_tokens=args.max_tokens)
+    counter = args.tokenizer or '4 chars/token estimate'
+    print(f"chunking(chunk_size={args.chunk_size}) vs iter_token_chunks(max_tokens={args.max_tokens}, {counter})")
+    print(f"{'MB':>6} {'chars MB/s':>12} {'tokens MB/s':>12} {'chars n':>9} {'tokens n':>9}")
+
+    for size in args.sizes:
+        # sample sentences average ~70 characters
+        text = sample_text(int(size * 1024 * 1024 / 70), seed=1)
+        megabytes = len(text.encode('utf-8')) / (1024 * 1024)
+        pages = pages_of(text)
+
+        char_seconds, char_chunks = best_of(
+            lambda: processor.chunking("\n".join(pages), chunk_size=args.chunk_size), args.repeat
+        )
+        token_seconds, token_chunks = best_of(
+            lambda: list(processor.iter_token_chunks(pages)), args.repeat
+        )
+
+        print(f"{megabytes:>6.1f} {megabytes / char_seconds:>12.1f} {megabytes / token_seconds:>12.1f} "
+              f"{len(char_chunks):>9} {len(token_chunks):>9}")
+
+
+if __name__ == '__main__':
+    main()
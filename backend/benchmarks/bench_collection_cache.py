@@ -0,0 +1,55 @@
+"""
+Per-request cost of resolving a workspace collection: a Chroma
+get_or_create_collection round trip against the cached handle.
+
+    python -m benchmarks.bench_collection_cache --workspaces 50 --lookups 2000
+
+Runs against a throwaway PersistentClient in a temporary directory; no model is loaded.
+"""
+import argparse
+import random
+import tempfile
+import time
+
+from benchmarks.common import percentiles
+from services.embeddings import EmbeddingService
+
+
+def timed_lookups(lookup, workspace_ids, lookups, seed=0):
+    rng = random.Random(seed)
+    samples = []
+    for _ in range(lookups):
+        workspace_id = rng.choice(workspace_ids)
+        start = time.perf_counter()
+        lookup(workspace_id)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workspaces', type=int, default=50)
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as chroma_path:
+        service = EmbeddingService.store_only(chroma_path)
+
+        workspace_ids = list(range(1, args.workspaces + 1))
+        for workspace_id in workspace_ids:
+            service.get_or_create_collection(workspace_id)
+
+        uncached = lambda workspace_id: service.client.get_or_create_collection(
+            name=f"workspace_{workspace_id}", metadata={"hnsw:space": "cosine"}
+        )
+        modes = {'chroma': uncached, 'cached': service.get_or_create_collection}
+
+        print(f"{args.lookups} lookups over {args.workspaces} workspaces")
+        print(f"{'mode':>8} {'p50 us':>9} {'p99 us':>9} {'mean us':>9}")
+        for name, lookup in modes.items():
+            stats = percentiles(timed_lookups(lookup, workspace_ids, args.lookups))
+            print(f"{name:>8} {stats['p50'] * 1e6:>9.1f} {stats['p99'] * 1e6:>9.1f} {stats['mean'] * 1e6:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Passage embedding throughput (passages/sec) on this machine.
+
+    python -m benchmarks.bench_embedding --passages 1024
+    python -m benchmarks.bench_embedding --batch-size 16
+
+"before" is the former path: every passage gets the query instruction and is encoded
+in arrival order with batch_size=32. "after" is EmbeddingService.encode_passages:
+no instruction, longest passages first, batch size from auto_batch_size(). Both see
+the same passages in the same groups of four encode batches that embed_and_store uses.
+"""
+import argparse
+import random
+
+from benchmarks.common import best_of, sample_text
+from services.embeddings import QUERY_INSTRUCTION, EmbeddingService
+
+
+def sample_passages(n, seed=0):
+    """Chunk-like passages of one to twelve sentences, so lengths vary as in real documents"""
+    rng = random.Random(seed)
+    return [sample_text(rng.randint(1, 12), seed=seed * 100003 + i) for i in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='BAAI/bge-m3')
+    parser.add_argument('--passages', type=int, default=512)
+    parser.add_argument('--batch-size', type=int, default=None, help='override auto_batch_size()')
+    parser.add_argument('--repeat', type=int, default=2)
+    args = parser.parse_args()
+
+    service = EmbeddingService.encoder_only(args.model, batch_size=args.batch_size)
+    model = service.model
+
+    passages = sample_passages(args.passages)
+    group = service.batch_size * 4
+    groups = [passages[i:i + group] for i in range(0, len(passages), group)]
+
+    def before():
+        for texts in groups:
+            model.encode([QUERY_INSTRUCTION + t for t in texts], normalize_embeddings=True, batch_size=32)
+
+    def after():
+        for texts in groups:
+            service.encode_passages(texts)
+
+    model.encode(passages[:8])  # warm-up
+    print(f"{args.model} on {model.device.type}, {len(passages)} passages, auto batch size {service.batch_size}")
+    for name, fn in (('before', before), ('after', after)):
+        seconds, _ = best_of(fn, args.repeat)
+        print(f"{name:>8}: {len(passages) / seconds:8.1f} passages/s  ({seconds:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
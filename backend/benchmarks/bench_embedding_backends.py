@@ -0,0 +1,69 @@
+"""
+Recall against throughput for the embedding backends, on the fixed local corpus
+(benchmarks/data/retrieval_corpus.json plus generated distractor passages).
+
+    python -m benchmarks.bench_embedding_backends
+    python -m benchmarks.bench_embedding_backends --backends torch int8 --distractors 4000
+
+For each backend: passages/sec of encode_passages over the whole corpus, queries/sec,
+recall@1 and recall@5 of the labelled passage, and top-5 overlap with the torch fp32
+ranking (how far quantization moves the results).
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import load_retrieval_corpus, recall_at_k
+from services.embedding_backends import BACKENDS
+from services.embeddings import EmbeddingService
+
+
+def rank(service, passages, queries):
+    start = time.perf_counter()
+    passage_vectors = np.asarray(service.encode_passages([p['text'] for p in passages]), dtype=np.float32)
+    passage_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    query_vectors = np.asarray(service.encode_queries([q['query'] for q in queries]), dtype=np.float32)
+    query_seconds = time.perf_counter() - start
+
+    order = np.argsort(-(query_vectors @ passage_vectors.T), axis=1)[:, :10]
+    ranked_ids = [[passages[i]['id'] for i in row] for row in order]
+    return ranked_ids, passage_seconds, query_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='BAAI/bge-m3')
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--distractors', type=int, default=2000)
+    parser.add_argument('--onnx-cache-dir', default='./onnx_models', help="where the onnx export is kept between runs")
+    args = parser.parse_args()
+
+    passages, queries = load_retrieval_corpus(distractors=args.distractors)
+    relevant = [q['relevant'] for q in queries]
+    print(f"{args.model}: {len(passages)} passages, {len(queries)} queries")
+    print(f"{'backend':>8} {'passages/s':>11} {'queries/s':>10} {'R@1':>6} {'R@5':>6} {'top5 vs fp32':>13}")
+
+    baseline = None
+    for backend in args.backends:
+        service = EmbeddingService.encoder_only(args.model, backend, onnx_cache_dir=args.onnx_cache_dir)
+        service.encode_queries(["warm up"])
+
+        ranked_ids, passage_seconds, query_seconds = rank(service, passages, queries)
+        if backend == 'torch':
+            baseline = ranked_ids
+
+        overlap = '-'
+        if baseline is not None and backend != 'torch':
+            shared = [len(set(a[:5]) & set(b[:5])) / 5 for a, b in zip(ranked_ids, baseline)]
+            overlap = f"{sum(shared) / len(shared):.2f}"
+
+        print(f"{backend:>8} {len(passages) / passage_seconds:>11.1f} {len(queries) / query_seconds:>10.1f} "
+              f"{recall_at_k(ranked_ids, relevant, 1):>6.2f} {recall_at_k(ranked_ids, relevant, 5):>6.2f} "
+              f"{overlap:>13}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Recall@5 and latency of dense, lexical (BM25) and hybrid retrieval through
+EmbeddingService.retrieve, on the fixed local corpus
+(benchmarks/data/retrieval_corpus.json plus generated distractor passages).
+
+    python -m benchmarks.bench_hybrid_search
+    python -m benchmarks.bench_hybrid_search --modes lexical --distractors 5000
+
+The corpus is stored as one document in a throwaway Chroma directory. Latency is per
+query with the query-embedding cache off, so every dense lookup runs the model.
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks.common import load_retrieval_corpus, percentiles, recall_at_k
+from services.embeddings import EmbeddingService
+
+MODES = ('dense', 'lexical', 'hybrid')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='BAAI/bge-m3')
+    parser.add_argument('--backend', default='torch')
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    parser.add_argument('--distractors', type=int, default=2000)
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    passages, queries = load_retrieval_corpus(distractors=args.distractors)
+    relevant = [q['relevant'] for q in queries]
+
+    with tempfile.TemporaryDirectory() as chroma_path:
+        service = EmbeddingService(
+            model_name=args.model,
+            chroma_path=chroma_path,
+            backend=args.backend,
+            query_batch_wait_ms=0,
+            query_cache_mb=0
+        )
+        service.embed_and_store(workspace_id=0, document_id=0, chunks=[p['text'] for p in passages])
+        passage_id = {f"doc0_chunk{i}": p['id'] for i, p in enumerate(passages)}
+
+        # Build the BM25 index and warm the model outside the timed loop
+        service.retrieve(0, "warm up", args.top_k, mode='hybrid')
+
+        print(f"{args.model} ({args.backend}): {len(passages)} passages, {len(queries)} queries")
+        print(f"{'mode':>8} {'R@1':>6} {'R@5':>6} {'p50 ms':>8} {'p99 ms':>8}")
+        for mode in args.modes:
+            ranked, latencies = [], []
+            for q in queries:
+                start = time.perf_counter()
+                result = service.retrieve(0, q['query'], args.top_k, mode=mode)
+                latencies.append(time.perf_counter() - start)
+                ranked.append([passage_id[chunk_id] for chunk_id in result['ids']])
+
+            stats = percentiles(latencies)
+            print(f"{mode:>8} {recall_at_k(ranked, relevant, 1):>6.2f} {recall_at_k(ranked, relevant, 5):>6.2f} "
+                  f"{stats['p50'] * 1000:>8.1f} {stats['p99'] * 1000:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
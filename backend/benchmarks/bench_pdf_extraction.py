@@ -0,0 +1,49 @@
+"""
+Compare serial, thread-pool and process-pool PDF extraction over a page-count sweep.
+
+    python -m benchmarks.bench_pdf_extraction --pages 10 50 200 --workers 4
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.common import best_of, write_sample_pdf
+from services.document_processor import DocumentProcessor
+
+MODES = ['serial', 'thread', 'process']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, nargs='+', default=[10, 50, 200])
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    processor = DocumentProcessor(pdf_workers=args.workers)
+    print(f"workers={args.workers}, best of {args.repeat}")
+    print(f"{'pages':>6} " + ' '.join(f"{mode + ' (s)':>12}" for mode in MODES) + f" {'speedup':>8}")
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            for pages in args.pages:
+                path = os.path.join(tmp, f"sample_{pages}.pdf")
+                write_sample_pdf(path, pages)
+
+                timings, outputs = {}, {}
+                for mode in MODES:
+                    timings[mode], outputs[mode] = best_of(
+                        lambda: processor.extract_pdf_pages(path, mode=mode), args.repeat
+                    )
+
+                # Every mode must return the same pages in the same order
+                assert outputs['thread'] == outputs['serial'] and outputs['process'] == outputs['serial']
+
+                speedup = timings['serial'] / timings['process']
+                print(f"{pages:>6} " + ' '.join(f"{timings[mode]:>12.3f}" for mode in MODES) + f" {speedup:>7.1f}x")
+    finally:
+        processor.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Prefill with a warm versus a cold prompt prefix, against a local stand-in for Ollama.
+
+    python -m benchmarks.bench_prompt_prefix
+    python -m benchmarks.bench_prompt_prefix --ms-per-token 0.8 --requests 20
+
+The stand-in serves /api/chat and behaves like one llama.cpp slot: it keeps the tokens
+of the last prompt and only "evaluates" (sleeps ms-per-token for) the tokens after the
+longest prefix the new prompt shares with them, reporting prompt_eval_count/duration
+the way Ollama does. Requests go through LLMGateway, so the client path is the real one.
+
+Each workload is run three ways:
+  cold    cache cleared before every request (first request, or after the model unloads)
+  stable  warm cache, templates from services.prompts (instructions first)
+  legacy  warm cache, the same text with request data ahead of the instructions,
+          as the templates were laid out before
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.common import load_retrieval_corpus, percentiles, sample_text
+from services.llm_gateway import LLMGateway
+from services.prompts import ANSWER, FLASHCARDS, STUDY_GUIDE, STUDY_PLAN
+
+TOKEN = re.compile(r"\w+|[^\w\s]|\s+")
+
+
+def render(messages):
+    """Flatten chat messages the way a chat template does before tokenizing"""
+    return "".join(f"<|{m['role']}|>\n{m['content']}\n" for m in messages) + "<|assistant|>\n"
+
+
+class StandInOllama(BaseHTTPRequestHandler):
+    ms_per_token = 0.5
+    cached = []
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b'{}')
+        if self.path == '/reset':
+            with self.lock:
+                StandInOllama.cached = []
+            return self._reply({})
+
+        tokens = TOKEN.findall(render(body.get('messages', [])))
+        with self.lock:
+            shared = 0
+            for a, b in zip(tokens, self.cached):
+                if a != b:
+                    break
+                shared += 1
+            evaluated = len(tokens) - shared
+            start = time.perf_counter()
+            time.sleep(evaluated * self.ms_per_token / 1000)
+            StandInOllama.cached = tokens
+
+        self._reply({
+            'model': body.get('model'),
+            'message': {'role': 'assistant', 'content': 'ok'},
+            'done': True,
+            'prompt_eval_count': evaluated,
+            'prompt_eval_duration': int((time.perf_counter() - start) * 1e9),
+            'prompt_tokens': len(tokens)
+        })
+
+    def _reply(self, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def legacy(messages):
+    """The same text with the request parts ahead of the instructions, in one user message"""
+    return [{'role': 'user', 'content': messages[-1]['content'] + "\n\n" + messages[0]['content']}]
+
+
+def chat_workload(n, rng):
+    passages, queries = load_retrieval_corpus()
+    for q in (queries * (n // len(queries) + 1))[:n]:
+        chunks = [p['text'] for p in rng.sample(passages, 5)]
+        context = "\n\n".join(f"[{i + 1}] {chunk}" for i, chunk in enumerate(chunks))
+        yield ANSWER.messages(f"Context from study materials:\n{context}", f"Student's Question: {q['query']}")
+
+
+def flashcard_workload(n, rng):
+    material = sample_text(40, seed=1)[:3000]
+    for _ in range(n):
+        yield FLASHCARDS.messages(f"**Study Material:**\n{material}", f"Generate {rng.randint(5, 20)} flashcards now:")
+
+
+def study_plan_workload(n, rng):
+    materials = "\n".join(f"- chapter_{i}.pdf ({rng.randint(10, 80)} sections)" for i in range(8))
+    today = datetime(2026, 1, 5)
+    for i in range(n):
+        days = rng.randint(3, 30)
+        yield STUDY_PLAN.messages(
+            f"**Workspace**: Data Science\n\n**Materials to Study**:\n{materials}",
+            f"**Days Available**: {days} days\n"
+            f"**Deadline**: {(today + timedelta(days=i + days)).strftime('%B %d, %Y')}\n"
+            f"**Day 1**: {(today + timedelta(days=i + 1)).strftime('%A, %B %d')}\n\n"
+            "Create the complete plan now:"
+        )
+
+
+def study_guide_workload(n, rng):
+    for i in range(n):
+        yield STUDY_GUIDE.messages(
+            f"**STRUCTURED TOPIC OUTLINE**:\n{sample_text(60, seed=100 + i)}",
+            f"**Document**: chapter_{i}.pdf\n**Coverage**: {rng.randint(60, 100)}% of document analyzed\n\n"
+            "Create the complete exam-ready study guide now:"
+        )
+
+
+WORKLOADS = {
+    'chat': chat_workload,
+    'flashcards': flashcard_workload,
+    'study_plan': study_plan_workload,
+    'study_guide': study_guide_workload
+}
+
+
+def run(gateway, host, requests, cold):
+    evaluated, totals, seconds = [], [], []
+    for messages in requests:
+        if cold:
+            gateway.client._client.post(f"{host}/reset", json={})
+        response = gateway.chat(model='stand-in', messages=messages)
+        evaluated.append(response['prompt_eval_count'])
+        totals.append(response['prompt_tokens'])
+        seconds.append(response['prompt_eval_duration'] / 1e9)
+    # The first warm request has nothing cached yet
+    skip = 0 if cold else 1
+    return evaluated[skip:], totals[skip:], seconds[skip:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20)
+    parser.add_argument('--ms-per-token', type=float, default=0.5,
+                        help="simulated prefill cost per evaluated token")
+    args = parser.parse_args()
+
+    StandInOllama.ms_per_token = args.ms_per_token
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"http://127.0.0.1:{server.server_address[1]}"
+    gateway = LLMGateway(host=host)
+
+    print(f"stand-in prefill {args.ms_per_token} ms/token, {args.requests} requests per workload")
+    print(f"{'workload':>12} {'layout':>7} {'prompt tok':>11} {'evaluated':>10} {'reused':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    try:
+        for name, workload in WORKLOADS.items():
+            requests = list(workload(args.requests + 1, random.Random(0)))
+            for layout, cold, batch in [
+                ('cold', True, requests),
+                ('stable', False, requests),
+                ('legacy', False, [legacy(m) for m in requests])
+            ]:
+                evaluated, totals, seconds = run(gateway, host, batch, cold)
+                stats = percentiles(seconds)
+                reused = 1 - sum(evaluated) / sum(totals)
+                print(f"{name:>12} {layout:>7} {sum(totals) / len(totals):>11.0f} {sum(evaluated) / len(evaluated):>10.0f} "
+                      f"{reused:>7.0%} {stats['p50'] * 1000:>8.1f} {stats['p99'] * 1000:>8.1f}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
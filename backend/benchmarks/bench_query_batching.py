@@ -0,0 +1,73 @@
+"""
+Query-encoding latency under concurrent chat users, with and without micro-batching.
+
+    python -m benchmarks.bench_query_batching --users 1 8 32
+    python -m benchmarks.bench_query_batching --max-wait-ms 2 --max-batch 16
+
+Each simulated user encodes --queries queries back to back. "direct" calls
+encode_queries([query]) per request as retrieval used to; "batched" goes through
+QueryBatcher. Latency is measured per query, from submit to vector.
+"""
+import argparse
+import random
+import threading
+import time
+
+from benchmarks.common import percentiles, sample_sentence
+from services.embeddings import EmbeddingService
+from services.query_batcher import QueryBatcher
+
+
+def run_users(encode_one, users, queries_per_user):
+    latencies = []
+    lock = threading.Lock()
+
+    def user(seed):
+        rng = random.Random(seed)
+        for _ in range(queries_per_user):
+            query = sample_sentence(rng, 4, 10)
+            start = time.perf_counter()
+            encode_one(query)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='BAAI/bge-m3')
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--queries', type=int, default=20, help='queries per user')
+    parser.add_argument('--max-batch', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    args = parser.parse_args()
+
+    service = EmbeddingService.encoder_only(args.model)
+    batcher = QueryBatcher(service.encode_queries, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+
+    modes = {
+        'direct': lambda query: service.encode_queries([query])[0],
+        'batched': batcher.encode,
+    }
+
+    service.encode_queries(["warm up"])
+    print(f"{args.model} on {service.model.device.type}, max_batch={args.max_batch}, max_wait={args.max_wait_ms}ms")
+    print(f"{'users':>5} {'mode':>8} {'p50 ms':>8} {'p99 ms':>8} {'queries/s':>10}")
+    for users in args.users:
+        for name, encode_one in modes.items():
+            latencies, wall = run_users(encode_one, users, args.queries)
+            stats = percentiles(latencies)
+            print(f"{users:>5} {name:>8} {stats['p50'] * 1000:>8.1f} {stats['p99'] * 1000:>8.1f} "
+                  f"{len(latencies) / wall:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Rerank gain and cost: recall of the first-stage retrieval against the cross-encoder
+reranked order, at several latency budgets, on the fixed local corpus.
+
+    python -m benchmarks.bench_rerank
+    python -m benchmarks.bench_rerank --reranker BAAI/bge-reranker-base --budgets 0 300 100 50
+
+A budget of 0 means unlimited. "fallback" is the share of queries that ran out of
+budget and kept the retrieval order; pick the smallest budget whose recall holds up.
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks.common import load_retrieval_corpus, percentiles, recall_at_k
+from services.embeddings import EmbeddingService
+from services.reranker import Reranker
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='BAAI/bge-m3')
+    parser.add_argument('--reranker', default='BAAI/bge-reranker-base')
+    parser.add_argument('--mode', default='hybrid', choices=['dense', 'lexical', 'hybrid'])
+    parser.add_argument('--candidates', type=int, default=30)
+    parser.add_argument('--budgets', type=float, nargs='+', default=[0, 300, 100])
+    parser.add_argument('--distractors', type=int, default=2000)
+    parser.add_argument('--top-k', type=int, default=5)
+    args = parser.parse_args()
+
+    passages, queries = load_retrieval_corpus(distractors=args.distractors)
+    relevant = [q['relevant'] for q in queries]
+
+    with tempfile.TemporaryDirectory() as chroma_path:
+        service = EmbeddingService(model_name=args.model, chroma_path=chroma_path, query_batch_wait_ms=0)
+        service.embed_and_store(workspace_id=0, document_id=0, chunks=[p['text'] for p in passages])
+        passage_id = {f"doc0_chunk{i}": p['id'] for i, p in enumerate(passages)}
+
+        retrieved, retrieve_seconds = [], []
+        for q in queries:
+            start = time.perf_counter()
+            retrieved.append(service.retrieve(0, q['query'], args.candidates, mode=args.mode))
+            retrieve_seconds.append(time.perf_counter() - start)
+
+        reranker = Reranker(model_name=args.reranker)
+        reranker.rerank("warm up", ["warm up"], 1)
+
+        first_stage = [[passage_id[i] for i in r['ids'][:args.top_k]] for r in retrieved]
+        stats = percentiles(retrieve_seconds)
+        print(f"{args.mode} retrieval of {args.candidates} candidates, {len(passages)} passages, {len(queries)} queries")
+        print(f"{'stage':>16} {'R@1':>6} {'R@5':>6} {'p50 ms':>8} {'p99 ms':>8} {'fallback':>9}")
+        print(f"{'retrieval':>16} {recall_at_k(first_stage, relevant, 1):>6.2f} "
+              f"{recall_at_k(first_stage, relevant, 5):>6.2f} {stats['p50'] * 1000:>8.1f} {stats['p99'] * 1000:>8.1f} {'-':>9}")
+
+        for budget in args.budgets:
+            ranked, rerank_seconds, fallbacks = [], [], 0
+            for q, r in zip(queries, retrieved):
+                order, report = reranker.rerank(q['query'], r['documents'], args.top_k, budget_ms=budget or None)
+                ranked.append([passage_id[r['ids'][i]] for i in order])
+                rerank_seconds.append(report['ms'] / 1000)
+                fallbacks += not report['reranked']
+
+            stats = percentiles(rerank_seconds)
+            label = f"rerank {int(budget)}ms" if budget else "rerank no limit"
+            print(f"{label:>16} {recall_at_k(ranked, relevant, 1):>6.2f} {recall_at_k(ranked, relevant, 5):>6.2f} "
+                  f"{stats['p50'] * 1000:>8.1f} {stats['p99'] * 1000:>8.1f} {fallbacks / len(queries):>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
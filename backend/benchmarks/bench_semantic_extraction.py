@@ -0,0 +1,59 @@
+"""
+Summarization pass 1: chunks/sec of the single-pass extractor (services.semantic_extractor)
+against the per-pattern extractor it replaced, in-process and over a process pool.
+
+    python -m benchmarks.bench_semantic_extraction
+    python -m benchmarks.bench_semantic_extraction --chunks 20000 --chunk-chars 6000 --workers 4
+
+Correctness is checked separately, without timing, by benchmarks.check_semantic_extraction;
+this script only confirms the outputs it timed are equal.
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.check_semantic_extraction import differences, reference_skeleton, sample_chunks
+from benchmarks.common import best_of
+from services.process_pool import pool_context
+from services.semantic_extractor import extract_skeleton
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chunks', type=int, default=5000)
+    parser.add_argument('--chunk-chars', type=int, default=4000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    chunks = sample_chunks(args.chunks, args.chunk_chars)
+    print(f"{len(chunks)} chunks, {sum(len(c) for c in chunks) / len(chunks):.0f} chars on average")
+
+    reference_seconds, expected = best_of(lambda: reference_skeleton(chunks), args.repeat)
+    serial_seconds, actual = best_of(lambda: extract_skeleton(chunks), args.repeat)
+
+    mismatches = differences(expected, actual)
+    if mismatches:
+        print(f"  outputs differ from the reference ({len(mismatches)} mismatches), see check_semantic_extraction")
+
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=pool_context()) as executor:
+        extract_skeleton(chunks[:1000], executor, args.workers)  # start the workers
+        pool_seconds, pooled = best_of(lambda: extract_skeleton(chunks, executor, args.workers), args.repeat)
+    if differences(actual, pooled):
+        mismatches.append("pool")
+        print("  process pool output differs from in-process output")
+
+    print(f"{'extractor':>26} {'seconds':>8} {'chunks/s':>9} {'speedup':>8}")
+    for label, seconds in [
+        ('reference (per pattern)', reference_seconds),
+        ('single pass', serial_seconds),
+        (f'single pass, {args.workers} processes', pool_seconds)
+    ]:
+        print(f"{label:>26} {seconds:>8.2f} {len(chunks) / seconds:>9.0f} {reference_seconds / seconds:>7.1f}x")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Check of the conversation memory bookkeeping: over simulated conversations, every earlier
+turn must reach the prompt, either folded into the summary or verbatim among the turns
+load() returns; and follow-up detection must tell follow-ups from standalone questions.
+Deterministic and untimed; exits non-zero on failure.
+
+    python -m benchmarks.check_conversation_memory --turns 60
+
+The summary refresh is simulated with turns_to_fold, finishing either before the next
+question arrives or one question late (the background thread still busy). No database
+or LLM is needed.
+"""
+import argparse
+import sys
+
+from services.conversation_memory import ConversationMemory, looks_like_follow_up, turns_to_fold
+
+FOLLOW_UPS = [
+    "Why is that?",
+    "What does this mean?",
+    "Can you explain it with an example?",
+    "And for data frames?",
+    "What about missing values?",
+    "Tell me more",
+    "Could you elaborate on the second step?",
+    "How do they differ?",
+    "Give me another example",
+    "Is the above formula right?",
+    "Can you explain that step again",
+    "So which one should I use",
+]
+STANDALONE = [
+    "What is a tibble?",
+    "How do I filter rows that contain NA values in dplyr?",
+    "Explain the difference between mutate and transmute",
+    "What are the assumptions of linear regression",
+    "How many more observations do I need for a t-test?",
+    "Which functions are also available in base R?",
+    "Is this package on CRAN: ggplot2?",
+    "Show the same plot with facets by species",
+]
+
+
+def dropped_turns(memory, turns, lag):
+    """Turn numbers that a load() saw neither in the summary nor among its turns"""
+    covered = 0
+    refreshes = []  # covered_through values a finished refresh will store, in order
+    dropped = set()
+    for turn in range(1, turns + 1):
+        if len(refreshes) > lag:
+            covered = max(covered, refreshes.pop(0))
+
+        pending = list(range(covered + 1, turn))
+        recent = pending[-memory.unsummarized_limit:]
+        dropped.update(set(pending) - set(recent))
+
+        # The reply is saved, then a refresh runs on what is pending by the time it starts
+        pending.append(turn)
+        foldable = turns_to_fold(pending, memory.window_turns, memory.summarize_after)
+        refreshes.append(foldable[-1] if foldable else covered)
+    return dropped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=60)
+    args = parser.parse_args()
+
+    failures = []
+    memory = ConversationMemory()
+    for window_turns in range(1, 6):
+        for summarize_after in range(1, 6):
+            memory.window_turns, memory.summarize_after = window_turns, summarize_after
+            for lag in (0, 1):
+                dropped = dropped_turns(memory, args.turns, lag)
+                if dropped:
+                    failures.append(f"window {window_turns}, summarize after {summarize_after}, "
+                                    f"refresh lag {lag}: turns {sorted(dropped)[:5]} dropped")
+    print(f"memory: 50 settings over {args.turns} turns, {len(failures)} dropping turns")
+
+    misread = [f"not a follow-up: {q!r}" for q in FOLLOW_UPS if not looks_like_follow_up(q)]
+    misread += [f"follow-up: {q!r}" for q in STANDALONE if looks_like_follow_up(q)]
+    print(f"follow-ups: {len(FOLLOW_UPS) + len(STANDALONE)} questions, {len(misread)} misread")
+    failures += misread
+
+    for line in failures[:10]:
+        print(f"  {line}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
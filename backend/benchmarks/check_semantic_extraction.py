@@ -0,0 +1,154 @@
+"""
+Differential check of summarization pass 1: the single-pass extractor
+(services.semantic_extractor) against the per-pattern extractor it replaced, kept below
+as the reference. Deterministic and untimed; exits non-zero on any mismatch.
+
+    python -m benchmarks.check_semantic_extraction
+    python -m benchmarks.check_semantic_extraction --chunks 20000 --workers 4
+
+Every section must equal the reference's, field by field and exactly. The old extractor
+picked key terms through a set, so it returned an arbitrary 8 of them; the reference here
+keeps them in order of first occurrence, as the new extractor does, so key_terms are
+compared exactly too. With --workers above 1, the process-pool path is checked as well.
+"""
+import argparse
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.common import sample_sentence
+from services.process_pool import pool_context
+from services.semantic_extractor import PATTERNS, SemanticSection, clean_heading, extract_skeleton, section_has_content
+
+PHRASES = [
+    "{w} is defined as {s}", "A tibble is a {s}", "The pipe refers to {s}", "This means that {s}",
+    "Step 1: {s}", "The algorithm {s}", "For example, {s}", "such as {s}", "e.g. {s}",
+    "Therefore {s}", "In summary, {s}", "Thus {s}", "The method {s}", "In conclusion: {s}"
+]
+# Letters IGNORECASE folds onto ASCII; chunks holding them take the extractor's fallback path
+FOLDING_PHRASES = ["The ſtep {s}", "İnstance: {s}", "ıs a {s}"]
+TERMS = ['mutate', 'filter', 'ggplot', 'select', 'arrange', 'summarise', 'tibble', 'pivot_longer',
+         'left_join', 'str_detect', 'fct_reorder', 'ymd']
+
+# Hand-written edge cases: overlapping phrases, matches at the very start and end,
+# mixed case, and more than 8 distinct key terms
+EDGE_CASES = [
+    "",
+    "is a",
+    "This is a test. This is the end.",
+    "For example: e.g. such as instance: nested example: text",
+    "STEP 1: Do it\n\nstep 2: again\n\nPROCEDURE: last",
+    "Thus therefore hence: in summary, to summarize: done",
+    " ".join(f"**{term}**" for term in TERMS) + " and __" + TERMS[0] + "__ again",
+    '"tidy data" is a shape. "tidy data" refers to rows. "x" means one',
+    "# Heading\n- bullet one\n* bullet two\n1. first\n2) second\nY = a + b and $x^2$ ∑",
+    "In Conclusion the method is defined as  \n\nFor Example, Such As e.g. this",
+]
+
+
+def sample_chunk(rng, chars, folding=False):
+    """Textbook-like chunk: headings, bullets, numbered steps, formulas, terms and prose"""
+    parts = []
+    while sum(len(p) for p in parts) < chars:
+        kind = rng.random()
+        if kind < 0.08:
+            parts.append(rng.choice(["# ", "## ", ""]) + sample_sentence(rng, 2, 5).rstrip('.?!') + rng.choice(["", ":"]))
+        elif kind < 0.2:
+            parts.append("\n".join(f"{rng.choice(['-', '*', '•'])} {sample_sentence(rng, 3, 8)}" for _ in range(rng.randint(2, 5))))
+        elif kind < 0.3:
+            parts.append("\n".join(f"{i}. {sample_sentence(rng, 3, 8)}" for i in range(1, rng.randint(2, 5))))
+        elif kind < 0.36:
+            parts.append(f"Y = {rng.choice(['b0 + b1*x', 'mean(x)', 'n - 1'])} and $\\sum x_i$ over rows.")
+        elif kind < 0.45:
+            parts.append(f"Use **{rng.choice(TERMS)}** with \"{rng.choice(TERMS)} data\" is {sample_sentence(rng, 3, 6)}")
+        elif kind < 0.7:
+            parts.append(rng.choice(PHRASES + (FOLDING_PHRASES if folding else [])).format(w=rng.choice(['Data', 'A join']), s=sample_sentence(rng)))
+        else:
+            parts.append(" ".join(sample_sentence(rng) for _ in range(rng.randint(2, 6))))
+        parts.append(rng.choice(["\n", "\n\n", " "]))
+    return "".join(parts)
+
+
+def sample_chunks(count, chunk_chars, seed=0):
+    """Short and long chunks alike, and a few with case-folding letters, after the edge cases"""
+    rng = random.Random(seed)
+    return EDGE_CASES + [
+        sample_chunk(rng, rng.choice([200, chunk_chars // 2, chunk_chars]), folding=i % 50 == 0)
+        for i in range(count)
+    ]
+
+
+def reference_skeleton(chunks):
+    """The former SummarizationService._extract_semantic_skeleton: every pattern over every chunk"""
+    patterns = PATTERNS
+    semantic_sections = []
+    for idx, chunk in enumerate(chunks):
+        section = SemanticSection(section_number=idx + 1, heading=None, definitions=[], bullet_points=[],
+                                  enumerations=[], formulas=[], algorithms=[], examples=[],
+                                  conclusions=[], key_terms=[])
+
+        heading_matches = patterns['heading'].findall(chunk[:500])
+        if heading_matches:
+            section.heading = next((h for h in heading_matches[0] if h), None)
+            if section.heading:
+                section.heading = clean_heading(section.heading)
+
+        section.definitions = [d.strip() for d in patterns['definition'].findall(chunk) if d.strip()][:3]
+        section.bullet_points = [b.strip() for b in patterns['bullet'].findall(chunk) if b.strip()][:10]
+        section.enumerations = [e.strip() for e in patterns['enumeration'].findall(chunk) if e.strip()][:10]
+        section.formulas = [f.strip() for f in patterns['formula'].findall(chunk) if f.strip()][:5]
+        section.algorithms = [a.strip()[:200] for a in patterns['algorithm'].findall(chunk) if a.strip()][:2]
+        section.examples = [ex.strip()[:300] for ex in patterns['example'].findall(chunk) if ex.strip()][:2]
+        section.conclusions = [c.strip()[:200] for c in patterns['conclusion'].findall(chunk) if c.strip()][:2]
+        term_matches = patterns['key_term'].findall(chunk)
+        # Was list(set(...))[:8]; first occurrences make the pick deterministic
+        section.key_terms = list(dict.fromkeys(
+            term for terms in term_matches
+            for term in terms if term and len(term) > 2
+        ))[:8]
+
+        if section_has_content(section):
+            semantic_sections.append(section)
+    return semantic_sections
+
+
+def differences(expected, actual):
+    """Human-readable mismatches between two skeletons; every field must be equal"""
+    if [s.section_number for s in expected] != [s.section_number for s in actual]:
+        return ["different sections have content"]
+
+    found = []
+    for old, new in zip(expected, actual):
+        for field in SemanticSection.__dataclass_fields__:
+            a, b = getattr(old, field), getattr(new, field)
+            if a != b:
+                found.append(f"section {old.section_number} {field}: {a!r} != {b!r}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chunks', type=int, default=5000)
+    parser.add_argument('--chunk-chars', type=int, default=4000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=2, help="processes for the pool check (1 skips it)")
+    args = parser.parse_args()
+
+    chunks = sample_chunks(args.chunks, args.chunk_chars, args.seed)
+    expected = reference_skeleton(chunks)
+    mismatches = differences(expected, extract_skeleton(chunks))
+    print(f"in-process: {len(chunks)} chunks, {len(expected)} sections, {len(mismatches)} mismatches")
+
+    if args.workers > 1:
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=pool_context()) as executor:
+            pooled = differences(expected, extract_skeleton(chunks, executor, args.workers))
+        print(f"process pool ({args.workers} workers): {len(pooled)} mismatches")
+        mismatches += pooled
+
+    for line in mismatches[:10]:
+        print(f"  {line}")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Check that EmbeddingService keeps working when another worker process changes a
+workspace behind its back: deletes and recreates the collection (a reused workspace id),
+or replaces a document with one of the same size. A second service on its own client
+plays the other worker; every call the app makes through the first must then see the
+new data. Deterministic and untimed; exits non-zero on failure.
+
+    python -m benchmarks.check_stale_collections
+
+Runs against a throwaway PersistentClient in a temporary directory; no model is loaded,
+so searches go through the lexical path.
+"""
+import sys
+import tempfile
+
+import chromadb
+
+from services.embeddings import EmbeddingService
+from services.metrics import metrics
+
+WORKSPACE_ID = 1
+OLD_TEXTS = ["tibbles print only the first ten rows"]
+NEW_TEXTS = ["ggplot maps variables to aesthetics", "mutate adds new columns to a data frame"]
+SAME_SIZE_TEXTS = ["pivot_longer lengthens wide tables", "left_join keeps every row of x"]
+
+
+def add_document(service, document_id, texts):
+    """What ingestion does, with made-up vectors in place of the model's"""
+    ids = [f"doc{document_id}_chunk{i}" for i in range(len(texts))]
+    service.get_or_create_collection(WORKSPACE_ID).add(
+        ids=ids,
+        embeddings=[[1.0, float(i)] for i in range(len(texts))],
+        documents=texts,
+        metadatas=[{"document_id": document_id, "chunk_index": i} for i in range(len(texts))]
+    )
+    service.lexical.add(WORKSPACE_ID, ids, texts)
+
+
+def recreate_workspace(other):
+    other.delete_workspace_collection(WORKSPACE_ID)
+    add_document(other, 2, NEW_TEXTS)
+
+
+def replace_document(other):
+    """Delete document 2 and upload one with the same number of chunks"""
+    other.delete_document(WORKSPACE_ID, 2)
+    add_document(other, 4, SAME_SIZE_TEXTS)
+
+
+def delete_out_of_band(chroma_path):
+    """A chunk deleted without going through EmbeddingService, so no generation is bumped"""
+    chromadb.PersistentClient(path=chroma_path).get_collection(f"workspace_{WORKSPACE_ID}").delete(ids=['doc2_chunk0'])
+
+
+def lexical_ids(service, query, top_k=2):
+    return service.retrieve(WORKSPACE_ID, query, top_k=top_k, mode='lexical')['ids']
+
+
+def run_checks(service, other, chroma_path):
+    """(name, passed, detail) for each call the app makes on a workspace another worker changed"""
+    collection = service.get_or_create_collection(WORKSPACE_ID)
+    recreate = lambda: recreate_workspace(other)
+
+    def replace():
+        recreate_workspace(other)
+        lexical_ids(service, "ggplot")  # index the workspace as it is before the replacement
+        replace_document(other)
+
+    def out_of_band():
+        recreate_workspace(other)
+        lexical_ids(service, "ggplot")
+        delete_out_of_band(chroma_path)
+
+    checks = [
+        ('count', recreate, lambda: collection.count(), len(NEW_TEXTS)),
+        ('get where', recreate, lambda: collection.get(where={"document_id": 2}, include=[])['ids'], ['doc2_chunk0', 'doc2_chunk1']),
+        ('get ids', recreate, lambda: collection.get(ids=['doc2_chunk1'])['documents'], NEW_TEXTS[1:]),
+        ('query', recreate, lambda: collection.query(query_embeddings=[[1.0, 1.0]], n_results=1)['ids'][0], ['doc2_chunk1']),
+        ('lexical search', recreate, lambda: lexical_ids(service, "ggplot aesthetics", 1), ['doc2_chunk0']),
+        ('copy_document', recreate, lambda: service.copy_document(WORKSPACE_ID, 2, WORKSPACE_ID, 3), len(NEW_TEXTS)),
+        ('delete_document', recreate, lambda: service.delete_document(WORKSPACE_ID, 2), len(NEW_TEXTS)),
+        ('same-size replace', replace, lambda: lexical_ids(service, "pivot_longer left_join"), ['doc4_chunk0', 'doc4_chunk1']),
+        ('out-of-band delete', out_of_band, lambda: lexical_ids(service, "ggplot mutate"), ['doc2_chunk1']),
+        ('rebuilt after it', lambda: None, lambda: lexical_ids(service, "ggplot mutate"), ['doc2_chunk1']),
+    ]
+
+    results = []
+    for name, change, call, expected in checks:
+        change()
+        try:
+            actual = call()
+        except BaseException as e:
+            results.append((name, False, f"{type(e).__name__}: {e}"))
+            continue
+        results.append((name, actual == expected, f"{actual!r}, expected {expected!r}"))
+    return results
+
+
+def main():
+    with tempfile.TemporaryDirectory() as chroma_path:
+        service = EmbeddingService.store_only(chroma_path)
+        add_document(service, 1, OLD_TEXTS)
+        lexical_ids(service, "tibbles")
+        other = EmbeddingService.store_only(chroma_path)
+
+        results = run_checks(service, other, chroma_path)
+
+    failures = [r for r in results if not r[1]]
+    for name, passed, detail in results:
+        print(f"{name:>18} {'ok' if passed else 'FAIL'}  {detail}")
+    print(f"{len(results)} checks, {len(failures)} failures, "
+          f"{metrics.counter('embedding.stale_collections'):.0f} stale handles refetched, "
+          f"{metrics.counter('retrieval.lexical_stale'):.0f} stale lexical indexes dropped")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Shared helpers for the benchmark scripts. Run benchmarks from the backend directory,
+e.g. `python -m benchmarks.bench_pdf_extraction`.
+"""
+import json
+import os
+import random
+import statistics
+import time
+
+VOCABULARY = [
+    'data', 'frame', 'tibble', 'variable', 'observation', 'value', 'function', 'argument',
+    'pipe', 'filter', 'select', 'mutate', 'summarise', 'arrange', 'group_by', 'inner_join',
+    'left_join', 'geom_point', 'ggplot', 'aesthetic', 'layer', 'model', 'residual', 'vector',
+    'factor', 'string', 'pattern', 'iteration', 'map', 'the', 'a', 'of', 'to', 'and', 'is',
+    'in', 'each', 'row', 'column', 'returns', 'uses', 'with', 'for', 'every', 'new', 'tidy'
+]
+
+
+def sample_sentence(rng, min_words=6, max_words=16):
+    words = [rng.choice(VOCABULARY) for _ in range(rng.randint(min_words, max_words))]
+    return ' '.join(words).capitalize() + rng.choice(['.', '.', '.', '?', '!'])
+
+
+def sample_text(n_sentences, seed=0):
+    rng = random.Random(seed)
+    return ' '.join(sample_sentence(rng) for _ in range(n_sentences))
+
+
+def _pdf_escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_sample_pdf(path, pages, lines_per_page=45, seed=0):
+    """Write a plain-text PDF (Helvetica, one sentence per line) with no third-party dependency"""
+    rng = random.Random(seed)
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+
+    kids = []
+    next_id = 4
+    for _ in range(pages):
+        page_id, content_id = next_id, next_id + 1
+        next_id += 2
+        kids.append(f"{page_id} 0 R")
+
+        lines = ' '.join(f"({_pdf_escape(sample_sentence(rng, 6, 12))}) Tj T*" for _ in range(lines_per_page))
+        stream = f"BT /F1 10 Tf 14 TL 40 800 Td {lines} ET".encode('latin-1')
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode('latin-1')
+        objects[content_id] = b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>".encode('latin-1')
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for object_id in sorted(objects):
+        offsets[object_id] = len(out)
+        out += b"%d 0 obj\n%s\nendobj\n" % (object_id, objects[object_id])
+
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for object_id in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[object_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def best_of(fn, repeat=3):
+    """Run fn `repeat` times; return (best seconds, last result)"""
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+    return {'p50': pick(50), 'p99': pick(99), 'mean': statistics.fmean(ordered)}
+
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'data', 'retrieval_corpus.json')
+
+
+def load_retrieval_corpus(distractors=0, seed=0):
+    """
+    The fixed retrieval corpus: (passages, queries) where passages is a list of
+    {'id', 'text'} and each query lists the ids of its relevant passages. Generated
+    filler passages (ids 'distractor-N') can be appended to make retrieval harder.
+    """
+    with open(CORPUS_PATH) as f:
+        corpus = json.load(f)
+
+    rng = random.Random(seed)
+    passages = list(corpus['passages'])
+    for i in range(distractors):
+        text = ' '.join(sample_sentence(rng) for _ in range(rng.randint(2, 6)))
+        passages.append({'id': f'distractor-{i}', 'text': text})
+    return passages, corpus['queries']
+
+
+def recall_at_k(ranked_ids, relevant, k):
+    """Fraction of queries with at least one relevant id among the first k ranked ids"""
+    hits = sum(1 for ids, wanted in zip(ranked_ids, relevant) if set(ids[:k]) & set(wanted))
+    return hits / len(relevant) if relevant else 0.0
@@ -4,3 +4,93 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("SQLALCHEMY_DATABASE_URI")
     SESSION_TYPE = 'filesystem'
     UPLOAD_FOLDER = './uploads'
+
+    EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-m3")
+    CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_db")
+    # Embedding inference backend: torch (fp32), int8 (dynamic-quantized torch) or onnx
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+    # Where the onnx backend keeps its exported model, so it is converted only on the first start
+    ONNX_CACHE_DIR = os.getenv("ONNX_CACHE_DIR", "./onnx_models")
+    # Encode batch size; 0 picks one from the device, CPU cores and available memory
+    EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "0")) or None
+    # Chat queries arriving within this window share one encode call (0 disables batching)
+    QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", "5"))
+    QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", "32"))
+    # Seconds a chat query waits for its batched encoding before the request fails
+    QUERY_BATCH_TIMEOUT = float(os.getenv("QUERY_BATCH_TIMEOUT", "30"))
+    # Memory cap of the query-embedding LRU cache (0 disables it)
+    QUERY_CACHE_MB = float(os.getenv("QUERY_CACHE_MB", "32"))
+    # Chat retrieval: dense, lexical (BM25) or hybrid (both, fused by reciprocal rank)
+    RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+    # BM25 indexes kept in memory per process, one per recently searched workspace
+    LEXICAL_INDEX_WORKSPACES = int(os.getenv("LEXICAL_INDEX_WORKSPACES", "64"))
+    # Cross-encoder reranking of RERANK_CANDIDATES retrieved chunks (empty model name disables it);
+    # past RERANK_BUDGET_MS the retrieval order is kept
+    RERANK_MODEL = os.getenv("RERANK_MODEL", "")
+    RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+    RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))
+    # Prompt context is packed from CONTEXT_CANDIDATES chunks up to this many tokens
+    # (0 falls back to the five best chunks as they are)
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+    CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "12"))
+    LLM_MODEL = os.getenv("LLM_MODEL", "qwen:7b")
+    FLASHCARD_MODEL = os.getenv("FLASHCARD_MODEL", "llama3.1")
+    # Build the embedding model at import time instead of on the first request
+    # (useful with `gunicorn --preload "app:create_app()"` so forked workers share the pages)
+    PRELOAD_SERVICES = os.getenv("PRELOAD_SERVICES", "false").lower() == "true"
+    # /metrics answers requests carrying "Authorization: Bearer <METRICS_TOKEN>". With no token set
+    # it answers only requests from this machine (behind a reverse proxy, the proxy counts as local)
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+    # Background ingestion workers per process (extraction + chunking + embedding)
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+
+    # Semantic answer cache in front of the chat LLM call
+    ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+    ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "3600"))
+    ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+
+    # Concurrent LLM calls for workspace summaries and batch chat; keep in step with Ollama's own setting
+    OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "1"))
+    # Shared Ollama gateway: generations beyond OLLAMA_NUM_PARALLEL wait in a priority queue
+    # (chat before summaries/flashcards/study plans) and are refused with 429 once it is full
+    OLLAMA_HOST = os.getenv("OLLAMA_HOST")
+    LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "32"))
+    LLM_MAX_BATCH_QUEUE = int(os.getenv("LLM_MAX_BATCH_QUEUE", "8"))
+    LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+    LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+    LLM_REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", "300"))
+    # Keep the model, and with it the prompt cache of the shared instruction prefixes, loaded
+    # between requests. One context size for every call, since changing it reloads the model.
+    LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "30m")
+    LLM_NUM_CTX = int(os.getenv("LLM_NUM_CTX", "8192"))
+    # Most questions accepted by one batch chat request
+    CHAT_BATCH_MAX_QUESTIONS = int(os.getenv("CHAT_BATCH_MAX_QUESTIONS", "20"))
+    # Conversation memory: turns not yet summarized go into the prompt verbatim (answers cut to
+    # CHAT_MEMORY_ANSWER_CHARS). Turns older than the last CHAT_MEMORY_TURNS are folded into a running
+    # summary in the background once CHAT_MEMORY_SUMMARIZE_AFTER of them have piled up, so a prompt
+    # carries up to CHAT_MEMORY_TURNS + CHAT_MEMORY_SUMMARIZE_AFTER turns
+    CHAT_MEMORY_TURNS = int(os.getenv("CHAT_MEMORY_TURNS", "3"))
+    CHAT_MEMORY_ANSWER_CHARS = int(os.getenv("CHAT_MEMORY_ANSWER_CHARS", "1500"))
+    CHAT_MEMORY_SUMMARIZE_AFTER = int(os.getenv("CHAT_MEMORY_SUMMARIZE_AFTER", "4"))
+    # Rewrite follow-up questions into standalone retrieval queries
+    CHAT_QUERY_REWRITE = os.getenv("CHAT_QUERY_REWRITE", "true").lower() == "true"
+
+    # Document summaries: "single" (one LLM call over an outline cut at 7000 chars), "map_reduce"
+    # (notes per topic group, then one call over the notes) or "auto" (map-reduce when the outline is cut).
+    # The notes of all groups must fit SUMMARY_REDUCE_INPUT_TOKENS next to the 3500-token answer in LLM_NUM_CTX.
+    SUMMARY_MODE = os.getenv("SUMMARY_MODE", "auto")
+    SUMMARY_GROUP_INPUT_TOKENS = int(os.getenv("SUMMARY_GROUP_INPUT_TOKENS", "1500"))
+    SUMMARY_GROUP_NOTES_TOKENS = int(os.getenv("SUMMARY_GROUP_NOTES_TOKENS", "200"))
+    SUMMARY_REDUCE_INPUT_TOKENS = int(os.getenv("SUMMARY_REDUCE_INPUT_TOKENS", "4000"))
+    # Topic group notes kept in the database (least recently used pruned first), so an edited
+    # document only re-summarizes the groups that changed (0 disables them)
+    SUMMARY_GROUP_CACHE_SIZE = int(os.getenv("SUMMARY_GROUP_CACHE_SIZE", "1024"))
+    # Processes for summarization pass 1 on large documents (defaults to the CPU count)
+    SUMMARY_EXTRACT_WORKERS = int(os.getenv("SUMMARY_EXTRACT_WORKERS", "0")) or None
+
+    # Processes used to extract PDF pages (defaults to the CPU count)
+    PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", "0")) or None
+
+    # Chunk size and sentence overlap, in embedding-model tokens
+    CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "128"))
+    CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "24"))
@@ -50,6 +50,14 @@ class ChatMessage(db.Model):
     ai_response = db.Column(db.Text, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.now)
 
+class ConversationSummary(db.Model):
+    __tablename__ = 'conversation_summaries'
+    workspace_id = db.Column(db.Integer, db.ForeignKey('workspace.id'), primary_key=True)
+    # Running summary of every chat turn up to and including covered_through_id
+    summary = db.Column(db.Text, nullable=False, default='')
+    covered_through_id = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.now)
+
 class StudyPlan(db.Model):
     __tablename__ = 'study_plans'
     id = db.Column(db.Integer, primary_key=True)
@@ -72,4 +80,55 @@ class Flashcard(db.Model):
     created_at = db.Column(db.DateTime, default= datetime.now())
     last_reviewed = db.Column(db.DateTime)
 
-    workspace = db.relationship("Workspace", backref='flashcards', lazy=True)
\ No newline at end of file
+    workspace = db.relationship("Workspace", backref='flashcards', lazy=True)
+
+class IngestionJob(db.Model):
+    __tablename__ = 'ingestion_job'
+    id = db.Column(db.String(36), primary_key=True)
+    workspace_id = db.Column(db.Integer, db.ForeignKey('workspace.id'))
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'))
+    filename = db.Column(db.String(300), nullable=False)
+    status = db.Column(db.String(20), default='queued')  # queued, running, completed, failed
+    # Process that queued the job and runs it (services.ingestion.process_owner)
+    owner = db.Column(db.String(200))
+    stage = db.Column(db.String(20))  # extracting, chunking, embedding
+    pages_total = db.Column(db.Integer, default=0)
+    pages_extracted = db.Column(db.Integer, default=0)
+    chunks_total = db.Column(db.Integer, default=0)
+    chunks_embedded = db.Column(db.Integer, default=0)
+    timings = db.Column(db.Text)  # JSON: seconds spent per stage
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    finished_at = db.Column(db.DateTime)
+
+
+class DocumentSummary(db.Model):
+    __tablename__ = 'document_summaries'
+    id = db.Column(db.Integer, primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), index=True)
+    # sha256 over the document's chunks, the model name and the prompt version
+    content_hash = db.Column(db.String(64), nullable=False)
+    model_name = db.Column(db.String(100))
+    prompt_version = db.Column(db.String(20))
+    summary_json = db.Column(db.Text, nullable=False)
+    generated_at = db.Column(db.DateTime, default=datetime.now)
+
+
+class TopicGroupNotes(db.Model):
+    __tablename__ = 'topic_group_notes'
+    # sha256 over a topic group's outline, the model, the prompt and the notes budget
+    # (SummarizationService._group_cache_key), so unchanged groups keep their notes
+    cache_key = db.Column(db.String(64), primary_key=True)
+    notes = db.Column(db.Text, nullable=False)
+    last_used_at = db.Column(db.DateTime, default=datetime.now, index=True)
+
+
+class DocumentFile(db.Model):
+    __tablename__ = 'document_files'
+    document_id = db.Column(db.Integer, db.ForeignKey('document.id'), primary_key=True)
+    # sha256 of the uploaded bytes; uploads are stored under this name, so identical files share one copy
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    size_bytes = db.Column(db.Integer)
+    # EmbeddingService.chunk_store_name (model, backend, encoding version) the vectors were made with;
+    # only copies made the same way are reused on re-upload
+    embedding_store = db.Column(db.String(64))
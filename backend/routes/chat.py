@@ -1,30 +1,58 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, stream_with_context
 from flask_login import login_required, current_user
 from models import db, Workspace, ChatMessage
-from services.rag_pipeline import RagPipeline
-from services.embeddings import EmbeddingService
-from services.llm_service import LLMService
-
-embedding_service = EmbeddingService()
-llm_service = LLMService()
-rag_pipeline = RagPipeline(embedding_service=embedding_service, llm_service=llm_service)
+from config import Config
+from services.registry import services
+from services.metrics import metrics
+from services.retrieval_filters import build_where
+from services.llm_gateway import LLMGatewayError, INTERACTIVE
+from services.conversation_memory import conversation_memory
+import json
+import time
 
 chat_bp = Blueprint('chat',__name__)
 
+
+def _retrieval_filter(data):
+    """
+    Optional `document_ids` (list) and `page_from` / `page_to` (1-based, inclusive) from
+    the request body, as a Chroma where clause. Returns (where, error message).
+    """
+    try:
+        document_ids = [int(i) for i in data.get('document_ids') or []]
+        page_from = int(data['page_from']) if data.get('page_from') is not None else None
+        page_to = int(data['page_to']) if data.get('page_to') is not None else None
+    except (TypeError, ValueError):
+        return None, "document_ids must be a list of ids and page_from/page_to must be integers"
+
+    if page_from is not None and page_to is not None and page_from > page_to:
+        return None, "page_from must not be greater than page_to"
+
+    return build_where(document_ids, page_from, page_to), None
+
+
 @chat_bp.route('/workspaces/<int:workspace_id>/chat', methods=["POST"])
 @login_required
 def chat(workspace_id):
     workspace = Workspace.query.get(workspace_id)
     if not workspace or workspace.user_id != current_user.id:
         return jsonify({"error":"Unauthorized"}),401
-    
+
     data = request.json
     question = data['message']
+    where, error = _retrieval_filter(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    start = time.perf_counter()
+    conversation = conversation_memory.load(workspace_id, question)
+    answer = services.rag.answer_question(workspace_id, question, where, conversation)
+    metrics.observe('chat.total', time.perf_counter() - start)
 
-    answer = rag_pipeline.answer_question(workspace_id, question)
     chat = ChatMessage(workspace_id = workspace_id, user_message=question, ai_response=answer)
     db.session.add(chat)
     db.session.commit()
+    conversation_memory.schedule_refresh(workspace_id)
 
     return jsonify({
         'answer':answer,
@@ -32,13 +60,126 @@ def chat(workspace_id):
     })
 
 
+@chat_bp.route('/workspaces/<int:workspace_id>/chat/batch', methods=["POST"])
+@login_required
+def chat_batch(workspace_id):
+    """
+    Answer a list of questions: one retrieval pass for all, LLM calls in parallel, one commit.
+    The questions are answered independently of each other and of the conversation.
+    """
+    workspace = Workspace.query.get(workspace_id)
+    if not workspace or workspace.user_id != current_user.id:
+        return jsonify({"error":"Unauthorized"}),401
+
+    data = request.json
+    questions = data.get('messages')
+    if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q.strip() for q in questions):
+        return jsonify({"error": "messages must be a non-empty list of questions"}), 400
+    if len(questions) > Config.CHAT_BATCH_MAX_QUESTIONS:
+        return jsonify({"error": f"At most {Config.CHAT_BATCH_MAX_QUESTIONS} questions per batch"}), 400
+
+    where, error = _retrieval_filter(data)
+    if error:
+        return jsonify({"error": error}), 400
+    services.llm_gateway.check_admission(INTERACTIVE)
+
+    start = time.perf_counter()
+    results = services.rag.answer_many(
+        workspace_id, questions, where, max_parallel=Config.OLLAMA_NUM_PARALLEL
+    )
+    metrics.observe('chat_batch.total', time.perf_counter() - start)
+    metrics.incr('chat_batch.questions', len(questions))
+
+    chats = []
+    for question, (answer, error) in zip(questions, results):
+        if error is None:
+            chats.append(ChatMessage(workspace_id = workspace_id, user_message=question, ai_response=answer))
+    db.session.add_all(chats)
+    db.session.commit()
+    conversation_memory.schedule_refresh(workspace_id)
+
+    saved = iter(chats)
+    response = []
+    for question, (answer, error) in zip(questions, results):
+        if error is not None:
+            response.append({'question': question, 'error': 'Failed to generate answer'})
+        else:
+            response.append({'question': question, 'answer': answer, 'timestamp': next(saved).timestamp.isoformat()})
+
+    return jsonify({'results': response})
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@chat_bp.route('/workspaces/<int:workspace_id>/chat/stream', methods=["POST"])
+@login_required
+def chat_stream(workspace_id):
+    """Server-sent events: one `token` event per generated token, then `done` once the message is saved"""
+    workspace = Workspace.query.get(workspace_id)
+    if not workspace or workspace.user_id != current_user.id:
+        return jsonify({"error":"Unauthorized"}),401
+
+    data = request.json
+    question = data['message']
+    where, error = _retrieval_filter(data)
+    if error:
+        return jsonify({"error": error}), 400
+    # Turn the request away with a 429 before the event stream starts
+    services.llm_gateway.check_admission(INTERACTIVE)
+
+    def generate():
+        start = time.perf_counter()
+        first_token_seconds = None
+        parts = []
+
+        try:
+            conversation = conversation_memory.load(workspace_id, question)
+            for token in services.rag.stream_answer(workspace_id, question, where, conversation):
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - start
+                    metrics.observe('chat_stream.first_token', first_token_seconds)
+                parts.append(token)
+                yield _sse('token', {'token': token})
+        except LLMGatewayError as e:
+            yield _sse('error', {'error': str(e), 'status': e.status_code})
+            return
+        except Exception as e:
+            print(f"Error streaming answer: {e}")
+            yield _sse('error', {'error': 'Failed to generate answer'})
+            return
+
+        total_seconds = time.perf_counter() - start
+        metrics.observe('chat_stream.total', total_seconds)
+
+        answer = "".join(parts)
+        chat = ChatMessage(workspace_id = workspace_id, user_message=question, ai_response=answer)
+        db.session.add(chat)
+        db.session.commit()
+        conversation_memory.schedule_refresh(workspace_id)
+
+        yield _sse('done', {
+            'answer': answer,
+            'timestamp': chat.timestamp.isoformat(),
+            'first_token_ms': round((first_token_seconds or total_seconds) * 1000, 1),
+            'total_ms': round(total_seconds * 1000, 1)
+        })
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @chat_bp.route('/workspaces/<int:workspace_id>/chat/history', methods=['GET'])
 @login_required
 def chat_history(workspace_id):
     workspace = Workspace.query.get(workspace_id)
     if not workspace or workspace.user_id != current_user.id:
         return jsonify({"error":"Unauthorized"}),401
-    
+
     messages = ChatMessage.query.filter_by(workspace_id=workspace_id).order_by(ChatMessage.timestamp).all()
 
     return jsonify([{
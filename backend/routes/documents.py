@@ -1,16 +1,14 @@
 from flask import Blueprint, jsonify, request
 from werkzeug.utils import secure_filename
 from flask_login import login_required, current_user
-from models import db, Workspace, Document
+from models import db, Workspace, Document, IngestionJob, DocumentSummary, DocumentFile
 from config import Config
 import os
-from services.document_processor import DocumentProcessor
-from services.embeddings import EmbeddingService
+from services.registry import services
+from services.ingestion import ingestion_queue
+from services.file_store import save_upload, release_upload
 from datetime import datetime
 
-doc_processor = DocumentProcessor()
-embebbing_service = EmbeddingService()
-
 document_bp = Blueprint('document',__name__)
 
 @document_bp.route("/workspaces/<int:workspace_id>/upload", methods=['POST'])
@@ -25,30 +23,24 @@ def upload_document(workspace_id):
     
     file = request.files['file']
     filename = secure_filename(file.filename)
-    filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
-    file.save(filepath)
-
-    if filename.endswith('.pdf'):
-        text = doc_processor.extract_text_from_pdf(filepath)
-    elif filename.endswith('.docx'):
-        text = doc_processor.extract_text_from_docx(filepath)
-    else:
+    if not filename.endswith(('.pdf', '.docx')):
         return jsonify({'error':'Unsupported file type'}),400
 
+    filepath, sha256, size = save_upload(file, Config.UPLOAD_FOLDER, os.path.splitext(filename)[1])
+
     document = Document(filename=filename, file_path=filepath, workspace_id=workspace_id)
     db.session.add(document)
     db.session.flush()
+    db.session.add(DocumentFile(document_id=document.id, sha256=sha256, size_bytes=size))
 
-    chunks = doc_processor.chunking(text)
-    chunk_count = embebbing_service.embed_and_store(workspace_id=workspace_id,document_id=document.id, chunks=chunks)
-    document.chunk_count = chunk_count
-    db.session.commit()
+    job = ingestion_queue.enqueue(workspace_id, document)
 
     return jsonify({
-        'message': 'Document processed',
+        'message': 'Document queued for processing',
         'document_id': document.id,
-        'chunks': chunk_count
-    })
+        'job_id': job.id,
+        'status_url': f"/jobs/{job.id}"
+    }), 202
 
 @document_bp.route('/workspaces/<int:workspace_id>/documents', methods=['GET'])
 @login_required
@@ -76,16 +68,17 @@ def delete_document(document_id):
         return jsonify({"error":"Unauthorized"}),401
     
     try:
-        collection = embebbing_service.get_or_create_collection(document.workspace_id)
-        chunk_ids = [f"doc{document_id}_chunk{i}" for i in range(document.chunk_count)]
         try:
-            collection.delete(ids=chunk_ids)
+            services.embedding.delete_document(document.workspace_id, document_id)
         except Exception as e:
             print(f"Warning: Could not delete embeddings: {e}")
+        services.answer_cache.invalidate_workspace(document.workspace_id)
 
-        if document.file_path and os.path.exists(document.file_path):
-            os.remove(document.file_path)
+        release_upload(document)
         
+        IngestionJob.query.filter_by(document_id=document_id).delete()
+        DocumentSummary.query.filter_by(document_id=document_id).delete()
+        DocumentFile.query.filter_by(document_id=document_id).delete()
         db.session.delete(document)
         db.session.commit()
 
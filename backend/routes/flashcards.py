@@ -1,15 +1,12 @@
 from flask import Blueprint, jsonify, request
 from flask_login import login_required, current_user
 from models import db, Workspace, Document, Flashcard
-from services.flash_card_generator import FlashCardGenerator
-from services.embeddings import EmbeddingService
+from services.registry import services
+from services.llm_gateway import LLMGatewayError
 from datetime import datetime
 
 flashcard_bp = Blueprint('flashcard', __name__)
 
-flashcard_engine = FlashCardGenerator()
-embedding_service = EmbeddingService()
-
 @flashcard_bp.route('/workspaces/<int:workspace_id>/flashcards/generate', methods=['POST'])
 @login_required
 def generate_flashcards(workspace_id):
@@ -24,9 +21,9 @@ def generate_flashcards(workspace_id):
         return jsonify({"error": "No documents uploaded. Please upload study materials first."}), 400
     
     try:
-        flashcard_data = flashcard_engine.generate_flashcards(
+        flashcard_data = services.flashcards.generate_flashcards(
             documents=documents,
-            embedding_service=embedding_service,
+            embedding_service=services.embedding,
             workspace_id=workspace_id,
             count=count
         )
@@ -56,6 +53,8 @@ def generate_flashcards(workspace_id):
             } for fc in created_flashcards]
         })
     
+    except LLMGatewayError:
+        raise
     except Exception as e:
         db.session.rollback()
         print(f"Error generating flashcards: {e}")
@@ -130,7 +129,7 @@ def review_flashcard(flashcard_id):
         return jsonify({"error": "Quality must be an integer between 0-5"}), 400
     
     try:
-        updated_flashcard = flashcard_engine.update_sm2(flashcard, quality)
+        updated_flashcard = services.flashcards.update_sm2(flashcard, quality)
         db.session.commit()
         
         return jsonify({
@@ -0,0 +1,20 @@
+from flask import Blueprint, jsonify
+from flask_login import login_required, current_user
+from models import Workspace, IngestionJob
+from services.ingestion import serialize_job
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """Progress and per-stage timings of a background ingestion job"""
+    job = IngestionJob.query.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    workspace = Workspace.query.get(job.workspace_id)
+    if not workspace or workspace.user_id != current_user.id:
+        return jsonify({"error":"Unauthorized"}),401
+
+    return jsonify(serialize_job(job))
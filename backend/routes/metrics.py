@@ -0,0 +1,38 @@
+import hmac
+from flask import Blueprint, jsonify, request
+from config import Config
+from services.registry import services
+from services.metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+LOCAL_ADDRESSES = {'127.0.0.1', '::1'}
+
+
+def _allowed():
+    """Scrapers authenticate with METRICS_TOKEN; without one configured, only local requests get in"""
+    if Config.METRICS_TOKEN:
+        supplied = request.headers.get('Authorization', '')
+        return hmac.compare_digest(supplied.encode(), f"Bearer {Config.METRICS_TOKEN}".encode())
+    return request.remote_addr in LOCAL_ADDRESSES
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Per-process service load times, resident memory, counters and latencies"""
+    if not _allowed():
+        return jsonify({"error": "Forbidden"}), 403
+
+    registry = services.stats()
+    # Reading the query cache must not load the embedding model
+    query_cache = None
+    if 'embedding' in registry['loaded'] and services.embedding.query_cache is not None:
+        query_cache = services.embedding.query_cache.stats()
+
+    return jsonify({
+        'registry': registry,
+        'answer_cache': services.answer_cache.stats(),
+        'query_cache': query_cache,
+        'llm_gateway': services.llm_gateway.stats(),
+        **metrics.snapshot()
+    })
@@ -3,9 +3,8 @@ from flask_login import login_required, current_user
 from models import db, Workspace, Document, StudyPlan
 from datetime import datetime
 
-from services.study_plan_generator import StudyPlanGenerator
-
-study_plan_generator = StudyPlanGenerator()
+from services.registry import services
+from services.llm_gateway import LLMGatewayError
 
 study_plan_bp = Blueprint("study_plan",__name__)
 
@@ -35,7 +34,7 @@ def get_study_plan(workspace_id):
         })
 
     try:
-        plan = study_plan_generator.generate_plan(workspace_name=workspace.name, deadline=workspace.deadline, documents=documents)
+        plan = services.study_plan.generate_plan(workspace_name=workspace.name, deadline=workspace.deadline, documents=documents)
 
         if existing_plan:
             existing_plan.plan_text = plan
@@ -53,6 +52,8 @@ def get_study_plan(workspace_id):
             "document_count":len(documents),
             "cached": False
         })
+    except LLMGatewayError:
+        raise
     except Exception as e:
         db.session.rollback()
         print(f"Error generating plan: {e}")
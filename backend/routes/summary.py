@@ -1,13 +1,144 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, stream_with_context
 from flask_login import login_required, current_user
-from models import db, Workspace, Document
-from services.summarization import SummarizationService
-from services.embeddings import EmbeddingService
+from models import db, Workspace, Document, DocumentSummary
+from config import Config
+from services.registry import services
+from services.llm_gateway import LLMGatewayError
+from collections import defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+import json
 
 summarization_bp = Blueprint('summarization', __name__)
 
-summarization_service = SummarizationService()
-embedding_service = EmbeddingService()
+
+def _workspace_chunks(workspace_id, document_ids):
+    """Chunks of several documents in one ChromaDB call, grouped by document and in chunk order"""
+    collection = services.embedding.get_or_create_collection(workspace_id)
+    if len(document_ids) == 1:
+        where = {"document_id": document_ids[0]}
+    else:
+        where = {"document_id": {"$in": document_ids}}
+    results = collection.get(where=where)
+
+    grouped = defaultdict(list)
+    for metadata, chunk in zip(results.get('metadatas') or [], results.get('documents') or []):
+        grouped[metadata['document_id']].append((metadata.get('chunk_index', 0), chunk))
+
+    return {document_id: [chunk for _, chunk in sorted(pairs)] for document_id, pairs in grouped.items()}
+
+
+def _document_chunks(workspace_id, document_id):
+    """All chunks of a document from ChromaDB, in chunk order"""
+    return _workspace_chunks(workspace_id, [document_id]).get(document_id, [])
+
+
+def _stored_summary(document_id, content_hash):
+    stored = DocumentSummary.query.filter_by(document_id=document_id).first()
+    if stored and stored.content_hash == content_hash:
+        return stored
+    return None
+
+
+def _store_summary(document, content_hash, summary_data):
+    """Store a freshly generated summary and return its generation time"""
+    # Fallback summaries are served but not stored, so the next view retries the LLM
+    if summary_data.get('fallback'):
+        return datetime.now()
+
+    summarizer = services.summarization
+    stored = DocumentSummary.query.filter_by(document_id=document.id).first()
+    if not stored:
+        stored = DocumentSummary(document_id=document.id)
+        db.session.add(stored)
+    stored.content_hash = content_hash
+    stored.model_name = summarizer.model_name
+    stored.prompt_version = summarizer.PROMPT_VERSION
+    stored.summary_json = json.dumps(summary_data)
+    stored.generated_at = datetime.now()
+    db.session.commit()
+
+    return stored.generated_at
+
+
+def _get_or_create_summary(document, chunks, regenerate=False):
+    """
+    Serve the stored summary when its content hash still matches, otherwise run the
+    summarization pipeline and store the result. Returns (summary_data, cached, generated_at).
+    """
+    content_hash = services.summarization.content_hash(chunks)
+
+    stored = None if regenerate else _stored_summary(document.id, content_hash)
+    if stored:
+        return json.loads(stored.summary_json), True, stored.generated_at
+
+    summary_data = services.summarization.summarize_document(document, chunks)
+    return summary_data, False, _store_summary(document, content_hash, summary_data)
+
+
+def _summary_entry(document, summary_data, cached, generated_at):
+    return {
+        'document_id': document.id,
+        'filename': document.filename,
+        'summary': summary_data['summary'],
+        'key_points': summary_data['key_points'],
+        'topics': summary_data['topics'],
+        'word_count': summary_data['word_count'],
+        'chunk_count': summary_data['chunk_count'],
+        'cached': cached,
+        'generated_at': generated_at.isoformat()
+    }
+
+
+def _error_entry(document, error):
+    return {
+        'document_id': document.id,
+        'filename': document.filename,
+        'error': error,
+        'summary': None
+    }
+
+
+def _iter_workspace_summaries(workspace_id, documents, regenerate=False):
+    """
+    Yield one summary entry per document as soon as it is ready: stored summaries first,
+    then freshly generated ones in completion order.
+    """
+    summarizer = services.summarization
+    chunks_by_document = _workspace_chunks(workspace_id, [doc.id for doc in documents])
+
+    pending = []
+    content_hashes = {}
+    for doc in documents:
+        chunks = chunks_by_document.get(doc.id)
+        if not chunks:
+            yield _error_entry(doc, 'No content found')
+            continue
+
+        content_hash = summarizer.content_hash(chunks)
+        stored = None if regenerate else _stored_summary(doc.id, content_hash)
+        if stored:
+            yield _summary_entry(doc, json.loads(stored.summary_json), True, stored.generated_at)
+            continue
+
+        content_hashes[doc.id] = content_hash
+        # Worker threads only see a detached snapshot, never the session-bound row
+        pending.append((SimpleNamespace(id=doc.id, filename=doc.filename), chunks))
+
+    for document, summary_data, error in summarizer.summarize_many(pending, max_parallel=Config.OLLAMA_NUM_PARALLEL):
+        if error is not None:
+            print(f"Error summarizing document {document.id}: {error}")
+            yield _error_entry(document, str(error))
+            continue
+
+        try:
+            generated_at = _store_summary(document, content_hashes[document.id], summary_data)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error storing summary for document {document.id}: {e}")
+            generated_at = datetime.now()
+
+        yield _summary_entry(document, summary_data, False, generated_at)
 
 
 @summarization_bp.route('/workspaces/<int:workspace_id>/summaries', methods=['GET'])
@@ -24,48 +155,18 @@ def get_all_summaries(workspace_id):
     if not documents:
         return jsonify({"error": "No documents found. Upload documents first."}), 400
     
-    summaries = []
-    
-    for doc in documents:
-        try:
-            # Get chunks from ChromaDB
-            collection = embedding_service.get_or_create_collection(workspace_id)
-            results = collection.get(
-                where={"document_id": doc.id}
-            )
-            
-            chunks = results.get('documents', [])
-            
-            if not chunks:
-                summaries.append({
-                    'document_id': doc.id,
-                    'filename': doc.filename,
-                    'error': 'No content found',
-                    'summary': None
-                })
-                continue
-            
-            # Generate summary
-            summary_data = summarization_service.summarize_document(doc, chunks)
-            
-            summaries.append({
-                'document_id': doc.id,
-                'filename': doc.filename,
-                'summary': summary_data['summary'],
-                'key_points': summary_data['key_points'],
-                'topics': summary_data['topics'],
-                'word_count': summary_data['word_count'],
-                'chunk_count': summary_data['chunk_count']
-            })
-            
-        except Exception as e:
-            print(f"Error summarizing document {doc.id}: {e}")
-            summaries.append({
-                'document_id': doc.id,
-                'filename': doc.filename,
-                'error': str(e),
-                'summary': None
-            })
+    regenerate = request.args.get("regenerate", "false").lower() == "true"
+    document_order = {doc.id: i for i, doc in enumerate(documents)}
+
+    try:
+        summaries = sorted(
+            _iter_workspace_summaries(workspace_id, documents, regenerate),
+            key=lambda entry: document_order[entry['document_id']]
+        )
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error summarizing workspace {workspace_id}: {e}")
+        return jsonify({"error": "Failed to generate summaries"}), 500
     
     return jsonify({
         'workspace_name': workspace.name,
@@ -74,6 +175,38 @@ def get_all_summaries(workspace_id):
     })
 
 
+@summarization_bp.route('/workspaces/<int:workspace_id>/summaries/stream', methods=['GET'])
+@login_required
+def stream_all_summaries(workspace_id):
+    """Same as /summaries, but streamed as NDJSON: one line per document as it finishes"""
+    
+    workspace = Workspace.query.get(workspace_id)
+    if not workspace or workspace.user_id != current_user.id:
+        return jsonify({"error": "Workspace not found"}), 404
+    
+    documents = Document.query.filter_by(workspace_id=workspace_id).all()
+    
+    if not documents:
+        return jsonify({"error": "No documents found. Upload documents first."}), 400
+    
+    regenerate = request.args.get("regenerate", "false").lower() == "true"
+
+    def generate():
+        try:
+            for entry in _iter_workspace_summaries(workspace_id, documents, regenerate):
+                yield json.dumps(entry) + "\n"
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error summarizing workspace {workspace_id}: {e}")
+            yield json.dumps({'error': 'Failed to generate summaries'}) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @summarization_bp.route('/documents/<int:document_id>/summary', methods=['GET'])
 @login_required
 def get_document_summary(document_id):
@@ -88,32 +221,22 @@ def get_document_summary(document_id):
     if not workspace or workspace.user_id != current_user.id:
         return jsonify({"error": "Unauthorized"}), 403
     
+    regenerate = request.args.get("regenerate", "false").lower() == "true"
+
     try:
-        # Get chunks from ChromaDB
-        collection = embedding_service.get_or_create_collection(document.workspace_id)
-        results = collection.get(
-            where={"document_id": document_id}
-        )
-        
-        chunks = results.get('documents', [])
+        chunks = _document_chunks(document.workspace_id, document_id)
         
         if not chunks:
             return jsonify({"error": "No content found for this document"}), 400
         
-        # Generate summary
-        summary_data = summarization_service.summarize_document(document, chunks)
+        summary_data, cached, generated_at = _get_or_create_summary(document, chunks, regenerate)
         
-        return jsonify({
-            'document_id': document.id,
-            'filename': document.filename,
-            'summary': summary_data['summary'],
-            'key_points': summary_data['key_points'],
-            'topics': summary_data['topics'],
-            'word_count': summary_data['word_count'],
-            'chunk_count': summary_data['chunk_count']
-        })
+        return jsonify(_summary_entry(document, summary_data, cached, generated_at))
         
+    except LLMGatewayError:
+        raise
     except Exception as e:
+        db.session.rollback()
         print(f"Error generating summary: {e}")
         import traceback
         traceback.print_exc()
@@ -136,7 +259,7 @@ def get_quick_summary(document_id):
     
     try:
         # Get first few chunks
-        collection = embedding_service.get_or_create_collection(document.workspace_id)
+        collection = services.embedding.get_or_create_collection(document.workspace_id)
         results = collection.get(
             where={"document_id": document_id},
             limit=5
@@ -148,7 +271,7 @@ def get_quick_summary(document_id):
             return jsonify({"error": "No content found"}), 400
         
         combined_text = "\n\n".join(chunks)
-        quick_summary = summarization_service.generate_quick_summary(combined_text)
+        quick_summary = services.summarization.generate_quick_summary(combined_text)
         
         return jsonify({
             'document_id': document.id,
@@ -156,6 +279,8 @@ def get_quick_summary(document_id):
             'quick_summary': quick_summary
         })
         
+    except LLMGatewayError:
+        raise
     except Exception as e:
         print(f"Error generating quick summary: {e}")
         return jsonify({"error": "Failed to generate summary"}), 500
\ No newline at end of file
@@ -1,18 +1,13 @@
 from flask import Blueprint, jsonify, request
 from werkzeug.utils import secure_filename
 from flask_login import login_required, current_user
-from models import db, Workspace, Document, ChatMessage
+from models import db, Workspace, Document, ChatMessage, ConversationSummary, IngestionJob, DocumentSummary, DocumentFile
 from config import Config
-import os
-from services.document_processor import DocumentProcessor
-from services.embeddings import EmbeddingService
+from services.registry import services
+from services.file_store import release_upload
 from datetime import datetime
 
 
-doc_processor = DocumentProcessor()
-embebbing_sevice = EmbeddingService()
-
-
 workspace_bp = Blueprint('workspace',__name__)
 
 @workspace_bp.route('/workspaces', methods=['GET'])
@@ -69,18 +64,26 @@ def delete_workspace(workspace_id):
     try:
         documents = Document.query.filter_by(workspace_id=workspace_id).all()
         try:
-            embebbing_sevice.delete_workspace_collection(workspace_id)
+            services.embedding.delete_workspace_collection(workspace_id)
         except Exception as e:
             print(f"Warning: Could not delete ChromaDB collection: {e}")
+        services.answer_cache.invalidate_workspace(workspace_id)
         
+        document_ids = [doc.id for doc in documents]
         for doc in documents:
-            if doc.file_path and os.path.exists(doc.file_path):
-                try:
-                    os.remove(doc.file_path)
-                except Exception as e:
-                    print(f"Warning: Could not delete file {doc.file_path}: {e}")
+            try:
+                release_upload(doc)
+            except Exception as e:
+                print(f"Warning: Could not delete file {doc.file_path}: {e}")
+            # Files are shared by content hash, so drop this document's claim before the next one is checked
+            DocumentFile.query.filter_by(document_id=doc.id).delete()
         
         ChatMessage.query.filter_by(workspace_id=workspace_id).delete()
+        ConversationSummary.query.filter_by(workspace_id=workspace_id).delete()
+        IngestionJob.query.filter_by(workspace_id=workspace_id).delete()
+        DocumentSummary.query.filter(
+            DocumentSummary.document_id.in_(document_ids)
+        ).delete(synchronize_session=False)
         Document.query.filter_by(workspace_id=workspace_id).delete()
         db.session.delete(workspace)
         db.session.commit()
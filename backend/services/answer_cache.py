@@ -0,0 +1,115 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+
+@dataclass
+class CachedAnswer:
+    """One generated answer and the query embedding it was generated for"""
+    workspace_id: int
+    chunk_key: frozenset
+    query_embedding: np.ndarray
+    answer: str
+    llm_seconds: float
+    created_at: float
+
+
+class AnswerCache:
+    """
+    Semantic cache in front of the LLM call of the RAG pipeline.
+
+    Entries are bucketed by (workspace, set of retrieved chunk ids); inside a bucket a new
+    question hits when its normalized query embedding has cosine similarity >= threshold
+    with a cached one. Eviction is LRU over all entries plus a TTL, and a workspace's
+    entries are dropped whenever its documents change.
+    """
+
+    def __init__(self, max_entries=512, ttl_seconds=3600, similarity_threshold=0.95):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+
+        self._entries = OrderedDict()  # entry id -> CachedAnswer, least recently used first
+        self._buckets = {}  # (workspace_id, chunk_key) -> set of entry ids
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_llm_seconds = 0.0
+
+    def lookup(self, workspace_id, chunk_ids, query_embedding):
+        bucket_key = (workspace_id, frozenset(chunk_ids))
+        query = np.asarray(query_embedding, dtype=np.float32)
+        now = time.time()
+
+        with self._lock:
+            best_id, best_score = None, self.similarity_threshold
+            for entry_id in list(self._buckets.get(bucket_key, ())):
+                entry = self._entries[entry_id]
+                if now - entry.created_at > self.ttl_seconds:
+                    self._remove(entry_id)
+                    continue
+
+                score = float(np.dot(entry.query_embedding, query))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            entry = self._entries[best_id]
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            self.saved_llm_seconds += entry.llm_seconds
+            return entry.answer
+
+    def store(self, workspace_id, chunk_ids, query_embedding, answer, llm_seconds):
+        bucket_key = (workspace_id, frozenset(chunk_ids))
+        entry = CachedAnswer(
+            workspace_id=workspace_id,
+            chunk_key=bucket_key[1],
+            query_embedding=np.asarray(query_embedding, dtype=np.float32),
+            answer=answer,
+            llm_seconds=llm_seconds,
+            created_at=time.time()
+        )
+
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._buckets.setdefault(bucket_key, set()).add(entry_id)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_workspace(self, workspace_id):
+        with self._lock:
+            stale = [entry_id for entry_id, entry in self._entries.items() if entry.workspace_id == workspace_id]
+            for entry_id in stale:
+                self._remove(entry_id)
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id)
+        bucket_key = (entry.workspace_id, entry.chunk_key)
+        bucket = self._buckets.get(bucket_key)
+        if bucket is not None:
+            bucket.discard(entry_id)
+            if not bucket:
+                del self._buckets[bucket_key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'saved_llm_seconds': round(self.saved_llm_seconds, 2)
+            }
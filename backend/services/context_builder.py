@@ -0,0 +1,87 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class ContextBlock:
+    """Consecutive retrieved chunks of one document, merged into one passage"""
+    document_id: int
+    first_index: int
+    last_index: int
+    text: str
+    best_rank: int
+    chunk_ids: list = field(default_factory=list)
+
+
+# Shorter shared text between neighbouring chunks is treated as coincidence, not chunk overlap
+MIN_OVERLAP_CHARS = 16
+
+
+def merge_overlapping(first, second):
+    """Join two consecutive chunks, writing text shared by the end of one and the start of the other once"""
+    probe = second[:MIN_OVERLAP_CHARS]
+    position = first.find(probe) if len(probe) == MIN_OVERLAP_CHARS else -1
+    while position != -1:
+        if second.startswith(first[position:]):
+            return first + second[len(first) - position:]
+        position = first.find(probe, position + 1)
+    return first + " " + second
+
+
+class ContextBuilder:
+    """
+    Packs retrieved chunks into the prompt by token budget instead of a fixed count.
+
+    Chunks are taken in retrieval order while they fit the budget. Chunks of the same
+    document with neighbouring chunk_index values are merged into one block, with the
+    text they share through chunk overlap kept once, so the overlap is not paid for twice.
+    Blocks are ordered by their best-ranked chunk.
+    """
+
+    def __init__(self, count_tokens, budget_tokens=1500):
+        self.count_tokens = count_tokens
+        self.budget_tokens = budget_tokens
+
+    def _blocks(self, selected):
+        blocks = []
+        for rank, chunk_id, text, metadata in sorted(
+            selected, key=lambda item: (item[3].get('document_id'), item[3].get('chunk_index', 0))
+        ):
+            document_id, index = metadata.get('document_id'), metadata.get('chunk_index', 0)
+            previous = blocks[-1] if blocks else None
+            if previous and previous.document_id == document_id and index == previous.last_index + 1:
+                previous.text = merge_overlapping(previous.text, text)
+                previous.last_index = index
+                previous.best_rank = min(previous.best_rank, rank)
+                previous.chunk_ids.append(chunk_id)
+            else:
+                blocks.append(ContextBlock(document_id, index, index, text, rank, [chunk_id]))
+
+        return sorted(blocks, key=lambda block: block.best_rank)
+
+    def build(self, ids, documents, metadatas):
+        """Returns (blocks, report); blocks are ContextBlock objects in prompt order"""
+        selected, blocks, used_tokens = [], [], 0
+        skipped = 0
+        # Token count by block text: adding a chunk changes at most the block it joins,
+        # so only that block goes back through the tokenizer
+        block_tokens = {}
+
+        for rank, (chunk_id, text, metadata) in enumerate(zip(ids, documents, metadatas)):
+            candidate = self._blocks(selected + [(rank, chunk_id, text, metadata or {})])
+            uncounted = list(dict.fromkeys(block.text for block in candidate if block.text not in block_tokens))
+            if uncounted:
+                block_tokens.update(zip(uncounted, self.count_tokens(uncounted)))
+            tokens = sum(block_tokens[block.text] for block in candidate)
+            if tokens > self.budget_tokens:
+                skipped += 1
+                continue
+            selected.append((rank, chunk_id, text, metadata or {}))
+            blocks, used_tokens = candidate, tokens
+
+        return blocks, {
+            'candidates': len(ids),
+            'chunks_used': len(selected),
+            'blocks': len(blocks),
+            'tokens': used_tokens,
+            'skipped_over_budget': skipped
+        }
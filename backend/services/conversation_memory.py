@@ -0,0 +1,227 @@
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import List, Tuple
+
+from config import Config
+from models import db, ChatMessage, ConversationSummary, Workspace
+from services.llm_gateway import BATCH, INTERACTIVE
+from services.metrics import metrics
+from services.prompts import CONVERSATION_SUMMARY, QUERY_REWRITE
+from services.registry import services
+
+# Signs that a question points back into the conversation: it opens with a connective,
+# uses a pronoun for something said before, or asks to go on. Bare "this"/"that" only
+# count at the end of a question ("why is that?") or before a word naming earlier output.
+FOLLOW_UP = re.compile(
+    r"^\s*(and|but|also|so|then|instead|what about|how about|why not)\b"
+    r"|\b(it|its|they|them|their|these|those)\b"
+    r"|\b(this|that)\s*[?.!]*\s*$"
+    r"|\b(this|that|the same|the above|the previous|the last|your) "
+    r"(one|part|point|step|example|answer|code|formula|method|function|question|explanation)s?\b"
+    r"|\b(this|that) (mean|means|work|works)\b"
+    r"|\b(tell me more|more detail|more about|elaborate|expand on|go on|continue|again|"
+    r"another example|anything else|what else|earlier|previously|above)\b",
+    re.IGNORECASE
+)
+
+
+def looks_like_follow_up(question):
+    return bool(FOLLOW_UP.search(question))
+
+
+def turns_to_fold(pending, window_turns, summarize_after):
+    """
+    Oldest of the pending (not yet summarized) turns to fold into the summary: none until
+    summarize_after turns have left the recent window, and at most summarize_after * 4 at
+    once, so a summary that fell behind (e.g. Ollama was down) catches up a slice at a time.
+    """
+    foldable = pending[:max(0, len(pending) - window_turns)]
+    if len(foldable) < summarize_after:
+        return []
+    return foldable[:summarize_after * 4]
+
+
+def _transcript(turns):
+    return "\n\n".join(f"Student: {question}\nAssistant: {answer}" for question, answer in turns)
+
+
+@dataclass
+class Conversation:
+    """What the chat prompt gets to see of a workspace's earlier turns"""
+    question: str
+    query: str  # what retrieval searches for: the question, or its standalone rewrite
+    summary: str = ''
+    turns: List[Tuple[str, str]] = field(default_factory=list)  # recent (question, answer), oldest first
+    follow_up: bool = False
+    rewritten: bool = False
+
+    @property
+    def standalone(self):
+        """Whether query means the same thing without the conversation, so answers to it can be shared"""
+        return not self.follow_up or self.rewritten
+
+    def history(self):
+        """Chat messages to place between the instructions and the new question"""
+        messages = []
+        if self.summary:
+            messages.append({'role': 'system', 'content': f"Summary of the conversation so far:\n{self.summary}"})
+        for question, answer in self.turns:
+            messages.append({'role': 'user', 'content': question})
+            messages.append({'role': 'assistant', 'content': answer})
+        return messages
+
+
+class ConversationMemory:
+    """
+    Bounded chat memory per workspace: the last few turns verbatim plus a running summary
+    of everything older (ConversationSummary). The summary is refreshed on a background
+    thread after a reply has been saved, never on the request path, so prompt size and
+    latency stay flat however long the conversation gets.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._executor = None
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.window_turns = 3
+        self.answer_chars = 1500
+        self.summarize_after = 4
+        self.rewrite = True
+
+    def init_app(self, app, window_turns=3, answer_chars=1500, summarize_after=4, rewrite=True):
+        self.app = app
+        self.window_turns = window_turns
+        self.answer_chars = answer_chars
+        self.summarize_after = max(1, summarize_after)
+        self.rewrite = rewrite
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='memory')
+        app.extensions['conversation_memory'] = self
+
+    @property
+    def unsummarized_limit(self):
+        """Most turns ever pending while the summary keeps up: load() returns them all"""
+        return self.window_turns + self.summarize_after
+
+    def load(self, workspace_id, question):
+        """The Conversation for a new question, with follow-ups rewritten into a standalone query"""
+        stored = ConversationSummary.query.get(workspace_id)
+        covered_through = stored.covered_through_id if stored else 0
+
+        recent = []
+        if self.window_turns > 0:
+            # Every turn the summary does not cover yet: the window, plus turns that have left
+            # it but wait to be folded (see turns_to_fold)
+            recent = ChatMessage.query.filter(
+                ChatMessage.workspace_id == workspace_id,
+                ChatMessage.id > covered_through
+            ).order_by(ChatMessage.id.desc()).limit(self.unsummarized_limit).all()[::-1]
+
+        conversation = Conversation(
+            question=question,
+            query=question,
+            summary=stored.summary if stored else '',
+            turns=[(m.user_message, m.ai_response[:self.answer_chars]) for m in recent]
+        )
+        conversation.follow_up = bool(conversation.turns or conversation.summary) and looks_like_follow_up(question)
+
+        if conversation.follow_up and self.rewrite:
+            query = self._rewrite(conversation)
+            if query:
+                conversation.query, conversation.rewritten = query, True
+        return conversation
+
+    def _rewrite(self, conversation):
+        """Standalone version of a follow-up question, or None if the LLM call fails"""
+        context = _transcript(conversation.turns)
+        if conversation.summary:
+            context = f"Summary of the conversation so far:\n{conversation.summary}\n\n{context}"
+
+        start = time.perf_counter()
+        try:
+            response = services.llm_gateway.chat(
+                priority=INTERACTIVE,
+                model=Config.LLM_MODEL,
+                messages=QUERY_REWRITE.messages(
+                    f"Conversation:\n{context}",
+                    f"Follow-up question: {conversation.question}"
+                ),
+                options={"temperature": 0, "num_predict": 64}
+            )
+        except Exception as e:
+            print(f"Error rewriting follow-up question: {e}")
+            metrics.incr('chat_memory.rewrite_failed')
+            return None
+        finally:
+            metrics.observe('chat_memory.rewrite', time.perf_counter() - start)
+
+        lines = response['message']['content'].strip().splitlines()
+        query = lines[0].strip().strip('"') if lines else ''
+        metrics.incr('chat_memory.rewrites')
+        return query or None
+
+    def schedule_refresh(self, workspace_id):
+        """Fold turns that have left the recent window into the summary, in the background"""
+        if self._executor is None:
+            return
+        with self._lock:
+            if workspace_id in self._refreshing:
+                return
+            self._refreshing.add(workspace_id)
+        self._executor.submit(self._refresh, workspace_id)
+
+    def _refresh(self, workspace_id):
+        with self.app.app_context():
+            try:
+                if Workspace.query.get(workspace_id) is None:
+                    return
+
+                stored = ConversationSummary.query.get(workspace_id)
+                covered_through = stored.covered_through_id if stored else 0
+                pending = ChatMessage.query.filter(
+                    ChatMessage.workspace_id == workspace_id,
+                    ChatMessage.id > covered_through
+                ).order_by(ChatMessage.id).all()
+
+                foldable = turns_to_fold(pending, self.window_turns, self.summarize_after)
+                if not foldable:
+                    return
+
+                start = time.perf_counter()
+                response = services.llm_gateway.chat(
+                    priority=BATCH,
+                    model=Config.LLM_MODEL,
+                    messages=CONVERSATION_SUMMARY.messages(
+                        f"Summary so far:\n{stored.summary if stored and stored.summary else '(none)'}",
+                        "Exchanges that followed:\n" + _transcript(
+                            (m.user_message, m.ai_response[:self.answer_chars]) for m in foldable
+                        )
+                    ),
+                    options={"temperature": 0.3, "num_predict": 300}
+                )
+                metrics.observe('chat_memory.refresh', time.perf_counter() - start)
+
+                if stored is None:
+                    stored = ConversationSummary(workspace_id=workspace_id)
+                    db.session.add(stored)
+                stored.summary = response['message']['content'].strip()
+                stored.covered_through_id = foldable[-1].id
+                stored.updated_at = datetime.now()
+                db.session.commit()
+                metrics.incr('chat_memory.turns_summarized', len(foldable))
+
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error refreshing conversation summary for workspace {workspace_id}: {e}")
+
+            finally:
+                db.session.remove()
+                with self._lock:
+                    self._refreshing.discard(workspace_id)
+
+
+conversation_memory = ConversationMemory()
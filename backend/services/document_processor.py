@@ -1,57 +1,368 @@
+import bisect
 import pdfplumber
 from docx import Document
-import threading
-from concurrent.futures import ThreadPoolExecutor
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
 import re
+import threading
+from dataclasses import dataclass
+
+from services.process_pool import pool_context
+
+# Below this many pages the process pool costs more than it saves
+MIN_PAGES_FOR_POOL = 8
+
+# Sentences are tokenized in batches of this size when sizing chunks
+TOKENIZE_BATCH = 256
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])(\s+)')
+
+# A run of text this long without a sentence boundary is emitted as a sentence anyway,
+# so a page with no punctuation cannot grow the carry-over without limit
+MAX_CARRY_CHARS = 20000
+
+
+def _extract_page_range(file_path, start, end):
+    """Process-pool worker: open the PDF in this process and extract pages [start, end)"""
+    texts = []
+    with pdfplumber.open(file_path) as pdf:
+        for i in range(start, end):
+            page = pdf.pages[i]
+            texts.append(page.extract_text() or "")
+            page.close()
+    return texts
+
+
+def _page_ranges(pages_total, workers):
+    """Contiguous page ranges, a few per worker so progress is reported steadily and slow pages even out"""
+    size = max(1, -(-pages_total // (workers * 4)))
+    return [(start, min(start + size, pages_total)) for start in range(0, pages_total, size)]
+
+
+@dataclass
+class Chunk:
+    """A chunk of document text with its character span in the newline-joined document"""
+    text: str
+    char_start: int
+    char_end: int
+    page_start: int = None  # 1-based pages the chunk spans, when page numbers were requested
+    page_end: int = None
+
+
+def _split_with_offsets(text, base):
+    """(char_start, char_end, sentence) for every sentence of text; offsets are shifted by base"""
+    # The capturing split keeps the separators, so offsets follow from lengths alone
+    parts = SENTENCE_SPLIT.split(text)
+    position = base
+    for i in range(0, len(parts) - 1, 2):
+        sentence = parts[i]
+        yield position, position + len(sentence), sentence
+        position += len(sentence) + len(parts[i + 1])
+    yield position, position + len(parts[-1]), parts[-1]
+
+
+def iter_sentence_spans(pages):
+    """
+    Yield (char_start, char_end, sentence) from an iterable of page texts. Pages are joined
+    with a newline and offsets refer to that joined text. A sentence cut by a page break is
+    carried over to the next page, so the sentences equal splitting the fully joined text.
+    """
+    carry = None
+    carry_start = 0
+
+    for page in pages:
+        if carry is None:
+            buffer, base = page, 0
+        else:
+            buffer, base = carry + "\n" + page, carry_start
+
+        spans = list(_split_with_offsets(buffer, base))
+        # The last piece is always carried over. When it is empty the page ended on a
+        # sentence boundary whose whitespace may continue on the next page, so the
+        # sentence before it is carried too.
+        keep = 2 if len(spans) > 1 and not spans[-1][2] else 1
+        yield from spans[:-keep]
+
+        carry_start = spans[-keep][0]
+        carry = buffer[carry_start - base:]
+
+        if len(carry) > MAX_CARRY_CHARS:
+            yield carry_start, carry_start + len(carry), carry
+            carry, carry_start = "", carry_start + len(carry)
+
+    if carry is not None:
+        yield from _split_with_offsets(carry, carry_start)
+
+
+def iter_sentences(pages):
+    """Sentences of the newline-joined pages; see iter_sentence_spans"""
+    for _, _, sentence in iter_sentence_spans(pages):
+        yield sentence
+
+
+def _split_long_sentence(start, text, tokens, max_tokens):
+    """Cut a sentence longer than max_tokens at whitespace into roughly equal pieces"""
+    pieces = -(-tokens // max_tokens)
+    target = len(text) / pieces
+    position = 0
+    for i in range(1, pieces):
+        cut = text.find(" ", max(position + 1, int(target * i)))
+        if cut == -1:
+            break
+        yield start + position, start + cut, text[position:cut], tokens // pieces
+        position = cut + 1
+    yield start + position, start + len(text), text[position:], tokens - (tokens // pieces) * (pieces - 1)
+
 
 class DocumentProcessor:
-    @staticmethod
-    def extract_text_from_pdf(file_path):
-        """Optimized PDF extraction with parallel page processing"""
-        text = ""
-        
-        try:
-            with pdfplumber.open(file_path) as pdf:
-                with ThreadPoolExecutor(max_workers=4) as executor:
-                    page_texts = list(executor.map(
-                        lambda page: page.extract_text() or "",
-                        pdf.pages
-                    ))
-                text = "\n".join(page_texts)
-        except Exception as e:
-            print(f"Error extracting PDF using threads: {e}")
-            with pdfplumber.open(file_path) as pdf:
+    def __init__(self, pdf_workers=None, pdf_mode='process', tokenizer_name=None,
+                 chunk_max_tokens=128, chunk_overlap_tokens=24):
+        self.pdf_workers = pdf_workers or os.cpu_count() or 1
+        self.pdf_mode = pdf_mode
+        self.tokenizer_name = tokenizer_name
+        self.chunk_max_tokens = chunk_max_tokens
+        self.chunk_overlap_tokens = chunk_overlap_tokens
+        self._tokenizer = None
+        self._tokenizer_lock = threading.Lock()
+        # Page-extraction processes, started on first use and shared by every PDF
+        self._pdf_pool = None
+        self._pdf_pool_lock = threading.Lock()
+
+    def count_tokens(self, texts):
+        """
+        Token length of each text under the embedding model's tokenizer (loaded on first use).
+        Without a tokenizer_name, tokens are estimated as one per four characters.
+        """
+        if not self.tokenizer_name:
+            return [max(1, round(len(text) / 4)) for text in texts]
+
+        # Fast tokenizers must not be called from several threads at once
+        with self._tokenizer_lock:
+            if self._tokenizer is None:
+                from transformers import AutoTokenizer
+                self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+            encoded = self._tokenizer(texts, add_special_tokens=False)['input_ids']
+
+        return [len(ids) for ids in encoded]
+
+    def _pdf_extraction_pool(self):
+        with self._pdf_pool_lock:
+            if self._pdf_pool is None:
+                self._pdf_pool = ProcessPoolExecutor(max_workers=self.pdf_workers, mp_context=pool_context())
+            return self._pdf_pool
+
+    def close(self):
+        """Stop the page-extraction processes, if any were started"""
+        with self._pdf_pool_lock:
+            pool, self._pdf_pool = self._pdf_pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def _discard_broken_pool(self, pool):
+        # A worker that died breaks the whole pool; start a fresh one next time
+        if getattr(pool, '_broken', False):
+            with self._pdf_pool_lock:
+                if self._pdf_pool is pool:
+                    self._pdf_pool = None
+            pool.shutdown(wait=False)
+
+    def iter_pdf_pages(self, file_path, mode=None, on_page=None):
+        """
+        Yield page texts in page order as they are extracted.
+
+        mode is 'process' (each pool worker opens the file and handles a page range),
+        'thread' (the former thread pool over one shared handle) or 'serial'.
+        on_page(pages_done, pages_total) is called as pages complete, in page order.
+        """
+        mode = mode or self.pdf_mode
+        pages_done = 0
+
+        with pdfplumber.open(file_path) as pdf:
+            pages_total = len(pdf.pages)
+
+            if mode == 'thread':
+                with ThreadPoolExecutor(max_workers=self.pdf_workers) as executor:
+                    for page_text in executor.map(lambda page: page.extract_text() or "", pdf.pages):
+                        pages_done += 1
+                        if on_page:
+                            on_page(pages_done, pages_total)
+                        yield page_text
+                return
+
+            if mode == 'serial' or self.pdf_workers <= 1 or pages_total < MIN_PAGES_FOR_POOL:
                 for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-        
-        return text
-    
+                    page_text = page.extract_text() or ""
+                    page.close()
+                    pages_done += 1
+                    if on_page:
+                        on_page(pages_done, pages_total)
+                    yield page_text
+                return
+
+        ranges = iter(_page_ranges(pages_total, self.pdf_workers))
+        workers = self.pdf_workers
+        executor = self._pdf_extraction_pool()
+
+        def submit(start, end):
+            try:
+                return executor.submit(_extract_page_range, file_path, start, end)
+            except Exception as e:
+                # A broken pool refuses new work; the range is then extracted in-process below
+                failed = Future()
+                failed.set_exception(e)
+                return failed
+
+        # Keep only a couple of ranges per worker in flight so finished pages
+        # never pile up ahead of the consumer
+        in_flight = deque()
+        for start, end in ranges:
+            in_flight.append((start, end, submit(start, end)))
+            if len(in_flight) >= workers * 2:
+                break
+
+        try:
+            while in_flight:
+                start, end, future = in_flight.popleft()
+                try:
+                    page_texts = future.result()
+                except Exception as e:
+                    # Only the failed range is redone in-process, not the whole document
+                    print(f"Error extracting pages {start + 1}-{end} of {file_path} in worker, retrying in-process: {e}")
+                    page_texts = _extract_page_range(file_path, start, end)
+
+                next_range = next(ranges, None)
+                if next_range:
+                    in_flight.append((*next_range, submit(*next_range)))
+
+                for page_text in page_texts:
+                    pages_done += 1
+                    if on_page:
+                        on_page(pages_done, pages_total)
+                    yield page_text
+        finally:
+            # Ranges still queued for a consumer that stopped early are not needed any more
+            for _, _, future in in_flight:
+                future.cancel()
+            self._discard_broken_pool(executor)
+
+    def extract_pdf_pages(self, file_path, mode=None, on_page=None):
+        """Page texts in page order; see iter_pdf_pages"""
+        return list(self.iter_pdf_pages(file_path, mode=mode, on_page=on_page))
+
+    def extract_text_from_pdf(self, file_path, on_page=None):
+        """Full text of a PDF; see iter_pdf_pages"""
+        return "\n".join(self.iter_pdf_pages(file_path, on_page=on_page))
+
+    @staticmethod
+    def iter_docx_pages(file_path, paragraphs_per_page=50):
+        """DOCX has no pages, so paragraphs are yielded in groups that play the part of pages"""
+        doc = Document(file_path)
+        paragraphs = [para.text for para in doc.paragraphs]
+        for start in range(0, len(paragraphs), paragraphs_per_page):
+            yield "\n".join(paragraphs[start:start + paragraphs_per_page])
+
     @staticmethod
     def extract_text_from_docx(file_path):
         doc = Document(file_path)
         return "\n".join([para.text for para in doc.paragraphs])
-    
+
     @staticmethod
-    def chunking(text, chunk_size=500, overlap=100):
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        chunks = []
+    def iter_chunks(pages, chunk_size=500, overlap=100):
+        """Incremental chunker over page texts; yields the same chunks as chunking() on the joined text"""
         current_chunk = ""
 
-        for sentence in sentences:
+        for sentence in iter_sentences(pages):
             if len(current_chunk) + len(sentence) < chunk_size:
                 current_chunk += sentence + " "
             else:
                 if current_chunk:
-                    chunks.append(current_chunk.strip())
-                
+                    yield current_chunk.strip()
+
                 if overlap > 0 and len(current_chunk) > overlap:
                     current_chunk = current_chunk[-overlap:] + sentence + " "
                 else:
                     current_chunk = sentence + " "
 
         if current_chunk.strip():
-            chunks.append(current_chunk.strip())
+            yield current_chunk.strip()
+
+    @staticmethod
+    def chunking(text, chunk_size=500, overlap=100):
+        return list(DocumentProcessor.iter_chunks([text], chunk_size=chunk_size, overlap=overlap))
+
+    def _counted_sentences(self, pages):
+        """Sentence spans with their token counts, tokenized in batches"""
+        batch = []
+        for span in iter_sentence_spans(pages):
+            if span[2].strip():
+                batch.append(span)
+            if len(batch) == TOKENIZE_BATCH:
+                yield from self._count_batch(batch)
+                batch = []
+        if batch:
+            yield from self._count_batch(batch)
+
+    def _count_batch(self, batch):
+        counts = self.count_tokens([text for _, _, text in batch])
+        for (start, end, text), tokens in zip(batch, counts):
+            yield start, end, text, tokens
+
+    def iter_token_chunks(self, pages, max_tokens=None, overlap_tokens=None, page_numbers=False):
+        """
+        Chunk the pages by tokenizer length in a single linear pass over sentence spans.
+
+        Chunks hold whole sentences up to max_tokens; consecutive chunks share trailing
+        sentences worth at most overlap_tokens, so overlap never cuts a sentence or word.
+        Sentences longer than max_tokens are cut at whitespace. Yields Chunk objects whose
+        offsets refer to the newline-joined page text. With page_numbers, each chunk also
+        carries the 1-based first and last page it spans.
+        """
+        max_tokens = max_tokens or self.chunk_max_tokens
+        overlap_tokens = self.chunk_overlap_tokens if overlap_tokens is None else overlap_tokens
+
+        page_offsets = []  # where each page starts in the joined text, filled as pages are read
+
+        def recorded(pages):
+            offset = 0
+            for page in pages:
+                page_offsets.append(offset)
+                offset += len(page) + 1
+                yield page
+
+        window = deque()  # (char_start, char_end, text, tokens) of the chunk being built
+        window_tokens = 0
+        has_new_text = False
+
+        def emit():
+            chunk = Chunk(
+                text=" ".join(text for _, _, text, _ in window).strip(),
+                char_start=window[0][0],
+                char_end=window[-1][1]
+            )
+            if page_numbers:
+                chunk.page_start = bisect.bisect_right(page_offsets, chunk.char_start)
+                chunk.page_end = bisect.bisect_right(page_offsets, max(chunk.char_end - 1, chunk.char_start))
+            return chunk
+
+        for start, end, text, tokens in self._counted_sentences(recorded(pages)):
+            if tokens > max_tokens:
+                spans = _split_long_sentence(start, text, tokens, max_tokens)
+            else:
+                spans = [(start, end, text, tokens)]
+
+            for span in spans:
+                if window and window_tokens + span[3] > max_tokens:
+                    yield emit()
+                    has_new_text = False
+                    # Keep whole trailing sentences as overlap, and make room for the next one
+                    while window and (window_tokens > overlap_tokens or window_tokens + span[3] > max_tokens):
+                        window_tokens -= window.popleft()[3]
+
+                window.append(span)
+                window_tokens += span[3]
+                has_new_text = True
+
+        if window and has_new_text:
+            yield emit()
 
-        return chunks
\ No newline at end of file
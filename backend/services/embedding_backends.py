@@ -0,0 +1,95 @@
+"""
+Interchangeable encoders behind EmbeddingService. Each one exposes the part of the
+SentenceTransformer API the service uses: encode(texts, normalize_embeddings, batch_size)
+returning a numpy array, and `device`.
+
+    torch  fp32 PyTorch through sentence-transformers (the default)
+    int8   the same model with its Linear layers dynamically quantized to int8 (CPU only)
+    onnx   the transformer exported to ONNX and run by ONNX Runtime
+           (needs `pip install optimum[onnxruntime]`); the export is saved under
+           onnx_cache_dir on first start and loaded from there afterwards
+"""
+import os
+import shutil
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+BACKENDS = ('torch', 'int8', 'onnx')
+
+
+def load_encoder(model_name, backend='torch', onnx_cache_dir=None):
+    if backend == 'torch':
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+
+    if backend == 'int8':
+        import torch
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name, device='cpu')
+        torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        return model
+
+    if backend == 'onnx':
+        return OnnxEncoder(model_name, cache_dir=onnx_cache_dir)
+
+    raise ValueError(f"Unknown embedding backend '{backend}', expected one of {', '.join(BACKENDS)}")
+
+
+class OnnxEncoder:
+    """bge-style dense encoder on ONNX Runtime: CLS pooling, optional L2 normalization"""
+
+    def __init__(self, model_name, max_length=512, cache_dir=None):
+        try:
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise RuntimeError("The onnx embedding backend needs `pip install optimum[onnxruntime]`") from e
+
+        export_dir = os.path.join(cache_dir, model_name.replace('/', '--')) if cache_dir else None
+        if export_dir and os.path.isdir(export_dir):
+            self.tokenizer = AutoTokenizer.from_pretrained(export_dir)
+            self.model = ORTModelForFeatureExtraction.from_pretrained(export_dir)
+        else:
+            # export=True converts the PyTorch checkpoint, which takes minutes for a large model
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+            self.model = ORTModelForFeatureExtraction.from_pretrained(model_name, export=True)
+            if export_dir:
+                self._save_export(export_dir)
+        self.max_length = max_length
+        self.device = SimpleNamespace(type='cpu')
+        self._lock = threading.Lock()
+
+    def _save_export(self, export_dir):
+        # Saved beside the final directory and renamed into place, so a directory that
+        # exists is always complete, even when several workers export at once
+        staging = f"{export_dir}.tmp-{os.getpid()}"
+        try:
+            self.model.save_pretrained(staging)
+            self.tokenizer.save_pretrained(staging)
+            os.rename(staging, export_dir)
+        except OSError as e:
+            if not os.path.isdir(export_dir):  # otherwise another worker got there first
+                print(f"Could not cache the ONNX export in {export_dir}: {e}")
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def encode(self, texts, normalize_embeddings=True, batch_size=32):
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            with self._lock:
+                inputs = self.tokenizer(
+                    texts[start:start + batch_size],
+                    padding=True,
+                    truncation=True,
+                    max_length=self.max_length,
+                    return_tensors='np'
+                )
+            outputs = self.model(**inputs)
+            vectors.append(np.asarray(outputs.last_hidden_state)[:, 0])
+
+        embeddings = np.concatenate(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        if normalize_embeddings and len(embeddings):
+            embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings.astype(np.float32)
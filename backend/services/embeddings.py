@@ -1,67 +1,489 @@
-from sentence_transformers import SentenceTransformer
 import chromadb
-from chromadb.config import Settings
+from chromadb.errors import InvalidCollectionException
 import numpy as np
+import hashlib
+import os
+import threading
+import time
+from services.metrics import metrics
+from services.query_batcher import QueryBatcher
+from services.query_cache import QueryEmbeddingCache, normalize_query
+from services.embedding_backends import load_encoder
+from services.lexical_index import GenerationCounters, LexicalIndexes, reciprocal_rank_fusion
+
+# Part of the chunk-store name: bump when passage encoding changes so old vectors are not reused
+PASSAGE_ENCODING_VERSION = "plain-v2"
+
+# bge instruction for the query side only; passages are embedded as they are
+QUERY_INSTRUCTION = "Represent this sentence for searching relevant passages: "
+
+# Rough activation memory of one chunk-sized sequence in an fp32 forward pass
+BATCH_ITEM_MB = 48
+
+
+# What a call on the handle of a deleted collection raises (see CachedCollection)
+STALE_COLLECTION_ERRORS = (InvalidCollectionException, StopIteration)
+
+
+def chunk_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def available_memory_mb():
+    """Memory the OS can still hand out, in MB (None when it cannot be determined)"""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def auto_batch_size(device_type='cpu', cpu_count=None, memory_mb=None):
+    """
+    Encode batch size for this machine. On CPU a few sequences per core keep every core
+    busy; beyond that a bigger batch only adds padding and memory. The batch is also kept
+    within a quarter of the available memory.
+    """
+    if device_type != 'cpu':
+        return 128
+
+    cpu_count = cpu_count or os.cpu_count() or 1
+    batch_size = min(64, max(8, cpu_count * 4))
+
+    memory_mb = available_memory_mb() if memory_mb is None else memory_mb
+    if memory_mb:
+        batch_size = min(batch_size, max(1, memory_mb // 4 // BATCH_ITEM_MB))
+    return batch_size
+
+
+class CachedCollection:
+    """
+    A cached Chroma collection handle. Workspace ids can be reused, so another process may
+    have deleted the collection and created a new one under the same name. The old handle
+    then fails: writes and query() raise InvalidCollectionException, while count() and get()
+    (chromadb 0.4.x) raise a bare StopIteration. Calls that fail either way are retried once
+    on a fresh handle.
+    """
+
+    def __init__(self, service, name, collection):
+        self._service = service
+        self._name = name
+        self._collection = collection
+
+    def __getattr__(self, attr):
+        value = getattr(self._collection, attr)
+        if not callable(value):
+            return value
+
+        def call(*args, **kwargs):
+            try:
+                return getattr(self._collection, attr)(*args, **kwargs)
+            except STALE_COLLECTION_ERRORS:
+                metrics.incr('embedding.stale_collections')
+                self._collection = self._service._refetch_collection(self._name)
+                return getattr(self._collection, attr)(*args, **kwargs)
+        return call
+
 
 class EmbeddingService:
-    def __init__(self):
-        self.model = SentenceTransformer('BAAI/bge-m3')
-        self.client = chromadb.PersistentClient(path="./chroma_db")
+    def __init__(self, model_name='BAAI/bge-m3', chroma_path="./chroma_db", backend='torch', batch_size=None,
+                 query_batch_size=32, query_batch_wait_ms=5, query_batch_timeout=30, query_cache_mb=32,
+                 retrieval_mode='hybrid', lexical_index_workspaces=64, onnx_cache_dir=None):
+        self._load_encoder(model_name, backend, batch_size, onnx_cache_dir)
+        self._open_store(chroma_path, retrieval_mode, lexical_index_workspaces)
 
-    def encoding(self, texts):
-        instruction = "Represent this sentence for searching relevant passages: "
-        processed = [instruction + t for t in texts]
+        self.query_cache = QueryEmbeddingCache(int(query_cache_mb * 1024 * 1024)) if query_cache_mb > 0 else None
+        self.query_batcher = None
+        if query_batch_wait_ms > 0 and query_batch_size > 1:
+            self.query_batcher = QueryBatcher(
+                self.encode_queries,
+                max_batch=query_batch_size,
+                max_wait_ms=query_batch_wait_ms,
+                timeout=query_batch_timeout
+            )
 
+    @classmethod
+    def encoder_only(cls, model_name='BAAI/bge-m3', backend='torch', batch_size=None, onnx_cache_dir=None):
+        """The encoder alone, for benchmarks: no Chroma, query cache or query batching"""
+        service = cls.__new__(cls)
+        service._load_encoder(model_name, backend, batch_size, onnx_cache_dir)
+        service.query_cache = None
+        service.query_batcher = None
+        return service
+
+    @classmethod
+    def store_only(cls, chroma_path="./chroma_db", model_name='BAAI/bge-m3', backend='torch',
+                   retrieval_mode='hybrid', lexical_index_workspaces=64):
+        """The Chroma side alone, without loading a model (for checks and benchmarks): dense search is unavailable"""
+        service = cls.__new__(cls)
+        service.model_name = model_name
+        service.backend = backend
+        service._open_store(chroma_path, retrieval_mode, lexical_index_workspaces)
+        return service
+
+    def _load_encoder(self, model_name, backend, batch_size, onnx_cache_dir):
+        self.model_name = model_name
+        self.backend = backend
+        self.model = load_encoder(model_name, backend, onnx_cache_dir)
+        self.batch_size = batch_size or auto_batch_size(self.model.device.type)
+
+    def _open_store(self, chroma_path, retrieval_mode, lexical_index_workspaces):
+        self.client = chromadb.PersistentClient(path=chroma_path)
+        self._collections = {}  # collection name -> handle
+        self._collections_lock = threading.Lock()
+        self.lexical = LexicalIndexes(
+            GenerationCounters(os.path.join(chroma_path, 'lexical_generations.sqlite3')),
+            lexical_index_workspaces
+        )
+        self.retrieval_mode = retrieval_mode
+
+    def encode_queries(self, queries):
+        """Normalized embeddings of search queries (with the query instruction)"""
         embeddings = self.model.encode(
-            processed,
+            [QUERY_INSTRUCTION + q for q in queries],
             normalize_embeddings=True,
-            batch_size=32
+            batch_size=self.batch_size
         )
-        #for cpu
-        # embeddings = self.model.encode(
-        #     processed,
-        #     normalize_embeddings=True
-        # )
         return embeddings.tolist()
+
+    def encode_query(self, query):
+        """
+        float32 embedding of one query. Repeated queries (after normalize_query) come from
+        the LRU cache; otherwise concurrent callers share a forward pass through the batcher.
+        """
+        key = normalize_query(query)
+        if self.query_cache is not None:
+            cached = self.query_cache.get(key)
+            if cached is not None:
+                return cached
+
+        if self.query_batcher is None:
+            embedding = self.encode_queries([key])[0]
+        else:
+            embedding = self.query_batcher.encode(key)
+
+        if self.query_cache is None:
+            return np.asarray(embedding, dtype=np.float32)
+        return self.query_cache.put(key, embedding)
+
+    def encode_query_batch(self, queries):
+        """float32 embeddings of several queries: cached ones are reused, the rest share one encode call"""
+        if len(queries) == 1:
+            return [self.encode_query(queries[0])]
+
+        keys = [normalize_query(query) for query in queries]
+        vectors = {}
+        if self.query_cache is not None:
+            for key in keys:
+                cached = self.query_cache.get(key)
+                if cached is not None:
+                    vectors[key] = cached
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing:
+            for key, embedding in zip(missing, self.encode_queries(missing)):
+                if self.query_cache is None:
+                    vectors[key] = np.asarray(embedding, dtype=np.float32)
+                else:
+                    vectors[key] = self.query_cache.put(key, embedding)
+
+        return [vectors[key] for key in keys]
+
+    def encode_passages(self, texts):
+        """
+        Normalized embeddings of stored passages, in input order. Texts are encoded
+        longest first so each batch holds similar lengths and little padding.
+        """
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        embeddings = [None] * len(texts)
+
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            encoded = self.model.encode(
+                [texts[i] for i in batch],
+                normalize_embeddings=True,
+                batch_size=len(batch)
+            )
+            for i, embedding in zip(batch, encoded.tolist()):
+                embeddings[i] = embedding
+
+        return embeddings
     
-    def get_or_create_collection(self, workspace_id):
-        collection_name = f"workspace_{workspace_id}"
+    def _collection(self, name):
+        """Collection handle by name, fetched from Chroma once per process and then reused"""
+        collection = self._collections.get(name)
+        if collection is not None:
+            return collection
+
+        with self._collections_lock:
+            if name not in self._collections:
+                self._collections[name] = CachedCollection(self, name, self._fetch_collection(name))
+            return self._collections[name]
+
+    def _fetch_collection(self, name):
         return self.client.get_or_create_collection(
-            name=collection_name,
+            name=name,
             metadata={"hnsw:space": "cosine"}# for retrival accuray we use cosine similarity
         )
+
+    def _refetch_collection(self, name):
+        """A fresh Chroma handle for a cached collection whose handle went stale"""
+        with self._collections_lock:
+            return self._fetch_collection(name)
+
+    def get_or_create_collection(self, workspace_id):
+        return self._collection(f"workspace_{workspace_id}")
     
-    def embed_and_store(self, workspace_id, document_id, chunks):
-        collection = self.get_or_create_collection(workspace_id)
-        embeddings = self.encoding(chunks)
+    @property
+    def chunk_store_name(self):
+        # Backends give slightly different vectors, so each keeps its own store
+        key = f"{self.model_name}|{self.backend}|{PASSAGE_ENCODING_VERSION}"
+        return f"chunk_embeddings_{hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]}"
+
+    def get_chunk_store(self):
+        """Collection shared by all workspaces: chunk hash -> passage embedding"""
+        return self._collection(self.chunk_store_name)
 
-        ids = [f"doc{document_id}_chunk{i}" for i in range(len(chunks))]
-        metadatas = [{"document_id": document_id, "chunk_index": i} for i in range(len(chunks))]
+    def embed_passages_cached(self, texts):
+        """
+        Embeddings for texts, reusing the stored vector of any chunk embedded before
+        (in any workspace) and running the model only on new ones. Returns (embeddings, hashes).
+        """
+        hashes = [chunk_hash(text) for text in texts]
+        unique_hashes = list(dict.fromkeys(hashes))
+
+        store = self.get_chunk_store()
+        found = store.get(ids=unique_hashes, include=['embeddings'])
+        known = dict(zip(found['ids'], found['embeddings']))
+
+        missing = [h for h in unique_hashes if h not in known]
+        if missing:
+            text_by_hash = dict(zip(hashes, texts))
+            new_embeddings = self.encode_passages([text_by_hash[h] for h in missing])
+            store.upsert(ids=missing, embeddings=new_embeddings)
+            known.update(zip(missing, new_embeddings))
+
+        metrics.incr('embedding.chunks_encoded', len(missing))
+        metrics.incr('embedding.chunks_reused', len(texts) - len(missing))
+        return [known[h] for h in hashes], hashes
+
+    def _prune_chunk_store(self, hashes):
+        """
+        Delete the stored vectors of chunk hashes that no workspace collection references
+        any more. The store only caches vectors the collections hold too, so one pruned
+        while another worker reuses it is merely encoded again next time.
+        """
+        unreferenced = set(hashes)
+        try:
+            for collection in self.client.list_collections():
+                if not unreferenced:
+                    return
+                if not collection.name.startswith('workspace_'):
+                    continue
+                try:
+                    found = collection.get(where={"chunk_hash": {"$in": list(unreferenced)}}, include=['metadatas'])
+                except STALE_COLLECTION_ERRORS:
+                    continue  # deleted since it was listed
+                unreferenced -= {metadata['chunk_hash'] for metadata in found['metadatas']}
 
-        collection.add(
-            embeddings=embeddings,
-            documents=chunks,
-            ids=ids,
-            metadatas=metadatas
+            if unreferenced:
+                self.get_chunk_store().delete(ids=list(unreferenced))
+                metrics.incr('embedding.chunks_pruned', len(unreferenced))
+        except Exception as e:
+            print(f"Error pruning chunk store: {e}")
+
+    def copy_document(self, source_workspace_id, source_document_id, workspace_id, document_id, batch_size=256):
+        """Copy an already ingested document's chunks and vectors under a new document id"""
+        source = self.get_or_create_collection(source_workspace_id)
+        results = source.get(
+            where={"document_id": source_document_id},
+            include=['embeddings', 'documents', 'metadatas']
+        )
+        rows = sorted(
+            zip(results['metadatas'], results['documents'], results['embeddings']),
+            key=lambda row: row[0].get('chunk_index', 0)
         )
 
-        return len(chunks)
+        target = self.get_or_create_collection(workspace_id)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            metadatas = [{**metadata, "document_id": document_id} for metadata, _, _ in batch]
+
+            ids = [f"doc{document_id}_chunk{metadata['chunk_index']}" for metadata in metadatas]
+            texts = [text for _, text, _ in batch]
+            target.add(
+                embeddings=[embedding for _, _, embedding in batch],
+                documents=texts,
+                ids=ids,
+                metadatas=metadatas
+            )
+            self.lexical.add(workspace_id, ids, texts)
+
+        metrics.incr('embedding.chunks_reused', len(rows))
+        return len(rows)
+
+    def embed_and_store(self, workspace_id, document_id, chunks, batch_size=None, on_progress=None):
+        """Embed chunks and add them to the workspace collection in fixed-size batches.
+
+        Chunks whose text was embedded before are served from the shared chunk store.
+
+        chunks may be any iterable of strings or Chunk objects (whose character offsets are
+        kept in the metadata), including a generator, so only one batch is held in memory
+        at a time. on_progress(chunks_embedded, chunks_total) is called after each batch is
+        stored; chunks_total is None when chunks has no length. A batch defaults to a few
+        encode batches, so the length sorting in encode_passages has room to work.
+        """
+        batch_size = batch_size or self.batch_size * 4
+        collection = self.get_or_create_collection(workspace_id)
+        chunks_total = len(chunks) if hasattr(chunks, '__len__') else None
+        stored = 0
+        batch = []
+
+        def flush():
+            texts = [getattr(chunk, 'text', chunk) for chunk in batch]
+            embeddings, hashes = self.embed_passages_cached(texts)
+            ids = [f"doc{document_id}_chunk{i}" for i in range(stored, stored + len(batch))]
+            metadatas = []
+            for i, chunk, digest in zip(range(stored, stored + len(batch)), batch, hashes):
+                metadata = {"document_id": document_id, "chunk_index": i, "chunk_hash": digest}
+                if hasattr(chunk, 'char_start'):
+                    metadata["char_start"] = chunk.char_start
+                    metadata["char_end"] = chunk.char_end
+                if getattr(chunk, 'page_start', None) is not None:
+                    metadata["page_start"] = chunk.page_start
+                    metadata["page_end"] = chunk.page_end
+                metadatas.append(metadata)
+
+            collection.add(
+                embeddings=embeddings,
+                documents=texts,
+                ids=ids,
+                metadatas=metadatas
+            )
+            self.lexical.add(workspace_id, ids, texts)
+
+        for chunk in chunks:
+            batch.append(chunk)
+            if len(batch) == batch_size:
+                flush()
+                stored += len(batch)
+                batch = []
+                if on_progress:
+                    on_progress(stored, chunks_total)
+
+        if batch:
+            flush()
+            stored += len(batch)
+            if on_progress:
+                on_progress(stored, chunks_total)
+
+        return stored
     
-    def search(self, workspace_id, query, top_k=5):
+    def retrieve(self, workspace_id, query, top_k=5, mode=None, where=None):
+        """
+        Search that also returns the chunk ids, their metadata and the query embedding.
+
+        mode is 'dense' (vector search only), 'lexical' (BM25 only) or 'hybrid': both
+        rankings over a wider candidate pool, fused with reciprocal rank fusion.
+        where (see retrieval_filters.build_where) limits both searches to matching chunks.
+        """
+        return self.retrieve_many(workspace_id, [query], top_k, mode, where)[0]
+
+    def retrieve_many(self, workspace_id, queries, top_k=5, mode=None, where=None):
+        """retrieve() for several queries at once: one encode pass and one Chroma query for all of them"""
+        mode = mode or self.retrieval_mode
         collection = self.get_or_create_collection(workspace_id)
-        query_embedding = self.encoding([query])
+        candidates = top_k if mode == 'dense' else max(top_k * 4, 20)
 
-        results = collection.query(
-            query_embeddings=query_embedding,
-            n_results=top_k
-        )
+        if mode == 'lexical':
+            # BM25 alone needs neither the query embedding nor the vector search
+            retrievals = [
+                {'ids': [], 'documents': [], 'metadatas': [], 'query_embedding': None}
+                for _ in queries
+            ]
+        else:
+            query_embeddings = self.encode_query_batch(queries)
+
+            start = time.perf_counter()
+            results = collection.query(
+                query_embeddings=[embedding.tolist() for embedding in query_embeddings],
+                n_results=candidates,
+                where=where
+            )
+            metrics.observe('retrieval.dense', time.perf_counter() - start)
 
-        return results["documents"][0] if results["documents"] else []
+            retrievals = []
+            for i, query_embedding in enumerate(query_embeddings):
+                retrievals.append({
+                    'ids': results["ids"][i] if results["ids"] else [],
+                    'documents': results["documents"][i] if results["documents"] else [],
+                    'metadatas': results["metadatas"][i] if results["metadatas"] else [],
+                    'query_embedding': query_embedding
+                })
+
+        if mode == 'dense':
+            return retrievals
+
+        start = time.perf_counter()
+        index = self.lexical.get(workspace_id, collection)
+        allowed = set(collection.get(where=where, include=[])['ids']) if where else None
+
+        rows = {}
+        for retrieval in retrievals:
+            rows.update(zip(retrieval['ids'], zip(retrieval['documents'], retrieval['metadatas'])))
+
+        for query, retrieval in zip(queries, retrievals):
+            lexical_ids = [chunk_id for chunk_id, _ in index.search(query, candidates, allowed=allowed)]
+            ids = lexical_ids if mode == 'lexical' else reciprocal_rank_fusion([retrieval['ids'], lexical_ids])
+            retrieval['ids'] = ids[:top_k]
+        metrics.observe('retrieval.lexical', time.perf_counter() - start)
+
+        # Chunks found only lexically are fetched in one round trip for all queries
+        missing = list({chunk_id for r in retrievals for chunk_id in r['ids'] if chunk_id not in rows})
+        if missing:
+            fetched = collection.get(ids=missing, include=['documents', 'metadatas'])
+            rows.update(zip(fetched['ids'], zip(fetched['documents'], fetched['metadatas'])))
+            if len(fetched['ids']) < len(missing):
+                # The index still holds chunks deleted meanwhile: drop them now, rebuild next time
+                metrics.incr('retrieval.lexical_stale')
+                self.lexical.invalidate(workspace_id)
+
+        for retrieval in retrievals:
+            retrieval['ids'] = [chunk_id for chunk_id in retrieval['ids'] if chunk_id in rows]
+            retrieval['documents'] = [rows[chunk_id][0] for chunk_id in retrieval['ids']]
+            retrieval['metadatas'] = [rows[chunk_id][1] for chunk_id in retrieval['ids']]
+        return retrievals
+
+    def search(self, workspace_id, query, top_k=5, mode=None, where=None):
+        return self.retrieve(workspace_id, query, top_k, mode, where)['documents']
+
+    def delete_document(self, workspace_id, document_id):
+        """Remove a document's chunks from the workspace collection, its lexical index and the chunk store"""
+        collection = self.get_or_create_collection(workspace_id)
+        chunks = collection.get(where={"document_id": document_id}, include=['documents'])
+        chunk_ids = chunks['ids']
+        if chunk_ids:
+            collection.delete(ids=chunk_ids)
+            self.lexical.remove(workspace_id, chunk_ids)
+            self._prune_chunk_store({chunk_hash(text) for text in chunks['documents']})
+        return len(chunk_ids)
     
     def delete_workspace_collection(self, workspace_id):
         try:
             collection_name = f"workspace_{workspace_id}"
-            self.client.delete_collection(name=collection_name)
+            texts = self.get_or_create_collection(workspace_id).get(include=['documents'])['documents']
+            # Held across both steps so no concurrent lookup caches a handle to the deleted collection
+            with self._collections_lock:
+                self._collections.pop(collection_name, None)
+                self.client.delete_collection(name=collection_name)
+            self.lexical.drop(workspace_id)
+            self._prune_chunk_store({chunk_hash(text) for text in texts})
             return True
         except Exception as e:
             print(f"Error deleting collection: {e}")
@@ -0,0 +1,53 @@
+import hashlib
+import os
+import uuid
+
+from models import DocumentFile
+
+READ_BLOCK = 1024 * 1024
+
+
+def save_upload(file, upload_folder, extension):
+    """
+    Store an uploaded file under the sha256 of its bytes. Identical uploads share one
+    file on disk and two different files with the same name no longer overwrite each other.
+    Returns (file_path, sha256, size_bytes).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = os.path.join(upload_folder, f".upload-{uuid.uuid4().hex}")
+
+    with open(tmp_path, 'wb') as out:
+        while True:
+            block = file.stream.read(READ_BLOCK)
+            if not block:
+                break
+            digest.update(block)
+            out.write(block)
+            size += len(block)
+
+    sha256 = digest.hexdigest()
+    file_path = os.path.join(upload_folder, f"{sha256}{extension}")
+    if os.path.exists(file_path):
+        os.remove(tmp_path)
+    else:
+        os.replace(tmp_path, file_path)
+
+    return file_path, sha256, size
+
+
+def release_upload(document):
+    """Delete a document's file unless another document still refers to the same content"""
+    if not document.file_path or not os.path.exists(document.file_path):
+        return
+
+    record = DocumentFile.query.get(document.id)
+    if record is not None:
+        shared = DocumentFile.query.filter(
+            DocumentFile.sha256 == record.sha256,
+            DocumentFile.document_id != document.id
+        ).count()
+        if shared:
+            return
+
+    os.remove(document.file_path)
@@ -1,10 +1,12 @@
 from datetime import datetime, timedelta
-import ollama
+from services.llm_gateway import LLMGateway, LLMGatewayError, BATCH
+from services.prompts import FLASHCARDS
 import re
 
 class FlashCardGenerator:
-    def __init__(self, model_name="llama3.1"):
+    def __init__(self, model_name="llama3.1", gateway=None):
         self.model_name = model_name
+        self.gateway = gateway or LLMGateway()
 
     def generate_flashcards(self, documents, embedding_service, workspace_id, count=10):
         if not documents:
@@ -27,31 +29,16 @@ class FlashCardGenerator:
             print(f"Error fetching chunks: {e}")
             return []
         
-        prompt = f"""Based on the following study material, create {count} flashcard-style question and answer pairs.
-
-**Study Material:**
-{combined_text}
-
-**Instructions:**
-1. Create clear, specific questions that test understanding
-2. Keep questions concise (1-2 sentences)
-3. Provide complete, accurate answers
-4. Focus on key concepts, definitions, and important facts
-5. Make questions diverse - mix definitions, applications, and examples
-6. Use this EXACT format for each flashcard:
-
-Q: [Your question here]
-A: [Your answer here]
-
-Q: [Next question]
-A: [Next answer]
-
-Generate {count} flashcards now:"""
+        messages = FLASHCARDS.messages(
+            f"**Study Material:**\n{combined_text}",
+            f"Generate {count} flashcards now:"
+        )
         
         try:
-            response = ollama.generate(
+            response = self.gateway.chat(
+                priority=BATCH,
                 model=self.model_name,
-                prompt=prompt,
+                messages=messages,
                 options={
                     "temperature": 0.7,
                     "top_p": 0.9,
@@ -59,9 +46,11 @@ Generate {count} flashcards now:"""
                 }
             )
 
-            flashcards = self.parse_flashcards(response['response'])
+            flashcards = self.parse_flashcards(response['message']['content'])
             return flashcards[:count]
         
+        except LLMGatewayError:
+            raise
         except Exception as e:
             print(f"Error getting flashcards")
             return self.generate_fallback_flashcards()
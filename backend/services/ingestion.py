@@ -0,0 +1,314 @@
+import json
+import os
+import socket
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from models import db, Document, DocumentFile, IngestionJob
+from services.file_store import release_upload
+from services.registry import services
+
+
+def _boot_id():
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+def _process_start(pid):
+    """Start time of a process in clock ticks since boot ('' where /proc is unavailable)"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[19]
+    except (OSError, IndexError):
+        return ''
+
+
+def process_owner():
+    """Identifies this process among all that ever ran: host, boot, pid and pid start time"""
+    pid = os.getpid()
+    return f"{socket.gethostname()}|{_boot_id()}|{pid}|{_process_start(pid)}"
+
+
+def owner_gone(owner):
+    """Whether the process that queued a job has exited (jobs of other hosts are assumed alive)"""
+    try:
+        host, boot, pid, started = owner.split('|')
+        pid = int(pid)
+    except (AttributeError, ValueError):
+        return True  # queued before owners were recorded
+
+    if host != socket.gethostname():
+        return False
+    if boot != _boot_id():
+        return True
+    if started:
+        # A different start time means the pid was reused by another process
+        return _process_start(pid) != started
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+
+class _JobProgress:
+    """Buffers progress counters and writes them to the job row at most every `interval` seconds"""
+
+    def __init__(self, job, interval=0.5):
+        self.job = job
+        self.interval = interval
+        self._last_flush = 0.0
+
+    def update(self, force=False, **fields):
+        for key, value in fields.items():
+            setattr(self.job, key, value)
+
+        now = time.perf_counter()
+        if force or now - self._last_flush >= self.interval:
+            db.session.commit()
+            self._last_flush = now
+
+
+class _StageTimer:
+    """Accumulates the time spent pulling items from each wrapped iterator"""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+
+    def wrap(self, name, iterable):
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self.seconds[name] += time.perf_counter() - start
+            yield item
+
+
+class IngestionQueue:
+    """
+    In-process background queue for document ingestion.
+    Uploads return immediately with a job id; extraction, chunking and
+    embedding run on a small worker pool and report progress on the job row.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._executor = None
+
+    def init_app(self, app, max_workers=2):
+        self.app = app
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ingest')
+        app.extensions['ingestion_queue'] = self
+
+    def enqueue(self, workspace_id, document):
+        job = IngestionJob(
+            id=str(uuid.uuid4()),
+            workspace_id=workspace_id,
+            document_id=document.id,
+            filename=document.filename,
+            owner=process_owner()
+        )
+        db.session.add(job)
+        db.session.commit()
+
+        self._executor.submit(self._run, job.id)
+        return job
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            job = IngestionJob.query.get(job_id)
+            document = Document.query.get(job.document_id)
+            progress = _JobProgress(job)
+            timings = {}
+            started = time.perf_counter()
+
+            try:
+                if document is None:
+                    raise ValueError("Document was deleted before processing started")
+
+                progress.update(force=True, status='running', stage='extracting')
+
+                source = self._find_ingested_copy(document)
+                chunk_count = 0
+                if source is not None:
+                    # Same bytes were ingested before: copy chunks and vectors, skip extraction and the model
+                    progress.update(force=True, stage='embedding')
+                    stage_start = time.perf_counter()
+                    chunk_count = services.embedding.copy_document(
+                        source.workspace_id, source.id, job.workspace_id, document.id
+                    )
+                    timings['copy'] = round(time.perf_counter() - stage_start, 3)
+
+                if not chunk_count:
+                    chunk_count = self._run_pipeline(job, document, progress, timings)
+
+                document.chunk_count = chunk_count
+                record = DocumentFile.query.get(document.id)
+                if record is not None:
+                    record.embedding_store = services.embedding.chunk_store_name
+                services.answer_cache.invalidate_workspace(job.workspace_id)
+                timings['total'] = round(time.perf_counter() - started, 3)
+                progress.update(
+                    force=True,
+                    status='completed',
+                    stage=None,
+                    chunks_total=chunk_count,
+                    chunks_embedded=chunk_count,
+                    timings=json.dumps(timings),
+                    finished_at=datetime.now()
+                )
+
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error ingesting document for job {job_id}: {e}")
+                try:
+                    self._discard_document(job, document)
+                except Exception as discard_error:
+                    # The job must still end up failed, or its client polls forever
+                    db.session.rollback()
+                    print(f"Warning: Could not discard document for job {job_id}: {discard_error}")
+                timings['total'] = round(time.perf_counter() - started, 3)
+                progress.update(
+                    force=True,
+                    status='failed',
+                    error=str(e),
+                    timings=json.dumps(timings),
+                    finished_at=datetime.now()
+                )
+
+            finally:
+                db.session.remove()
+
+    def fail_interrupted_jobs(self):
+        """
+        Fail queued or running jobs whose owning process has exited. Jobs only run in the
+        process that queued them, so these were cut off by a restart and will never finish.
+        Jobs of live processes (sibling workers) are left alone.
+        """
+        jobs = [
+            job for job in IngestionJob.query.filter(IngestionJob.status.in_(['queued', 'running'])).all()
+            if owner_gone(job.owner)
+        ]
+
+        for job in jobs:
+            try:
+                self._discard_document(job, Document.query.get(job.document_id) if job.document_id else None)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Warning: Could not discard document for interrupted job {job.id}: {e}")
+            job.status = 'failed'
+            job.error = 'Processing was interrupted by a server restart, please upload the document again'
+            job.finished_at = datetime.now()
+            db.session.commit()
+
+        if jobs:
+            print(f"Marked {len(jobs)} interrupted ingestion job(s) as failed")
+        return len(jobs)
+
+    def _run_pipeline(self, job, document, progress, timings):
+        # Pages, chunks and embedding batches stream through one pipeline, so
+        # stage times are the time spent inside each stage's iterator
+        timer = _StageTimer()
+        pages = timer.wrap('extract', self._iter_pages(document.file_path, progress))
+        chunks = timer.wrap('chunk', services.doc_processor.iter_token_chunks(
+            pages, page_numbers=document.file_path.endswith('.pdf')
+        ))
+
+        stage_start = time.perf_counter()
+        chunk_count = services.embedding.embed_and_store(
+            workspace_id=job.workspace_id,
+            document_id=document.id,
+            chunks=chunks,
+            on_progress=lambda done, total: progress.update(chunks_embedded=done)
+        )
+        pipeline_seconds = time.perf_counter() - stage_start
+
+        timings['extract'] = round(timer.seconds['extract'], 3)
+        timings['chunk'] = round(timer.seconds['chunk'] - timer.seconds['extract'], 3)
+        timings['embed'] = round(pipeline_seconds - timer.seconds['chunk'], 3)
+        return chunk_count
+
+    def _find_ingested_copy(self, document):
+        """An already ingested document with byte-identical content, embedded by the current model and backend"""
+        record = DocumentFile.query.get(document.id)
+        if record is None:
+            return None
+
+        return Document.query.join(DocumentFile, DocumentFile.document_id == Document.id).filter(
+            DocumentFile.sha256 == record.sha256,
+            DocumentFile.embedding_store == services.embedding.chunk_store_name,
+            Document.id != document.id,
+            Document.chunk_count > 0
+        ).first()
+
+    def _iter_pages(self, file_path, progress):
+        processor = services.doc_processor
+
+        def on_page(done, total):
+            # Embedding runs alongside extraction; once the last page is in, only embedding is left
+            progress.update(
+                force=done == total,
+                pages_extracted=done,
+                pages_total=total,
+                stage='extracting' if done < total else 'embedding'
+            )
+
+        if file_path.endswith('.pdf'):
+            return processor.iter_pdf_pages(file_path, on_page=on_page)
+
+        pages = list(processor.iter_docx_pages(file_path))
+        on_page(len(pages), len(pages))
+        return pages
+
+    def _discard_document(self, job, document):
+        """Remove whatever a failed ingestion left behind so the upload can simply be retried"""
+        if document is None:
+            return
+
+        try:
+            services.embedding.delete_document(job.workspace_id, document.id)
+        except Exception as e:
+            print(f"Warning: Could not delete embeddings: {e}")
+
+        release_upload(document)
+
+        job.document_id = None
+        DocumentFile.query.filter_by(document_id=document.id).delete()
+        db.session.delete(document)
+        db.session.commit()
+
+
+def serialize_job(job):
+    return {
+        'job_id': job.id,
+        'document_id': job.document_id,
+        'workspace_id': job.workspace_id,
+        'filename': job.filename,
+        'status': job.status,
+        'stage': job.stage,
+        'progress': {
+            'pages_total': job.pages_total,
+            'pages_extracted': job.pages_extracted,
+            'chunks_total': job.chunks_total,
+            'chunks_embedded': job.chunks_embedded
+        },
+        'timings': json.loads(job.timings) if job.timings else {},
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
+
+
+ingestion_queue = IngestionQueue()
@@ -0,0 +1,205 @@
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, OrderedDict, defaultdict
+
+# Identifiers keep their underscores and dots (inner_join, na.rm), and R operators such
+# as %>%, %in% and |> are tokens of their own, so exact code terms match exactly
+TOKEN_PATTERN = re.compile(r"%[^%\s]{1,10}%|\|>|<-|[a-z0-9]+(?:[._][a-z0-9]+)*")
+
+
+def tokenize(text):
+    """Lowercased terms of text; compound identifiers also contribute their parts"""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if '_' in token or '.' in token:
+            tokens.extend(part for part in re.split(r'[._]', token) if part)
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several ranked id lists: score(id) = sum over lists of 1 / (k + rank)"""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] += 1.0 / (k + rank)
+    return sorted(scores, key=lambda item: -scores[item])
+
+
+class BM25Index:
+    """In-memory Okapi BM25 over the chunks of one workspace"""
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(dict)  # term -> {chunk_id: term frequency}
+        self._lengths = {}  # chunk_id -> number of terms
+        self._terms = {}  # chunk_id -> distinct terms, for removal
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def add(self, chunk_ids, texts):
+        with self._lock:
+            for chunk_id, text in zip(chunk_ids, texts):
+                if chunk_id in self._lengths:
+                    self._remove(chunk_id)
+
+                terms = Counter(tokenize(text))
+                for term, count in terms.items():
+                    self._postings[term][chunk_id] = count
+                self._terms[chunk_id] = tuple(terms)
+                length = sum(terms.values())
+                self._lengths[chunk_id] = length
+                self._total_length += length
+
+    def remove(self, chunk_ids):
+        with self._lock:
+            for chunk_id in chunk_ids:
+                if chunk_id in self._lengths:
+                    self._remove(chunk_id)
+
+    def _remove(self, chunk_id):
+        for term in self._terms.pop(chunk_id):
+            postings = self._postings[term]
+            del postings[chunk_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(chunk_id)
+
+    def search(self, query, top_k=20, allowed=None):
+        """[(chunk_id, score)] best first; with `allowed`, only chunk ids in that set are scored"""
+        with self._lock:
+            n = len(self._lengths)
+            if not n:
+                return []
+
+            average_length = self._total_length / n
+            scores = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for chunk_id, tf in postings.items():
+                    if allowed is not None and chunk_id not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / average_length)
+                    scores[chunk_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: -item[1])[:top_k]
+
+
+class GenerationCounters:
+    """
+    Per-workspace generation numbers in a small SQLite file beside the Chroma data, so
+    every process using that directory sees them. A workspace's number is bumped after
+    each write to its chunks; SQLite makes the increment atomic across processes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._pid = None
+        self._connection = None
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connect().execute(
+                "CREATE TABLE IF NOT EXISTS generations (workspace TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+            )
+
+    def _connect(self):
+        # One connection per process; a connection inherited over fork must not be reused
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._pid = os.getpid()
+        return self._connection
+
+    def current(self, workspace_id):
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT generation FROM generations WHERE workspace = ?", (str(workspace_id),)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def bump(self, workspace_id):
+        """Increment the workspace's generation and return the new value"""
+        with self._lock:
+            return self._connect().execute(
+                "INSERT INTO generations VALUES (?, 1) "
+                "ON CONFLICT(workspace) DO UPDATE SET generation = generation + 1 RETURNING generation",
+                (str(workspace_id),)
+            ).fetchone()[0]
+
+
+class LexicalIndexes:
+    """
+    BM25 indexes per workspace, kept beside the Chroma collections. An index is built
+    from its collection on first use and remembers the workspace generation it was built
+    at. Every write bumps the generation (see GenerationCounters), so an index is rebuilt
+    once chunks were added or deleted by another worker process; this process's own
+    writes update its index in place when no other write came in between.
+    At most max_workspaces indexes are kept; the least recently searched is evicted first.
+    """
+
+    def __init__(self, generations, max_workspaces=64):
+        self.generations = generations
+        self.max_workspaces = max(1, max_workspaces)
+        self._indexes = OrderedDict()  # workspace_id -> (generation, index)
+        self._lock = threading.Lock()
+
+    def get(self, workspace_id, collection):
+        # Read before the collection, so chunks written meanwhile make the index look stale, never current
+        generation = self.generations.current(workspace_id)
+        with self._lock:
+            entry = self._indexes.get(workspace_id)
+            if entry is not None and entry[0] == generation:
+                self._indexes.move_to_end(workspace_id)
+                return entry[1]
+
+        results = collection.get(include=['documents'])
+        index = BM25Index()
+        index.add(results['ids'], results['documents'])
+        with self._lock:
+            self._indexes[workspace_id] = (generation, index)
+            self._indexes.move_to_end(workspace_id)
+            while len(self._indexes) > self.max_workspaces:
+                self._indexes.popitem(last=False)
+        return index
+
+    def add(self, workspace_id, chunk_ids, texts):
+        """Record chunks just written to the collection"""
+        self._update(workspace_id, lambda index: index.add(chunk_ids, texts))
+
+    def remove(self, workspace_id, chunk_ids):
+        """Record chunks just deleted from the collection"""
+        self._update(workspace_id, lambda index: index.remove(chunk_ids))
+
+    def _update(self, workspace_id, change):
+        generation = self.generations.bump(workspace_id)
+        with self._lock:
+            entry = self._indexes.get(workspace_id)
+            if entry is None:
+                # Indexes not built yet are built from the collection on first search
+                return
+            if entry[0] != generation - 1:
+                # Another write came in since the index was built: rebuild on next search
+                del self._indexes[workspace_id]
+                return
+            change(entry[1])
+            self._indexes[workspace_id] = (generation, entry[1])
+
+    def invalidate(self, workspace_id):
+        """Forget this process's index, e.g. when it returned chunks the collection no longer has"""
+        with self._lock:
+            self._indexes.pop(workspace_id, None)
+
+    def drop(self, workspace_id):
+        """Record that the workspace's collection was deleted"""
+        self.generations.bump(workspace_id)
+        self.invalidate(workspace_id)
@@ -0,0 +1,173 @@
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+import ollama
+
+from services.metrics import metrics
+
+# Admission priorities: lower is served first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+
+class LLMGatewayError(Exception):
+    """The LLM could not take the request; carries the HTTP status the API should answer with"""
+    status_code = 503
+
+
+class LLMQueueFull(LLMGatewayError):
+    status_code = 429
+
+
+class LLMUnavailable(LLMGatewayError):
+    status_code = 503
+
+
+class LLMGateway:
+    """
+    The one way the app talks to Ollama: a shared, pooled HTTP client with timeouts and
+    an admission queue in front of it.
+
+    At most max_concurrent generations run at once. Callers beyond that wait in a priority
+    queue (interactive before batch, first come first served within a priority). A request
+    is rejected right away with LLMQueueFull when the queue is full (batch work gets a
+    smaller share of it), and with LLMUnavailable when it waited queue_timeout seconds
+    or Ollama cannot be reached in time.
+    """
+
+    def __init__(self, host=None, max_concurrent=1, max_queue=32, max_batch_queue=8,
+                 queue_timeout=30, connect_timeout=5, request_timeout=300, keep_alive=None, num_ctx=None):
+        self.client = ollama.Client(
+            host=host,
+            timeout=httpx.Timeout(request_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_concurrent * 2, max_keepalive_connections=max_concurrent * 2)
+        )
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_batch_queue = max_batch_queue
+        self.queue_timeout = queue_timeout
+        # Applied to every call: Ollama reloads the model, dropping its prompt cache, when
+        # num_ctx changes between requests or keep_alive runs out
+        self.keep_alive = keep_alive
+        self.num_ctx = num_ctx
+
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, ticket number)
+        self._tickets = itertools.count()
+        self._in_flight = 0
+
+    def _queue_limit(self, priority):
+        return self.max_batch_queue if priority == BATCH else self.max_queue
+
+    def _queued(self, priority=None):
+        return sum(1 for waiting_priority, _ in self._waiting if priority is None or waiting_priority == priority)
+
+    def check_admission(self, priority=INTERACTIVE):
+        """Raise LLMQueueFull now if a request of this priority would be turned away"""
+        with self._cond:
+            if self._in_flight >= self.max_concurrent and self._queued() >= self._queue_limit(priority):
+                metrics.incr(f'llm.rejected.{PRIORITY_NAMES[priority]}')
+                raise LLMQueueFull("The assistant is busy right now, please try again shortly")
+
+    @contextmanager
+    def _slot(self, priority):
+        name = PRIORITY_NAMES[priority]
+        enqueued = time.perf_counter()
+        deadline = enqueued + self.queue_timeout
+
+        with self._cond:
+            if self._in_flight >= self.max_concurrent and self._queued() >= self._queue_limit(priority):
+                metrics.incr(f'llm.rejected.{name}')
+                raise LLMQueueFull("The assistant is busy right now, please try again shortly")
+
+            ticket = (priority, next(self._tickets))
+            heapq.heappush(self._waiting, ticket)
+            while self._waiting[0] != ticket or self._in_flight >= self.max_concurrent:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+                    metrics.incr(f'llm.queue_timeout.{name}')
+                    raise LLMUnavailable("The assistant is overloaded, please try again shortly")
+                self._cond.wait(remaining)
+
+            heapq.heappop(self._waiting)
+            self._in_flight += 1
+            # The next ticket may start too if more slots are free
+            self._cond.notify_all()
+
+        metrics.observe(f'llm.queue_wait.{name}', time.perf_counter() - enqueued)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def _defaults(self, kwargs):
+        if self.keep_alive is not None:
+            kwargs.setdefault('keep_alive', self.keep_alive)
+        if self.num_ctx:
+            kwargs['options'] = {'num_ctx': self.num_ctx, **(kwargs.get('options') or {})}
+        return kwargs
+
+    @staticmethod
+    def _record(response, priority):
+        """Prefill cost reported by Ollama; only the part of the prompt missing from its cache is evaluated"""
+        if 'prompt_eval_duration' in response:
+            metrics.observe(f'llm.prompt_eval.{PRIORITY_NAMES[priority]}', response['prompt_eval_duration'] / 1e9)
+        if 'prompt_eval_count' in response:
+            metrics.incr('llm.prompt_tokens_evaluated', response['prompt_eval_count'])
+
+    def generate(self, priority=INTERACTIVE, **kwargs):
+        """ollama generate (non-streaming) once admitted"""
+        with self._slot(priority):
+            start = time.perf_counter()
+            try:
+                response = self.client.generate(**self._defaults(kwargs))
+                self._record(response, priority)
+                return response
+            except httpx.TransportError as e:
+                raise LLMUnavailable(f"Could not reach the LLM: {e}") from e
+            finally:
+                metrics.observe(f'llm.generate.{PRIORITY_NAMES[priority]}', time.perf_counter() - start)
+
+    def chat(self, priority=INTERACTIVE, **kwargs):
+        """ollama chat (non-streaming) once admitted"""
+        with self._slot(priority):
+            start = time.perf_counter()
+            try:
+                response = self.client.chat(**self._defaults(kwargs))
+                self._record(response, priority)
+                return response
+            except httpx.TransportError as e:
+                raise LLMUnavailable(f"Could not reach the LLM: {e}") from e
+            finally:
+                metrics.observe(f'llm.generate.{PRIORITY_NAMES[priority]}', time.perf_counter() - start)
+
+    def stream(self, method='generate', priority=INTERACTIVE, **kwargs):
+        """Streaming generate or chat; the slot is held until the stream is exhausted or closed"""
+        with self._slot(priority):
+            try:
+                for part in getattr(self.client, method)(stream=True, **self._defaults(kwargs)):
+                    if part.get('done'):
+                        self._record(part, priority)
+                    yield part
+            except httpx.TransportError as e:
+                raise LLMUnavailable(f"Could not reach the LLM: {e}") from e
+
+    def stats(self):
+        with self._cond:
+            return {
+                'in_flight': self._in_flight,
+                'max_concurrent': self.max_concurrent,
+                'queue_depth': {name: self._queued(priority) for priority, name in PRIORITY_NAMES.items()},
+                'max_queue': self.max_queue,
+                'max_batch_queue': self.max_batch_queue
+            }
@@ -1,49 +1,46 @@
-import ollama
+from services.llm_gateway import LLMGateway, INTERACTIVE
+from services.prompts import ANSWER
 
 class LLMService:
-    def __init__(self, model_name="qwen:7b"):
+    def __init__(self, model_name="qwen:7b", gateway=None):
         self.model_name = model_name
-    
-    def generate_answer(self, question, context_chunks):
+        self.gateway = gateway or LLMGateway()
+        self.options = {
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "max_tokens": 500
+        }
+
+    def build_messages(self, question, context_chunks, history=None):
+        """history: earlier conversation as chat messages, placed right after the instructions"""
         context = "\n\n".join([f"[{i+1}] {chunk}" for i,chunk in enumerate(context_chunks)])
-        prompt = f"""You are a helpful study assistant. Answer the student's question based on the provided context from their study materials.
-
-Context from study materials:
-{context}
-
-Student's Question: {question}
-
-Instructions:
-- Answer based on the context provided
-- If the context doesn't contain the answer, say so clearly
-- Cite which context snippet you used (e.g., "According to [1]...")
-- Be clear, concise, and educational
-
-Answer:"""
-        
-        response = ollama.generate(
+        return ANSWER.messages(
+            f"Context from study materials:\n{context}",
+            f"Student's Question: {question}",
+            history=history
+        )
+    
+    def generate_answer(self, question, context_chunks, history=None):
+        response = self.gateway.chat(
+            priority=INTERACTIVE,
             model=self.model_name,
-            prompt=prompt,
-            options={
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "max_tokens": 500
-            }
+            messages=self.build_messages(question, context_chunks, history),
+            options=self.options
         )
 
-        return response['response']
+        return response['message']['content']
 
-        # response = ollama.chat(
-        #     model=self.model_name,
-        #     messages=[
-        #         { "role": "system", "content": "You are an accurate study assistant." },
-        #         { "role": "user", "content": prompt }
-        #     ],
-        #     options={
-        #         "temperature": 0.7,
-        #         "top_p": 0.9,
-        #         "max_tokens": 500
-        #     }
-        # )
+    def stream_answer(self, question, context_chunks, history=None):
+        """Yield answer tokens as Ollama produces them"""
+        stream = self.gateway.stream(
+            'chat',
+            priority=INTERACTIVE,
+            model=self.model_name,
+            messages=self.build_messages(question, context_chunks, history),
+            options=self.options
+        )
 
-        # return response["message"]["content"]
+        for part in stream:
+            content = part.get('message', {}).get('content')
+            if content:
+                yield content
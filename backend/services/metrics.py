@@ -0,0 +1,50 @@
+import threading
+from collections import defaultdict, deque
+
+
+class Metrics:
+    """Thread-safe, per-process counters and latency samples reported by /metrics"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._timings = defaultdict(lambda: deque(maxlen=window))
+
+    def incr(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            self._timings[name].append(seconds)
+
+    def counter(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    @staticmethod
+    def _percentile(ordered, pct):
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            timings = {name: sorted(samples) for name, samples in self._timings.items() if samples}
+
+        return {
+            'counters': counters,
+            'latency_ms': {
+                name: {
+                    'count': len(samples),
+                    'mean': round(sum(samples) / len(samples) * 1000, 1),
+                    'p50': round(self._percentile(samples, 50) * 1000, 1),
+                    'p95': round(self._percentile(samples, 95) * 1000, 1),
+                    'p99': round(self._percentile(samples, 99) * 1000, 1)
+                }
+                for name, samples in timings.items()
+            }
+        }
+
+
+metrics = Metrics()
@@ -0,0 +1,25 @@
+"""
+Start method for the CPU pools (PDF page extraction, summarization pass 1).
+
+forkserver forks workers from a clean helper process rather than from a multi-threaded
+web worker holding the embedding model. The helper preloads only the modules whose
+functions the pools run, never the app's main module.
+
+Constraint: forkserver and spawn workers still re-import the main module as __mp_main__.
+Whatever starts the server must therefore do nothing at import time (see app.create_app),
+and the worker functions (document_processor._extract_page_range,
+semantic_extractor.extract_range) must not import the app, models or services.registry.
+"""
+import multiprocessing
+
+WORKER_MODULES = ['services.document_processor', 'services.semantic_extractor']
+
+
+def pool_context():
+    """multiprocessing context for ProcessPoolExecutor(mp_context=...)"""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        # Takes effect when the forkserver starts, i.e. for the first pool of the process
+        context.set_forkserver_preload(WORKER_MODULES)
+        return context
+    return multiprocessing.get_context('spawn')
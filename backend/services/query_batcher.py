@@ -0,0 +1,87 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+from services.metrics import metrics
+
+
+class QueryBatcher:
+    """
+    Combines query-encoding requests from concurrent threads into one encode call.
+
+    The first waiting query opens a batch; queries arriving within max_wait_ms join it,
+    up to max_batch. One background thread runs encode_fn(list_of_queries) and hands each
+    caller its own vector. A lone query waits at most max_wait_ms longer than before.
+
+    The thread is started by the first encode() in each process, so a batcher built before
+    a fork (gunicorn --preload) gets its own thread in every worker.
+    """
+
+    def __init__(self, encode_fn, max_batch=32, max_wait_ms=5, timeout=30):
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.timeout = timeout
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid != os.getpid():
+                # Inherited from the parent: its queue may hold requests no thread here will serve
+                self._queue = queue.Queue()
+            self._thread = threading.Thread(target=self._loop, args=(self._queue,), name='query-batcher', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def encode(self, query):
+        self._ensure_started()
+        future = Future()
+        self._queue.put((query, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            metrics.incr('embedding.query_batch_timeouts')
+            raise TimeoutError(f"Query encoding did not finish within {self.timeout}s")
+
+    def _collect(self, requests):
+        batch = [requests.get()]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        # Callers that gave up waiting have cancelled their futures
+        return [(query, future) for query, future in batch if future.set_running_or_notify_cancel()]
+
+    def _loop(self, requests):
+        while True:
+            batch = self._collect(requests)
+            if not batch:
+                continue
+            try:
+                embeddings = self.encode_fn([query for query, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            metrics.incr('embedding.query_batches')
+            metrics.incr('embedding.queries_batched', len(batch))
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
@@ -0,0 +1,73 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(query):
+    """Cache key for a query: surrounding and repeated whitespace removed, case folded"""
+    return " ".join(query.split()).casefold()
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU of normalized query text -> query embedding. Vectors are kept as
+    read-only float32 arrays, and the cache evicts least recently used entries once
+    the vectors plus their keys exceed max_bytes.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _size(key, vector):
+        return vector.nbytes + len(key.encode('utf-8'))
+
+    def get(self, key):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key, embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector.setflags(write=False)
+        size = self._size(key, vector)
+        if size > self.max_bytes:
+            return vector
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= self._size(key, previous)
+
+            self._entries[key] = vector
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                old_key, old_vector = self._entries.popitem(last=False)
+                self._bytes -= self._size(old_key, old_vector)
+
+        return vector
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
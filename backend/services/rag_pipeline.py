@@ -1,18 +1,150 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.metrics import metrics
+
+NO_CONTEXT_ANSWER = "I couldn't find any relevant information in your uploaded documents. Please upload study materials first!"
+
 class RagPipeline:
-    def __init__(self, embedding_service, llm_service):
+    def __init__(self, embedding_service, llm_service, answer_cache=None, reranker=None,
+                 top_k=5, rerank_candidates=30, rerank_budget_ms=None,
+                 context_builder=None, context_candidates=12):
         self.embedding_service = embedding_service
         self.llm_service = llm_service
+        self.answer_cache = answer_cache
+        self.reranker = reranker
+        self.top_k = top_k
+        self.rerank_candidates = rerank_candidates
+        self.rerank_budget_ms = rerank_budget_ms
+        self.context_builder = context_builder
+        self.context_candidates = context_candidates
 
-    def answer_question(self, workspace_id, question):
-        context_chunks = self.embedding_service.search(
+    def _retrieve(self, workspace_id, question, where=None):
+        """
+        Context chunks for the question: retrieval, then (optionally) reranking of a wider
+        candidate set, then (optionally) packing the best candidates into the token budget.
+        """
+        return self._retrieve_many(workspace_id, [question], where)[0]
+
+    def _retrieve_many(self, workspace_id, questions, where=None):
+        pool = self.context_candidates if self.context_builder else self.top_k
+
+        start = time.perf_counter()
+        retrievals = self.embedding_service.retrieve_many(
             workspace_id=workspace_id,
-            query = question,
-            top_k=5
+            queries=questions,
+            top_k=self.rerank_candidates if self.reranker else pool,
+            where=where
         )
+        metrics.observe('rag.retrieve', time.perf_counter() - start)
+
+        return [self._refine(question, retrieval, pool) for question, retrieval in zip(questions, retrievals)]
+
+    def _refine(self, question, retrieval, pool):
+        """Rerank and pack one retrieval"""
+        if self.reranker is not None and len(retrieval['documents']) > 1:
+            order, report = self.reranker.rerank(
+                question, retrieval['documents'], pool, budget_ms=self.rerank_budget_ms
+            )
+            retrieval = {
+                **retrieval,
+                'ids': [retrieval['ids'][i] for i in order],
+                'documents': [retrieval['documents'][i] for i in order],
+                'metadatas': [retrieval['metadatas'][i] for i in order],
+                'rerank': report
+            }
+
+        if self.context_builder is not None and retrieval['documents']:
+            start = time.perf_counter()
+            blocks, report = self.context_builder.build(
+                retrieval['ids'], retrieval['documents'], retrieval['metadatas']
+            )
+            metrics.observe('rag.pack_context', time.perf_counter() - start)
+            metrics.incr('rag.context_tokens', report['tokens'])
+            metrics.incr('rag.context_packed')
+            retrieval = {
+                **retrieval,
+                'ids': [chunk_id for block in blocks for chunk_id in block.chunk_ids],
+                'documents': [block.text for block in blocks],
+                'context': report
+            }
+
+        return retrieval
+
+    def _cached_answer(self, workspace_id, retrieval, conversation=None):
+        # A follow-up that could not be made standalone means something only in its conversation;
+        # lexical-only retrieval has no query embedding to compare
+        if self.answer_cache is None or (conversation is not None and not conversation.standalone) \
+                or retrieval.get('query_embedding') is None:
+            return None
+        return self.answer_cache.lookup(workspace_id, retrieval['ids'], retrieval['query_embedding'])
+
+    def _cache_answer(self, workspace_id, retrieval, answer, llm_seconds, conversation=None):
+        if self.answer_cache is not None and (conversation is None or conversation.standalone) \
+                and retrieval.get('query_embedding') is not None:
+            self.answer_cache.store(workspace_id, retrieval['ids'], retrieval['query_embedding'], answer, llm_seconds)
+
+    def answer_question(self, workspace_id, question, where=None, conversation=None):
+        """
+        With a Conversation (see services.conversation_memory), retrieval searches for its
+        standalone query and the LLM also sees the earlier turns
+        """
+        query = conversation.query if conversation else question
+        return self._answer(workspace_id, question, self._retrieve(workspace_id, query, where), conversation)
+
+    def answer_many(self, workspace_id, questions, where=None, max_parallel=1):
+        """
+        Answers for several questions, in order. Retrieval runs once for all of them;
+        at most max_parallel LLM generations run at a time. Each item is (answer, error).
+        """
+        retrievals = self._retrieve_many(workspace_id, questions, where)
+
+        def answer(item):
+            question, retrieval = item
+            try:
+                return self._answer(workspace_id, question, retrieval), None
+            except Exception as e:
+                print(f"Error answering batch question: {e}")
+                return None, str(e)
+
+        with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as executor:
+            return list(executor.map(answer, zip(questions, retrievals)))
+
+    def _answer(self, workspace_id, question, retrieval, conversation=None):
+        context_chunks = retrieval['documents']
 
         if not context_chunks:
-            return "I couldn't find any relevant information in your uploaded documents. Please upload study materials first!"
+            return NO_CONTEXT_ANSWER
+
+        cached = self._cached_answer(workspace_id, retrieval, conversation)
+        if cached is not None:
+            return cached
         
-        answer = self.llm_service.generate_answer(question, context_chunks)
+        start = time.perf_counter()
+        history = conversation.history() if conversation else None
+        answer = self.llm_service.generate_answer(question, context_chunks, history)
+        self._cache_answer(workspace_id, retrieval, answer, time.perf_counter() - start, conversation)
+
+        return answer
+
+    def stream_answer(self, workspace_id, question, where=None, conversation=None):
+        """Same as answer_question, but yields the answer token by token"""
+        retrieval = self._retrieve(workspace_id, conversation.query if conversation else question, where)
+        context_chunks = retrieval['documents']
+
+        if not context_chunks:
+            yield NO_CONTEXT_ANSWER
+            return
+
+        cached = self._cached_answer(workspace_id, retrieval, conversation)
+        if cached is not None:
+            yield cached
+            return
 
-        return answer
\ No newline at end of file
+        start = time.perf_counter()
+        parts = []
+        history = conversation.history() if conversation else None
+        for token in self.llm_service.stream_answer(question, context_chunks, history):
+            parts.append(token)
+            yield token
+        self._cache_answer(workspace_id, retrieval, "".join(parts), time.perf_counter() - start, conversation)
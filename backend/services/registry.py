@@ -0,0 +1,249 @@
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+from config import Config
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def current_rss_mb():
+    """Resident memory of this process in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return round(resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError):
+        pass
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in KB elsewhere
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 1)
+
+
+class ServiceRegistry:
+    """
+    Process-wide home for the heavy services (embedding model, Chroma client, LLM wrappers).
+    Each service is built lazily on first use and then shared by every blueprint,
+    so a worker process holds exactly one copy of the model.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._instances = {}
+        self._stats = {}
+        self._lock = threading.RLock()
+
+    def register(self, name, factory):
+        self._factories[name] = factory
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if name not in self._instances:
+                if name not in self._factories:
+                    raise KeyError(f"No service registered under '{name}'")
+
+                rss_before = current_rss_mb()
+                start = time.perf_counter()
+                self._instances[name] = self._factories[name](self)
+                load_seconds = time.perf_counter() - start
+                rss_after = current_rss_mb()
+
+                self._stats[name] = {
+                    'load_seconds': round(load_seconds, 3),
+                    'rss_delta_mb': round(rss_after - rss_before, 1) if rss_before is not None else None,
+                    'loaded_at': datetime.now().isoformat(),
+                    'builds': self._stats.get(name, {}).get('builds', 0) + 1
+                }
+                print(f"[registry] Loaded '{name}' in {load_seconds:.2f}s (pid {os.getpid()})")
+
+            return self._instances[name]
+
+    def preload(self, names):
+        for name in names:
+            self.get(name)
+
+    def stats(self):
+        return {
+            'pid': os.getpid(),
+            'rss_mb': current_rss_mb(),
+            'loaded': sorted(self._instances.keys()),
+            'services': dict(self._stats)
+        }
+
+    @property
+    def embedding(self):
+        return self.get('embedding')
+
+    @property
+    def llm_gateway(self):
+        return self.get('llm_gateway')
+
+    @property
+    def llm(self):
+        return self.get('llm')
+
+    @property
+    def rag(self):
+        return self.get('rag')
+
+    @property
+    def answer_cache(self):
+        return self.get('answer_cache')
+
+    @property
+    def reranker(self):
+        return self.get('reranker')
+
+    @property
+    def doc_processor(self):
+        return self.get('doc_processor')
+
+    @property
+    def summarization(self):
+        return self.get('summarization')
+
+    @property
+    def study_plan(self):
+        return self.get('study_plan')
+
+    @property
+    def flashcards(self):
+        return self.get('flashcards')
+
+
+# Factories import their modules lazily so that importing a blueprint
+# does not pull in sentence-transformers / chromadb until first use.
+
+def _build_embedding(registry):
+    from services.embeddings import EmbeddingService
+    return EmbeddingService(
+        model_name=Config.EMBEDDING_MODEL,
+        chroma_path=Config.CHROMA_PATH,
+        backend=Config.EMBEDDING_BACKEND,
+        onnx_cache_dir=Config.ONNX_CACHE_DIR,
+        batch_size=Config.EMBEDDING_BATCH_SIZE,
+        query_batch_size=Config.QUERY_BATCH_MAX_SIZE,
+        query_batch_wait_ms=Config.QUERY_BATCH_MAX_WAIT_MS,
+        query_batch_timeout=Config.QUERY_BATCH_TIMEOUT,
+        query_cache_mb=Config.QUERY_CACHE_MB,
+        retrieval_mode=Config.RETRIEVAL_MODE,
+        lexical_index_workspaces=Config.LEXICAL_INDEX_WORKSPACES
+    )
+
+
+def _build_llm_gateway(registry):
+    from services.llm_gateway import LLMGateway
+    return LLMGateway(
+        host=Config.OLLAMA_HOST,
+        max_concurrent=Config.OLLAMA_NUM_PARALLEL,
+        max_queue=Config.LLM_MAX_QUEUE,
+        max_batch_queue=Config.LLM_MAX_BATCH_QUEUE,
+        queue_timeout=Config.LLM_QUEUE_TIMEOUT,
+        connect_timeout=Config.LLM_CONNECT_TIMEOUT,
+        request_timeout=Config.LLM_REQUEST_TIMEOUT,
+        keep_alive=Config.LLM_KEEP_ALIVE,
+        num_ctx=Config.LLM_NUM_CTX
+    )
+
+
+def _build_llm(registry):
+    from services.llm_service import LLMService
+    return LLMService(model_name=Config.LLM_MODEL, gateway=registry.llm_gateway)
+
+
+def _build_answer_cache(registry):
+    from services.answer_cache import AnswerCache
+    return AnswerCache(
+        max_entries=Config.ANSWER_CACHE_SIZE,
+        ttl_seconds=Config.ANSWER_CACHE_TTL,
+        similarity_threshold=Config.ANSWER_CACHE_THRESHOLD
+    )
+
+
+def _build_rag(registry):
+    from services.rag_pipeline import RagPipeline
+    from services.context_builder import ContextBuilder
+
+    context_builder = None
+    if Config.CONTEXT_TOKEN_BUDGET:
+        context_builder = ContextBuilder(
+            count_tokens=registry.doc_processor.count_tokens,
+            budget_tokens=Config.CONTEXT_TOKEN_BUDGET
+        )
+
+    return RagPipeline(
+        embedding_service=registry.embedding,
+        llm_service=registry.llm,
+        answer_cache=registry.answer_cache,
+        reranker=registry.reranker if Config.RERANK_MODEL else None,
+        rerank_candidates=Config.RERANK_CANDIDATES,
+        rerank_budget_ms=Config.RERANK_BUDGET_MS,
+        context_builder=context_builder,
+        context_candidates=Config.CONTEXT_CANDIDATES
+    )
+
+
+def _build_reranker(registry):
+    from services.reranker import Reranker
+    return Reranker(model_name=Config.RERANK_MODEL)
+
+
+def _build_doc_processor(registry):
+    from services.document_processor import DocumentProcessor
+    return DocumentProcessor(
+        pdf_workers=Config.PDF_EXTRACT_WORKERS,
+        tokenizer_name=Config.EMBEDDING_MODEL,
+        chunk_max_tokens=Config.CHUNK_MAX_TOKENS,
+        chunk_overlap_tokens=Config.CHUNK_OVERLAP_TOKENS
+    )
+
+
+def _build_summarization(registry):
+    from services.summarization import SummarizationService
+    return SummarizationService(
+        model_name=Config.LLM_MODEL,
+        gateway=registry.llm_gateway,
+        mode=Config.SUMMARY_MODE,
+        map_parallel=Config.OLLAMA_NUM_PARALLEL,
+        group_input_tokens=Config.SUMMARY_GROUP_INPUT_TOKENS,
+        group_notes_tokens=Config.SUMMARY_GROUP_NOTES_TOKENS,
+        reduce_input_tokens=Config.SUMMARY_REDUCE_INPUT_TOKENS,
+        group_cache_size=Config.SUMMARY_GROUP_CACHE_SIZE,
+        extract_workers=Config.SUMMARY_EXTRACT_WORKERS
+    )
+
+
+def _build_study_plan(registry):
+    from services.study_plan_generator import StudyPlanGenerator
+    return StudyPlanGenerator(model_name=Config.LLM_MODEL, gateway=registry.llm_gateway)
+
+
+def _build_flashcards(registry):
+    from services.flash_card_generator import FlashCardGenerator
+    return FlashCardGenerator(model_name=Config.FLASHCARD_MODEL, gateway=registry.llm_gateway)
+
+
+services = ServiceRegistry()
+services.register('embedding', _build_embedding)
+services.register('llm_gateway', _build_llm_gateway)
+services.register('llm', _build_llm)
+services.register('answer_cache', _build_answer_cache)
+services.register('reranker', _build_reranker)
+services.register('rag', _build_rag)
+services.register('doc_processor', _build_doc_processor)
+services.register('summarization', _build_summarization)
+services.register('study_plan', _build_study_plan)
+services.register('flashcards', _build_flashcards)
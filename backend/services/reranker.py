@@ -0,0 +1,54 @@
+import time
+
+from services.metrics import metrics
+
+
+class Reranker:
+    """
+    Cross-encoder reranking of retrieved chunks under a per-request latency budget.
+
+    Candidates are scored in batches. If the next batch would not finish within the
+    budget (judged by the batches so far), scoring stops and the original retrieval
+    order is kept, so a slow request degrades to plain retrieval instead of timing out.
+    """
+
+    def __init__(self, model_name='BAAI/bge-reranker-base', batch_size=8, max_length=512):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, max_length=max_length)
+        self.batch_size = batch_size
+
+    def rerank(self, query, documents, top_k, budget_ms=None):
+        """
+        Indices into documents, best first, cut to top_k, plus a report dict. Without a
+        budget every candidate is scored.
+        """
+        start = time.perf_counter()
+        deadline = start + budget_ms / 1000 if budget_ms else None
+        scores = []
+
+        for batch_start in range(0, len(documents), self.batch_size):
+            if deadline is not None and scores:
+                elapsed = time.perf_counter() - start
+                per_batch = elapsed / (batch_start // self.batch_size)
+                if time.perf_counter() + per_batch > deadline:
+                    break
+
+            batch = documents[batch_start:batch_start + self.batch_size]
+            scores.extend(float(score) for score in self.model.predict([(query, doc) for doc in batch]))
+
+        seconds = time.perf_counter() - start
+        metrics.observe('rerank.score', seconds)
+        report = {'candidates': len(documents), 'scored': len(scores), 'ms': round(seconds * 1000, 1)}
+
+        if len(scores) < len(documents):
+            metrics.incr('rerank.fallback')
+            report['reranked'] = False
+            return list(range(min(top_k, len(documents)))), report
+
+        order = sorted(range(len(documents)), key=lambda i: -scores[i])[:top_k]
+        metrics.incr('rerank.applied')
+        # How often reranking changes what the LLM sees
+        if set(order) != set(range(min(top_k, len(documents)))):
+            metrics.incr('rerank.changed_top_k')
+        report['reranked'] = True
+        return order, report
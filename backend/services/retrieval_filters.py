@@ -0,0 +1,17 @@
+def build_where(document_ids=None, page_from=None, page_to=None):
+    """
+    Chroma `where` clause restricting retrieval to some documents and/or a page range.
+    A chunk matches a page range when the pages it spans overlap it; chunks stored
+    without page numbers (DOCX, or ingested before pages were recorded) never do.
+    """
+    clauses = []
+    if document_ids:
+        clauses.append({"document_id": {"$in": list(document_ids)}})
+    if page_from is not None:
+        clauses.append({"page_end": {"$gte": page_from}})
+    if page_to is not None:
+        clauses.append({"page_start": {"$lte": page_to}})
+
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
@@ -0,0 +1,189 @@
+"""
+Pass 1 of summarization: pull definitions, lists, formulas, procedures, examples,
+conclusions and key terms out of each chunk, without an LLM.
+
+The patterns are the ones the summarizer has always used, so the output is the same.
+What changed is where they run. The four case-insensitive patterns (definition,
+algorithm, example, conclusion) cost most: re tries their alternation of leading phrases
+at every position of the chunk. Instead, the chunk is lowercased once and the phrases
+are located by plain substring search; each pattern is then only tried, anchored, at
+those positions, skipping over its own matches exactly as findall would. Cheap
+character checks skip the bullet, formula and key-term patterns on chunks that cannot
+match them. Large inputs are split across a process pool (see extract_skeleton).
+"""
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+PATTERNS = {
+    'heading': re.compile(r'^#{1,6}\s+(.+)$|^([A-Z][^.!?]*):?\s*$', re.MULTILINE),
+    'definition': re.compile(r'(?:is defined as|is a|refers to|means that|is the)\s+(.+?)(?:\.|$)', re.IGNORECASE),
+    'bullet': re.compile(r'^[\s]*[-*•▪]\s+(.+)$', re.MULTILINE),
+    'enumeration': re.compile(r'^\s*\d+[\.)]\s+(.+)$', re.MULTILINE),
+    'formula': re.compile(r'[A-Z]\[?\w*\]?\s*[=<>≤≥]\s*.+|∑|∫|∏|\$[^$]+\$'),
+    'algorithm': re.compile(r'(?:step|algorithm|procedure|process|method)[\s:]+(.+?)(?=\n\n|\Z)', re.IGNORECASE | re.DOTALL),
+    'example': re.compile(r'(?:example|instance|for example|e\.g\.|such as)[:\s]+(.+?)(?=\n\n|\Z)', re.IGNORECASE | re.DOTALL),
+    'conclusion': re.compile(r'(?:in conclusion|therefore|thus|hence|in summary|to summarize)[:\s]+(.+?)(?=\n\n|\Z)', re.IGNORECASE | re.DOTALL),
+    'key_term': re.compile(r'\*\*(.+?)\*\*|__(.+?)__|"([^"]+)"(?=\s+is|\s+refers|\s+means)')
+}
+
+# Leading phrases of the case-insensitive patterns; a match can only start where one does
+TRIGGER_PHRASES = {
+    'definition': ('is defined as', 'is a', 'refers to', 'means that', 'is the'),
+    'algorithm': ('step', 'algorithm', 'procedure', 'process', 'method'),
+    'example': ('example', 'instance', 'for example', 'e.g.', 'such as'),
+    'conclusion': ('in conclusion', 'therefore', 'thus', 'hence', 'in summary', 'to summarize')
+}
+
+# Non-ASCII letters that IGNORECASE matches against ASCII ones (and that lower() may not
+# map one-to-one); chunks holding any of them are matched the plain way
+CASE_FOLDING_SPECIAL = ('\u0130', '\u0131', '\u017f', '\u212a')
+
+BULLET_MARKS = ('-', '*', '•', '▪')
+FORMULA_MARKS = ('=', '<', '>', '≤', '≥', '∑', '∫', '∏', '$')
+
+# Below this many chunks the process pool costs more than it saves
+MIN_CHUNKS_FOR_POOL = 256
+
+
+@dataclass
+class SemanticSection:
+    """Represents extracted semantic information from a section"""
+    section_number: int
+    heading: Optional[str]
+    definitions: List[str]
+    bullet_points: List[str]
+    enumerations: List[str]
+    formulas: List[str]
+    algorithms: List[str]
+    examples: List[str]
+    conclusions: List[str]
+    key_terms: List[str]
+
+
+def clean_heading(heading: str) -> str:
+    """Remove metadata and noise from headings"""
+    # Remove common metadata patterns
+    heading = re.sub(r'AD\d+\s*[–-]\s*', '', heading)
+    heading = re.sub(r'UNIT\s+[IVX]+\s*[–-]\s*', '', heading, flags=re.IGNORECASE)
+    heading = re.sub(r'\d+\s*\|\s*P\s*a\s*g\s*e', '', heading)
+
+    # Remove excessive repetition
+    words = heading.split()
+    if len(words) > 20:  # If heading is suspiciously long
+        heading = ' '.join(words[:10])  # Take first 10 words
+
+    return heading.strip()
+
+
+def section_has_content(section: SemanticSection) -> bool:
+    """Check if section contains any extracted information"""
+    return any([
+        section.heading,
+        section.definitions,
+        section.bullet_points,
+        section.enumerations,
+        section.formulas,
+        section.algorithms,
+        section.examples,
+        section.conclusions,
+        section.key_terms
+    ])
+
+
+def _phrase_positions(lowered, phrases):
+    positions = set()
+    for phrase in phrases:
+        i = lowered.find(phrase)
+        while i != -1:
+            positions.add(i)
+            i = lowered.find(phrase, i + 1)
+    return sorted(positions)
+
+
+def _findall_at(pattern, chunk, positions):
+    """pattern.findall(chunk) for a single-group pattern that can only match at positions"""
+    found = []
+    end = 0
+    for position in positions:
+        if position < end:
+            continue
+        match = pattern.match(chunk, position)
+        if match:
+            found.append(match.group(1))
+            end = match.end()
+    return found
+
+
+def extract_section(section_number: int, chunk: str) -> SemanticSection:
+    if any(char in chunk for char in CASE_FOLDING_SPECIAL):
+        triggered = {kind: PATTERNS[kind].findall(chunk) for kind in TRIGGER_PHRASES}
+    else:
+        lowered = chunk.lower()
+        triggered = {
+            kind: _findall_at(PATTERNS[kind], chunk, _phrase_positions(lowered, phrases))
+            for kind, phrases in TRIGGER_PHRASES.items()
+        }
+
+    heading = None
+    heading_matches = PATTERNS['heading'].findall(chunk[:500])
+    if heading_matches:
+        heading = next((h for h in heading_matches[0] if h), None)
+        if heading:
+            heading = clean_heading(heading)
+
+    bullets = PATTERNS['bullet'].findall(chunk) if any(mark in chunk for mark in BULLET_MARKS) else []
+    formulas = PATTERNS['formula'].findall(chunk) if any(mark in chunk for mark in FORMULA_MARKS) else []
+    terms = PATTERNS['key_term'].findall(chunk) if '**' in chunk or '__' in chunk or '"' in chunk else []
+
+    return SemanticSection(
+        section_number=section_number,
+        heading=heading,
+        definitions=[d.strip() for d in triggered['definition'] if d.strip()][:3],
+        bullet_points=[b.strip() for b in bullets if b.strip()][:10],
+        enumerations=[e.strip() for e in PATTERNS['enumeration'].findall(chunk) if e.strip()][:10],
+        formulas=[f.strip() for f in formulas if f.strip()][:5],
+        algorithms=[a.strip()[:200] for a in triggered['algorithm'] if a.strip()][:2],
+        examples=[ex.strip()[:300] for ex in triggered['example'] if ex.strip()][:2],
+        conclusions=[c.strip()[:200] for c in triggered['conclusion'] if c.strip()][:2],
+        # First occurrences, so the same chunk gives the same terms in every process
+        key_terms=list(dict.fromkeys(
+            term for groups in terms for term in groups if term and len(term) > 2
+        ))[:8]
+    )
+
+
+def extract_range(start: int, chunks: List[str]) -> List[SemanticSection]:
+    """Sections with content for chunks numbered from start + 1; also the process-pool worker"""
+    sections = []
+    for offset, chunk in enumerate(chunks):
+        section = extract_section(start + offset + 1, chunk)
+        if section_has_content(section):
+            sections.append(section)
+    return sections
+
+
+def extract_skeleton(chunks: List[str], executor: Optional[ProcessPoolExecutor] = None,
+                     workers: int = 1) -> List[SemanticSection]:
+    """
+    Sections with content, in chunk order. With an executor and at least
+    MIN_CHUNKS_FOR_POOL chunks, contiguous ranges are extracted in the pool.
+    """
+    if executor is None or workers <= 1 or len(chunks) < MIN_CHUNKS_FOR_POOL:
+        return extract_range(0, chunks)
+
+    # A few ranges per worker so uneven chunks even out
+    size = max(1, -(-len(chunks) // (workers * 4)))
+    ranges = [(start, min(start + size, len(chunks))) for start in range(0, len(chunks), size)]
+    futures = [executor.submit(extract_range, start, chunks[start:end]) for start, end in ranges]
+
+    sections = []
+    for (start, end), future in zip(ranges, futures):
+        try:
+            sections.extend(future.result())
+        except Exception as e:
+            # Only the failed range is redone in-process, not the whole document
+            print(f"Error extracting chunks {start + 1}-{end} in worker, retrying in-process: {e}")
+            sections.extend(extract_range(start, chunks[start:end]))
+    return sections
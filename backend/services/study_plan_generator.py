@@ -1,9 +1,11 @@
 from datetime import datetime, timedelta
-import ollama
+from services.llm_gateway import LLMGateway, LLMGatewayError, BATCH
+from services.prompts import STUDY_PLAN
 
 class StudyPlanGenerator:
-    def __init__(self,model_name="qwen:7b"):
+    def __init__(self,model_name="qwen:7b", gateway=None):
         self.model_name=model_name
+        self.gateway = gateway or LLMGateway()
 
     def generate_plan(self, workspace_name, deadline, documents):
         today = datetime.now()
@@ -19,48 +21,19 @@ class StudyPlanGenerator:
         if not doc_list:
             doc_list = "No documents uploaded yet"
 
-        prompt = f"""You are an expert study planner. Create a detailed, day-by-day study plan for a student.
-
-**Workspace**: {workspace_name}
-**Days Available**: {days_until_deadline} days
-**Deadline**: {deadline.strftime('%B %d, %Y')}
-
-**Materials to Study**:
-{doc_list}
-
-**Instructions**:
-1. Create a realistic day-by-day breakdown
-2. Allocate time for initial learning, practice, and review
-3. Include buffer days for unexpected delays
-4. Schedule review sessions using spaced repetition principles
-5. Reserve the last 2-3 days for final review and practice
-6. Be specific about what topics to cover each day
-7. Include estimated time per activity
-
-**Format the plan like this**:
-
-📅 **Day 1** ({(today + timedelta(days=1)).strftime('%A, %B %d')})
-- Morning (2 hours): [Specific topic/chapter]
-- Afternoon (2 hours): [Specific topic/chapter]
-- Evening (1 hour): Review and practice problems
-
-📅 **Day 2** ({(today + timedelta(days=2)).strftime('%A, %B %d')})
-...
-
-🎯 **Final Review Days**
-...
-
-✅ **Success Tips**
-- Take regular breaks (Pomodoro technique)
-- Stay consistent with daily goals
-- Don't cram everything at the end
-
-Create the complete plan now:"""
+        messages = STUDY_PLAN.messages(
+            f"**Workspace**: {workspace_name}\n\n**Materials to Study**:\n{doc_list}",
+            f"**Days Available**: {days_until_deadline} days\n"
+            f"**Deadline**: {deadline.strftime('%B %d, %Y')}\n"
+            f"**Day 1**: {(today + timedelta(days=1)).strftime('%A, %B %d')}\n\n"
+            "Create the complete plan now:"
+        )
         
         try:
-            response = ollama.generate(
+            response = self.gateway.chat(
+                priority=BATCH,
                 model= self.model_name,
-                prompt=prompt,
+                messages=messages,
                 options={
                     "temperature":0.7,
                     "top_p":0.9,
@@ -68,8 +41,10 @@ Create the complete plan now:"""
                 }
             )
 
-            return response['response']
+            return response['message']['content']
         
+        except LLMGatewayError:
+            raise
         except Exception as e:
             print(f"Error generating study plan {e}")
             return self.generate_fallback_plan(workspace_name, days_until_deadline, documents)
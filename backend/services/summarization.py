@@ -1,38 +1,64 @@
-import ollama
+import os
 import re
-from typing import List, Dict, Tuple, Optional, Set
-from dataclasses import dataclass
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from datetime import datetime
+from typing import List, Dict, Tuple
 from collections import defaultdict
 
-@dataclass
-class SemanticSection:
-    """Represents extracted semantic information from a section"""
-    section_number: int
-    heading: Optional[str]
-    definitions: List[str]
-    bullet_points: List[str]
-    enumerations: List[str]
-    formulas: List[str]
-    algorithms: List[str]
-    examples: List[str]
-    conclusions: List[str]
-    key_terms: List[str]
+from flask import current_app, has_app_context
+
+from models import db, TopicGroupNotes
+
+from services.llm_gateway import LLMGateway, LLMGatewayError, BATCH, INTERACTIVE
+from services.prompts import STUDY_GUIDE, QUICK_SUMMARY, TOPIC_NOTES
+from services.semantic_extractor import (
+    MIN_CHUNKS_FOR_POOL, PATTERNS, SemanticSection, clean_heading, extract_range, extract_skeleton,
+    section_has_content
+)
+from services.process_pool import pool_context
+
+# The single-call synthesis sees at most this much of the topic outline
+OUTLINE_CHAR_CAP = 7000
+
+
+def estimate_tokens(text):
+    return max(1, round(len(text) / 4))
+
+
 class SummarizationService:
-    def __init__(self, model_name="qwen:7b"):
+    # Bump whenever the synthesis prompt or post-processing changes so stored summaries are regenerated
+    PROMPT_VERSION = "v3"
+
+    def __init__(self, model_name="qwen:7b", gateway=None, mode="auto", map_parallel=1,
+                 group_input_tokens=1500, group_notes_tokens=200, reduce_input_tokens=4000,
+                 group_cache_size=1024, extract_workers=None):
+        """
+        mode: 'single' (one synthesis call over the outline, cut at OUTLINE_CHAR_CAP),
+        'map_reduce' (notes per topic group, then one call over the notes) or 'auto'
+        (map-reduce only when the outline would be cut)
+        """
         self.model_name = model_name
+        self.gateway = gateway or LLMGateway()
+        self.mode = mode
+        self.map_parallel = max(1, map_parallel)
+        self.group_input_tokens = group_input_tokens
+        self.group_notes_tokens = group_notes_tokens
+        self.reduce_input_tokens = reduce_input_tokens
+
+        # Topic notes are stored by the hash of their group outline (TopicGroupNotes), so a
+        # partly changed document only regenerates the notes of the groups that changed
+        self.group_cache_size = group_cache_size
+
+        # Pass 1 of large documents runs in a process pool, started on first use and shared
+        self.extract_workers = extract_workers or os.cpu_count() or 1
+        self._extract_pool = None
+        self._extract_pool_lock = threading.Lock()
         
-        # Regex patterns for semantic extraction
-        self.patterns = {
-            'heading': re.compile(r'^#{1,6}\s+(.+)$|^([A-Z][^.!?]*):?\s*$', re.MULTILINE),
-            'definition': re.compile(r'(?:is defined as|is a|refers to|means that|is the)\s+(.+?)(?:\.|$)', re.IGNORECASE),
-            'bullet': re.compile(r'^[\s]*[-*•▪]\s+(.+)$', re.MULTILINE),
-            'enumeration': re.compile(r'^\s*\d+[\.)]\s+(.+)$', re.MULTILINE),
-            'formula': re.compile(r'[A-Z]\[?\w*\]?\s*[=<>≤≥]\s*.+|∑|∫|∏|\$[^$]+\$'),
-            'algorithm': re.compile(r'(?:step|algorithm|procedure|process|method)[\s:]+(.+?)(?=\n\n|\Z)', re.IGNORECASE | re.DOTALL),
-            'example': re.compile(r'(?:example|instance|for example|e\.g\.|such as)[:\s]+(.+?)(?=\n\n|\Z)', re.IGNORECASE | re.DOTALL),
-            'conclusion': re.compile(r'(?:in conclusion|therefore|thus|hence|in summary|to summarize)[:\s]+(.+?)(?=\n\n|\Z)', re.IGNORECASE | re.DOTALL),
-            'key_term': re.compile(r'\*\*(.+?)\*\*|__(.+?)__|"([^"]+)"(?=\s+is|\s+refers|\s+means)')
-        }
+        # Regex patterns for semantic extraction (applied by services.semantic_extractor)
+        self.patterns = PATTERNS
         
         # Topic canonicalization rules
         self.topic_keywords = {
@@ -59,10 +85,18 @@ class SummarizationService:
         """
         Main entry point: Enhanced two-pass with topic grouping
         """
+        topic_groups, coverage_report = self.prepare(chunks)
+        return self.synthesize(document, topic_groups, coverage_report)
+    
+    def prepare(self, chunks, pooled=False):
+        """
+        Passes 1-2 (no LLM): semantic skeleton, topic groups and coverage report.
+        pooled sends pass 1 to the process pool whatever the document size.
+        """
         print(f"[PASS 1] Extracting semantic structure from {len(chunks)} chunks...")
         
         # PASS 1: Information-preserving compression (NO LLM)
-        semantic_skeleton = self._extract_semantic_skeleton(chunks)
+        semantic_skeleton = self._extract_semantic_skeleton(chunks, pooled)
         
         print(f"[PASS 2] Grouping by topics and validating coverage...")
         
@@ -72,9 +106,14 @@ class SummarizationService:
         # PASS 2: Coverage validation
         coverage_report = self._validate_coverage(semantic_skeleton, len(chunks), topic_groups)
         
-        print(f"[PASS 3] Synthesizing with LLM (single call)...")
+        return topic_groups, coverage_report
+    
+    def synthesize(self, document, topic_groups, coverage_report):
+        """Passes 3-4: LLM synthesis and cleanup"""
+        print(f"[PASS 3] Synthesizing with LLM ({self.mode} mode)...")
         
-        # PASS 3: ONE global LLM call with structured topic outline
+        # PASS 3: one global LLM call with the structured topic outline, or with the
+        # per-topic notes of the map step when the outline is too long
         final_summary = self._synthesize_summary(
             document, 
             topic_groups,
@@ -88,89 +127,80 @@ class SummarizationService:
         
         return final_summary
     
-    def _extract_semantic_skeleton(self, chunks: List[str]) -> List[SemanticSection]:
+    def summarize_many(self, items, max_parallel=1):
+        """
+        Summarize several documents at once. items is a list of (document, chunks).
+        Pass 1 of every document runs in the extraction process pool, so documents are
+        extracted in parallel; LLM synthesis calls are capped at max_parallel (match
+        Ollama's OLLAMA_NUM_PARALLEL). Yields (document, summary, error) as each document finishes.
+        """
+        if not items:
+            return
+
+        llm_slots = threading.BoundedSemaphore(max_parallel)
+        app = current_app._get_current_object() if has_app_context() else None
+
+        def run(document, chunks):
+            topic_groups, coverage_report = self.prepare(chunks, pooled=len(items) > 1)
+            # Stored topic notes are read and written through the app's database session
+            with llm_slots, (app.app_context() if app is not None else nullcontext()):
+                return self.synthesize(document, topic_groups, coverage_report)
+
+        max_workers = min(len(items), max_parallel + (os.cpu_count() or 1))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='summarize') as executor:
+            futures = {executor.submit(run, document, chunks): document for document, chunks in items}
+            for future in as_completed(futures):
+                document = futures[future]
+                try:
+                    yield document, future.result(), None
+                except Exception as e:
+                    yield document, None, e
+    
+    def content_hash(self, chunks: List[str]) -> str:
+        """Key of a stored summary: changes with the document content, the model or the prompt"""
+        digest = hashlib.sha256()
+        digest.update(f"{self.model_name}\0{self.PROMPT_VERSION}\0".encode('utf-8'))
+        for chunk in chunks:
+            digest.update(chunk.encode('utf-8'))
+            digest.update(b"\0")
+        return digest.hexdigest()
+    
+    def _extraction_pool(self):
+        if self.extract_workers <= 1:
+            return None
+        with self._extract_pool_lock:
+            if self._extract_pool is None:
+                self._extract_pool = ProcessPoolExecutor(max_workers=self.extract_workers, mp_context=pool_context())
+            return self._extract_pool
+
+    def _extract_semantic_skeleton(self, chunks: List[str], pooled=False) -> List[SemanticSection]:
         """
         PASS 1: Extract all information-dense elements WITHOUT paraphrasing
-        Pure Python - no LLM calls - extremely fast
+        Pure Python - no LLM calls - one scan per chunk, large documents across processes.
+        With pooled, a small document is extracted in the pool as a single task, so that
+        several documents summarized together do not contend for one interpreter.
         """
-        semantic_sections = []
-        
-        for idx, chunk in enumerate(chunks):
-            section = SemanticSection(
-                section_number=idx + 1,
-                heading=None,
-                definitions=[],
-                bullet_points=[],
-                enumerations=[],
-                formulas=[],
-                algorithms=[],
-                examples=[],
-                conclusions=[],
-                key_terms=[]
-            )
-            
-            # Extract heading (first significant line or markdown heading)
-            heading_matches = self.patterns['heading'].findall(chunk[:500])
-            if heading_matches:
-                section.heading = next((h for h in heading_matches[0] if h), None)
-                # Clean up heading - remove metadata
-                if section.heading:
-                    section.heading = self._clean_heading(section.heading)
-            
-            # Extract definitions
-            def_matches = self.patterns['definition'].findall(chunk)
-            section.definitions = [d.strip() for d in def_matches if d.strip()][:3]
-            
-            # Extract bullet points
-            bullet_matches = self.patterns['bullet'].findall(chunk)
-            section.bullet_points = [b.strip() for b in bullet_matches if b.strip()][:10]
-            
-            # Extract enumerations
-            enum_matches = self.patterns['enumeration'].findall(chunk)
-            section.enumerations = [e.strip() for e in enum_matches if e.strip()][:10]
-            
-            # Extract formulas
-            formula_matches = self.patterns['formula'].findall(chunk)
-            section.formulas = [f.strip() for f in formula_matches if f.strip()][:5]
-            
-            # Extract algorithms/procedures
-            algo_matches = self.patterns['algorithm'].findall(chunk)
-            section.algorithms = [a.strip()[:200] for a in algo_matches if a.strip()][:2]
-            
-            # Extract examples
-            example_matches = self.patterns['example'].findall(chunk)
-            section.examples = [ex.strip()[:300] for ex in example_matches if ex.strip()][:2]
-            
-            # Extract conclusions
-            conclusion_matches = self.patterns['conclusion'].findall(chunk)
-            section.conclusions = [c.strip()[:200] for c in conclusion_matches if c.strip()][:2]
-            
-            # Extract key terms (bolded or quoted terms)
-            term_matches = self.patterns['key_term'].findall(chunk)
-            section.key_terms = list(set([
-                term for terms in term_matches 
-                for term in terms if term and len(term) > 2
-            ]))[:8]
-            
-            # If section has ANY content, include it
-            if self._section_has_content(section):
-                semantic_sections.append(section)
-        
-        return semantic_sections
+        pool = self._extraction_pool() if pooled or len(chunks) >= MIN_CHUNKS_FOR_POOL else None
+        if pool is not None and len(chunks) < MIN_CHUNKS_FOR_POOL:
+            try:
+                sections = pool.submit(extract_range, 0, chunks).result()
+            except Exception as e:
+                print(f"Error extracting document in worker, retrying in-process: {e}")
+                sections = extract_range(0, chunks)
+        else:
+            sections = extract_skeleton(chunks, pool, self.extract_workers)
+
+        # A worker that died breaks the whole pool; start a fresh one next time
+        if pool is not None and getattr(pool, '_broken', False):
+            with self._extract_pool_lock:
+                if self._extract_pool is pool:
+                    self._extract_pool = None
+            pool.shutdown(wait=False)
+        return sections
     
     def _clean_heading(self, heading: str) -> str:
         """Remove metadata and noise from headings"""
-        # Remove common metadata patterns
-        heading = re.sub(r'AD\d+\s*[–-]\s*', '', heading)
-        heading = re.sub(r'UNIT\s+[IVX]+\s*[–-]\s*', '', heading, flags=re.IGNORECASE)
-        heading = re.sub(r'\d+\s*\|\s*P\s*a\s*g\s*e', '', heading)
-        
-        # Remove excessive repetition
-        words = heading.split()
-        if len(words) > 20:  # If heading is suspiciously long
-            heading = ' '.join(words[:10])  # Take first 10 words
-        
-        return heading.strip()
+        return clean_heading(heading)
     
     def _group_by_topics(self, semantic_sections: List[SemanticSection]) -> Dict[str, List[SemanticSection]]:
         """
@@ -208,17 +238,7 @@ class SummarizationService:
     
     def _section_has_content(self, section: SemanticSection) -> bool:
         """Check if section contains any extracted information"""
-        return any([
-            section.heading,
-            section.definitions,
-            section.bullet_points,
-            section.enumerations,
-            section.formulas,
-            section.algorithms,
-            section.examples,
-            section.conclusions,
-            section.key_terms
-        ])
+        return section_has_content(section)
     
     def _validate_coverage(self, semantic_sections: List[SemanticSection], 
                           total_chunks: int, topic_groups: Dict) -> Dict:
@@ -303,102 +323,190 @@ class SummarizationService:
         
         return '\n\n'.join(outline_parts)
     
-    def _synthesize_summary(self, document, topic_groups: Dict[str, List[SemanticSection]],
-                           coverage_report: Dict) -> Dict:
+    def _format_group_outline(self, topic: str, sections: List[SemanticSection]) -> str:
         """
-        PASS 3: Single high-quality LLM call with teaching-style focus
+        Outline of one topic group for the map step. Unlike _format_topic_outline it has no
+        fixed per-kind caps: items are taken a round at a time from every kind (first
+        definition, first formula, ..., then the second of each) until the group's token
+        budget is used, and are then listed by kind.
         """
-        topic_outline = self._format_topic_outline(topic_groups)
-        
-        # Ensure token efficiency
-        if len(topic_outline) > 7000:
-            topic_outline = topic_outline[:7000] + "\n\n[Additional content truncated for token efficiency]"
-        
-        prompt = f"""You are an expert educator creating exam-ready study materials. You will receive a STRUCTURED TOPIC OUTLINE of a document.
-
-**CRITICAL CONTEXT**:
-- This is for students preparing for DATA SCIENCE exams (4, 8, and 16 mark questions)
-- Students need to understand WHAT concepts are, WHY they're used, and HOW to apply them
-- Focus on teaching, not just listing
-
-**Document**: {document.filename}
-**Topics Identified**: {coverage_report['topics_identified']} major topics
-**Coverage**: {coverage_report['coverage_percentage']}% of document analyzed
-**Items Extracted**: {coverage_report['total_items_extracted']} information items
-
-**STRUCTURED TOPIC OUTLINE**:
-{topic_outline}
-
-**YOUR TASK - Create an exam-ready study guide with:**
-
-## 📋 Executive Summary
-[3-4 sentences: What is this document about? What will students learn? Why does it matter for data science?]
-
-## 🎯 Main Topics Covered
-[List each major topic as a clear, scannable bullet. Format: "- Topic Name: One-line description of what it covers"]
-
-## 📚 Detailed Topic Explanations
-
-[For EACH topic in the outline above, create a subsection following this teaching structure:]
-
-### [Topic Name]
-
-**What it is**: [1-2 sentence definition in plain language]
-
-**Why it's used**: [1-2 sentences on the purpose and use cases]
-
-**Key concepts and functions**:
-- [Concept 1]: Brief explanation
-- [Concept 2]: Brief explanation
-- [Function/Tool]: What it does
-
-**Example**:
-[Provide a clear, concrete example if available in the outline]
-
-**Important for exams**: [What students must remember about this topic]
-
-[Repeat this structure for ALL topics in the outline]
-
-## 💡 Key Takeaways for Exams
-[5-7 critical points students MUST remember. Focus on concepts likely to appear in exams]
-
-## 🔑 Important Terms & Definitions
-[List and define all key terms. Format: "**Term**: Clear definition"]
-
-## 📐 Essential Formulas & Syntax
-[List all important formulas, functions, and syntax patterns with brief explanations]
-
-## ❓ Practice Questions
-[Create 5 exam-style questions testing understanding:
-- 2 definition/concept questions (4 marks each)
-- 2 application questions (8 marks each)  
-- 1 comprehensive question (16 marks)]
+        kinds = {
+            'Definitions': [d for s in sections for d in s.definitions],
+            'Formulas/Syntax': [f for s in sections for f in s.formulas],
+            'Key Concepts': [p for s in sections for p in s.bullet_points + s.enumerations],
+            'Procedures': [a for s in sections for a in s.algorithms],
+            'Examples': [ex for s in sections for ex in s.examples],
+            'Conclusions': [c for s in sections for c in s.conclusions],
+            'Headings': list(dict.fromkeys(s.heading for s in sections if s.heading))
+        }
+        terms = list(dict.fromkeys(t for s in sections for t in s.key_terms))
+
+        budget = self.group_input_tokens - estimate_tokens(topic) - estimate_tokens(', '.join(terms[:20]))
+        taken = {kind: [] for kind in kinds}
+        for i in range(max((len(items) for items in kinds.values()), default=0)):
+            for kind, items in kinds.items():
+                if i < len(items) and budget > 0:
+                    taken[kind].append(items[i])
+                    budget -= estimate_tokens(items[i]) + 2
+
+        text = f"[TOPIC: {topic}]"
+        for kind, items in taken.items():
+            if items:
+                text += f"\n\n{kind}:" + "".join(f"\n  - {item}" for item in items)
+        if terms:
+            text += f"\n\nKey Terms: {', '.join(terms[:20])}"
+        return text
+
+    def _group_cache_key(self, group_outline: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(f"{self.model_name}\0{self.PROMPT_VERSION}\0{TOPIC_NOTES.prefix_id}\0{self.group_notes_tokens}\0".encode('utf-8'))
+        digest.update(group_outline.encode('utf-8'))
+        return digest.hexdigest()
+
+    def _topic_notes(self, topic: str, group_outline: str) -> Tuple[str, bool]:
+        """(notes, generated by the LLM) for one topic group"""
+        try:
+            response = self.gateway.chat(
+                priority=BATCH,
+                model=self.model_name,
+                messages=TOPIC_NOTES.messages(
+                    group_outline,
+                    f"Word limit: {int(self.group_notes_tokens * 0.7)}"
+                ),
+                options={
+                    "temperature": 0.5,
+                    "top_p": 0.9,
+                    "num_predict": self.group_notes_tokens
+                }
+            )
+            return response['message']['content'].strip(), True
+        except LLMGatewayError:
+            raise
+        except Exception as e:
+            # The raw outline, cut to the notes budget, still lets the reduce step cover the topic
+            print(f"Error summarizing topic group '{topic}': {e}")
+            return group_outline[:self.group_notes_tokens * 4], False
+
+    def _load_group_notes(self, keys) -> Dict[str, str]:
+        """Stored notes by cache key (none without an app context)"""
+        if self.group_cache_size <= 0 or not keys or not has_app_context():
+            return {}
+        try:
+            rows = TopicGroupNotes.query.filter(TopicGroupNotes.cache_key.in_(list(keys))).all()
+            return {row.cache_key: row.notes for row in rows}
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error loading topic group notes: {e}")
+            return {}
+
+    def _store_group_notes(self, generated: Dict[str, str], used) -> None:
+        """Store new notes, mark reused ones as recently used, and prune beyond group_cache_size"""
+        if self.group_cache_size <= 0 or not (generated or used) or not has_app_context():
+            return
+        now = datetime.now()
+        try:
+            if used:
+                TopicGroupNotes.query.filter(TopicGroupNotes.cache_key.in_(list(used))).update(
+                    {'last_used_at': now}, synchronize_session=False
+                )
+            for key, notes in generated.items():
+                # merge, since another worker may have stored the same group meanwhile
+                db.session.merge(TopicGroupNotes(cache_key=key, notes=notes, last_used_at=now))
+            db.session.commit()
+
+            excess = TopicGroupNotes.query.count() - self.group_cache_size
+            if generated and excess > 0:
+                oldest = [key for key, in db.session.query(TopicGroupNotes.cache_key).order_by(
+                    TopicGroupNotes.last_used_at
+                ).limit(excess)]
+                TopicGroupNotes.query.filter(TopicGroupNotes.cache_key.in_(oldest)).delete(synchronize_session=False)
+                db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error storing topic group notes: {e}")
 
-## 📊 Coverage Disclosure
-This summary represents {coverage_report['coverage_percentage']}% structural coverage, analyzing {coverage_report['sections_extracted']} sections and extracting {coverage_report['total_items_extracted']} key information items including definitions, concepts, and examples.
+    def _map_topic_groups(self, topic_groups: Dict[str, List[SemanticSection]]) -> Tuple[str, Dict]:
+        """
+        Map step: notes for every topic group, in parallel and each within its own budget.
+        Groups whose outline is unchanged reuse their stored notes. Returns the notes joined
+        as the outline for the reduce call, and a report.
+        """
+        outlines = {topic: self._format_group_outline(topic, sections) for topic, sections in topic_groups.items()}
+        keys = {topic: self._group_cache_key(outline) for topic, outline in outlines.items()}
+        stored = self._load_group_notes(set(keys.values()))
+        missing = [topic for topic in outlines if keys[topic] not in stored]
+
+        generated = {}
+        if missing:
+            with ThreadPoolExecutor(max_workers=min(self.map_parallel, len(missing)),
+                                    thread_name_prefix='summarize-map') as executor:
+                futures = {topic: executor.submit(self._topic_notes, topic, outlines[topic]) for topic in missing}
+                generated = {topic: future.result() for topic, future in futures.items()}
+
+        self._store_group_notes(
+            {keys[topic]: notes for topic, (notes, ok) in generated.items() if ok},
+            {keys[topic] for topic in outlines if keys[topic] in stored}
+        )
+        results = {
+            topic: stored[keys[topic]] if keys[topic] in stored else generated[topic][0]
+            for topic in outlines
+        }
 
-**IMPORTANT CONSTRAINTS**:
-- Write for exam preparation, not just reference
-- Each topic must have: definition, purpose, key concepts, and example
-- Use clear headers and bullet points for scannability
-- Be comprehensive but concise - students need to memorize this
-- NO invented content - only use information from the outline provided
+        # Notes share the reduce budget equally should they still exceed it (the number of
+        # groups is bounded by topic_keywords, so with the defaults they fit)
+        share = self.reduce_input_tokens * 4 // max(1, len(results))
+        parts = []
+        for topic, notes in results.items():
+            if len(notes) > share:
+                notes = notes[:share].rsplit('\n', 1)[0]
+            parts.append(f"{'='*60}\n[TOPIC: {topic}]\n{'='*60}\n{notes}")
+
+        report = {
+            'mode': 'map_reduce',
+            'topic_groups': len(results),
+            'groups_from_cache': len(results) - len(missing)
+        }
+        return '\n\n'.join(parts), report
 
-Create the complete exam-ready study guide now:"""
+    def _synthesize_summary(self, document, topic_groups: Dict[str, List[SemanticSection]],
+                           coverage_report: Dict) -> Dict:
+        """
+        PASS 3: Single high-quality LLM call with teaching-style focus (the reduce step in map-reduce mode)
+        """
+        topic_outline = self._format_topic_outline(topic_groups)
+        outline_label = "STRUCTURED TOPIC OUTLINE"
+
+        if self.mode == 'map_reduce' or (self.mode == 'auto' and len(topic_outline) > OUTLINE_CHAR_CAP):
+            topic_outline, map_report = self._map_topic_groups(topic_groups)
+            coverage_report = {**coverage_report, 'synthesis': map_report}
+            outline_label = "STRUCTURED TOPIC OUTLINE (condensed notes per topic)"
+        elif len(topic_outline) > OUTLINE_CHAR_CAP:
+            # Ensure token efficiency
+            topic_outline = topic_outline[:OUTLINE_CHAR_CAP] + "\n\n[Additional content truncated for token efficiency]"
+        
+        messages = STUDY_GUIDE.messages(
+            f"**{outline_label}**:\n{topic_outline}",
+            f"**Document**: {document.filename}\n"
+            f"**Topics Identified**: {coverage_report['topics_identified']} major topics\n"
+            f"**Coverage**: {coverage_report['coverage_percentage']}% of document analyzed\n"
+            f"**Sections Analyzed**: {coverage_report['sections_extracted']}\n"
+            f"**Items Extracted**: {coverage_report['total_items_extracted']} information items\n\n"
+            "Create the complete exam-ready study guide now:"
+        )
 
         try:
-            response = ollama.generate(
+            response = self.gateway.chat(
+                priority=BATCH,
                 model=self.model_name,
-                prompt=prompt,
+                messages=messages,
                 options={
                     "temperature": 0.7,
                     "top_p": 0.9,
-                    "num_predict": 3500,
-                    "num_ctx": 8192
+                    "num_predict": 3500
                 }
             )
             
-            summary_text = response['response']
+            summary_text = response['message']['content']
             
             # Extract structured elements
             key_points = self._extract_key_points(summary_text)
@@ -432,6 +540,8 @@ Create the complete exam-ready study guide now:"""
                 }
             }
             
+        except LLMGatewayError:
+            raise
         except Exception as e:
             print(f"Error in LLM synthesis: {e}")
             return self._generate_fallback_summary(document, topic_groups, coverage_report)
@@ -573,7 +683,8 @@ Analyzed {coverage_report['sections_extracted']} sections, extracting {coverage_
             'important_terms': [],
             'word_count': total_word_count,
             'chunk_count': coverage_report['total_chunks'],
-            'coverage_report': coverage_report
+            'coverage_report': coverage_report,
+            'fallback': True
         }
     
     def generate_quick_summary(self, text: str, max_words: int = 150) -> str:
@@ -582,25 +693,23 @@ Analyzed {coverage_report['sections_extracted']} sections, extracting {coverage_
         if len(text) > 3000:
             text = text[:3000]
         
-        prompt = f"""Summarize the following text in {max_words} words or less. Focus on the main concepts and key information.
-
-Text:
-{text}
-
-Summary:"""
+        messages = QUICK_SUMMARY.messages(f"Text:\n{text}", f"Word limit: {max_words}")
 
         try:
-            response = ollama.generate(
+            response = self.gateway.chat(
+                priority=INTERACTIVE,
                 model=self.model_name,
-                prompt=prompt,
+                messages=messages,
                 options={
                     "temperature": 0.5,
                     "num_predict": 200
                 }
             )
             
-            return response['response'].strip()
+            return response['message']['content'].strip()
             
+        except LLMGatewayError:
+            raise
         except Exception as e:
             print(f"Error generating quick summary: {e}")
             return "Summary generation failed. Please try again."
\ No newline at end of file
@@ -51,10 +51,52 @@ export const documentAPI = {
     api.get(`/documents/${documentId}/quick-summary`),
 }
 
+// Ingestion job APIs
+export const jobAPI = {
+  get: (jobId) => 
+    api.get(`/jobs/${jobId}`),
+}
+
 // Chat APIs
 export const chatAPI = {
-  sendMessage: (workspaceId, message) => 
-    api.post(`/workspaces/${workspaceId}/chat`, { message }),
+  // filters: optional { document_ids, page_from, page_to } to restrict retrieval
+  sendMessage: (workspaceId, message, filters = {}) => 
+    api.post(`/workspaces/${workspaceId}/chat`, { message, ...filters }),
+  // Several questions in one request; resolves with { results: [{ question, answer | error }] }
+  sendBatch: (workspaceId, messages, filters = {}) =>
+    api.post(`/workspaces/${workspaceId}/chat/batch`, { messages, ...filters }),
+  // Reads the server-sent event stream and calls onToken for every token;
+  // resolves with the final `done` payload once the message is saved
+  streamMessage: async (workspaceId, message, onToken, filters = {}) => {
+    const response = await fetch(`/api/workspaces/${workspaceId}/chat/stream`, {
+      method: 'POST',
+      credentials: 'include',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ message, ...filters }),
+    })
+    if (!response.ok) throw new Error(`Chat request failed (${response.status})`)
+
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+
+    while (true) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+
+      const events = buffer.split('\n\n')
+      buffer = events.pop()
+      for (const raw of events) {
+        const event = raw.match(/^event: (.*)$/m)?.[1]
+        const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}')
+        if (event === 'token') onToken(data.token)
+        else if (event === 'error') throw new Error(data.error)
+        else if (event === 'done') return data
+      }
+    }
+    throw new Error('Chat stream ended unexpectedly')
+  },
   getHistory: (workspaceId) => 
     api.get(`/workspaces/${workspaceId}/chat/history`),
 }
@@ -81,10 +123,39 @@ export const flashcardAPI = {
 
 // Summary APIs
 export const summaryAPI = {
-  getAllSummaries: (workspaceId) => 
-    api.get(`/workspaces/${workspaceId}/summaries`),
-  getDocumentSummary: (documentId) => 
-    api.get(`/documents/${documentId}/summary`),
+  getAllSummaries: (workspaceId, regenerate = false) => 
+    api.get(`/workspaces/${workspaceId}/summaries?regenerate=${regenerate}`),
+  getDocumentSummary: (documentId, regenerate = false) => 
+    api.get(`/documents/${documentId}/summary?regenerate=${regenerate}`),
+  // Reads the NDJSON stream and calls onSummary for each document as it finishes
+  streamAllSummaries: async (workspaceId, onSummary, regenerate = false) => {
+    const response = await fetch(`/api/workspaces/${workspaceId}/summaries/stream?regenerate=${regenerate}`, {
+      credentials: 'include',
+    })
+    if (!response.ok) {
+      const body = await response.json().catch(() => ({}))
+      throw new Error(body.error || `Summary request failed (${response.status})`)
+    }
+
+    const reader = response.body.getReader()
+    const decoder = new TextDecoder()
+    let buffer = ''
+
+    while (true) {
+      const { value, done } = await reader.read()
+      if (done) break
+      buffer += decoder.decode(value, { stream: true })
+
+      const lines = buffer.split('\n')
+      buffer = lines.pop()
+      for (const line of lines) {
+        if (!line.trim()) continue
+        const entry = JSON.parse(line)
+        if (entry.document_id === undefined && entry.error) throw new Error(entry.error)
+        onSummary(entry)
+      }
+    }
+  },
 }
 
 export default api
\ No newline at end of file
@@ -46,16 +46,18 @@ export default function ChatInterface({ workspaceId }) {
       timestamp: new Date().toISOString()
     }])
 
+    let streamed = ''
+    const updateLast = (fields) => setMessages(prev => [
+      ...prev.slice(0, -1),
+      { ...prev[prev.length - 1], ...fields }
+    ])
+
     try {
-      const response = await chatAPI.sendMessage(workspaceId, userMessage)
-      setMessages(prev => [
-        ...prev.slice(0, -1),
-        {
-          user_message: userMessage,
-          ai_response: response.data.answer,
-          timestamp: response.data.timestamp
-        }
-      ])
+      const result = await chatAPI.streamMessage(workspaceId, userMessage, (token) => {
+        streamed += token
+        updateLast({ ai_response: streamed })
+      })
+      updateLast({ ai_response: result.answer, timestamp: result.timestamp })
     } catch (error) {
       setMessages(prev => [
         ...prev.slice(0, -1),
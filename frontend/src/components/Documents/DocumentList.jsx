@@ -1,10 +1,36 @@
 import { useState } from 'react'
 import { Upload, FileText, Trash2, AlertCircle } from 'lucide-react'
-import { documentAPI } from '../../api/client'
+import { documentAPI, jobAPI } from '../../api/client'
+
+const JOB_POLL_INTERVAL_MS = 1500
+// Stop waiting after this long; the job keeps running and the document appears once it is done
+const JOB_POLL_TIMEOUT_MS = 15 * 60 * 1000
 
 export default function DocumentList({ workspaceId, documents, onUpload, onDelete }) {
   const [uploading, setUploading] = useState(false)
   const [error, setError] = useState('')
+  const [progress, setProgress] = useState('')
+
+  const waitForJob = async (jobId) => {
+    const deadline = Date.now() + JOB_POLL_TIMEOUT_MS
+    while (Date.now() < deadline) {
+      const { data: job } = await jobAPI.get(jobId)
+      if (job.status === 'completed') return job
+      if (job.status === 'failed') throw new Error(job.error || 'Failed to process document')
+
+      // Extraction and embedding overlap, so the chunk total is only known at the end
+      const { pages_extracted, pages_total, chunks_embedded } = job.progress
+      if (job.stage === 'extracting' && pages_total) {
+        setProgress(`Extracting pages ${pages_extracted}/${pages_total} · ${chunks_embedded} chunks embedded`)
+      } else if (job.stage === 'embedding') {
+        setProgress(`Embedding chunks · ${chunks_embedded} done`)
+      } else {
+        setProgress('Processing document...')
+      }
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS))
+    }
+    throw new Error('Processing is taking longer than expected. Refresh the page later to see the document.')
+  }
 
   const handleFileUpload = async (e) => {
     const file = e.target.files?.[0]
@@ -20,13 +46,15 @@ export default function DocumentList({ workspaceId, documents, onUpload, onDelet
     setUploading(true)
 
     try {
-      await documentAPI.upload(workspaceId, file)
+      const response = await documentAPI.upload(workspaceId, file)
+      await waitForJob(response.data.job_id)
       onUpload()
       e.target.value = ''
     } catch (err) {
-      setError(err.response?.data?.error || 'Failed to upload document')
+      setError(err.response?.data?.error || err.message || 'Failed to upload document')
     } finally {
       setUploading(false)
+      setProgress('')
     }
   }
 
@@ -56,7 +84,7 @@ export default function DocumentList({ workspaceId, documents, onUpload, onDelet
         {uploading && (
           <div className="mt-4 flex items-center justify-center gap-2 text-primary-600">
             <div className="animate-spin rounded-full h-5 w-5 border-b-2 border-primary-600"></div>
-            <span className="text-sm font-medium">Processing document...</span>
+            <span className="text-sm font-medium">{progress || 'Uploading document...'}</span>
           </div>
         )}
 
@@ -15,11 +15,15 @@ export default function SummaryView({ workspaceId }) {
     setLoading(true)
     setError('')
     
+    setSummaries([])
+    
     try {
-      const response = await summaryAPI.getAllSummaries(workspaceId)
-      setSummaries(response.data.summaries)
+      await summaryAPI.streamAllSummaries(workspaceId, (summary) => {
+        setSummaries(prev => [...prev, summary])
+        setLoading(false)
+      })
     } catch (err) {
-      setError(err.response?.data?.error || 'Failed to load summaries')
+      setError(err.message || 'Failed to load summaries')
     } finally {
       setLoading(false)
     }